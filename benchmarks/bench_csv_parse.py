@@ -0,0 +1,83 @@
+"""
+Benchmark de la lecture d'un fichier annuel INERIS : parseur C de pandas
+contre lecteur CSV pyarrow (multithreadé, types déclarés).
+
+Le cache Parquet est désactivé pour mesurer uniquement le parsing. Les deux
+résultats sont comparés après application du schéma commun.
+
+Usage :
+    python benchmarks/bench_csv_parse.py                 # année 2012
+    python benchmarks/bench_csv_parse.py --year 2015 --repeat 7
+    python benchmarks/bench_csv_parse.py --file data/raw/mon_fichier.csv
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(base_dir)
+
+import pandas as pd
+
+from src.utils.common_functions import read_data
+from src.utils.schema import apply_schema
+from src.utils.sources import resolve_raw_file
+
+ENGINES = ["c", "pyarrow"]
+
+
+def time_engine(source, engine, repeat):
+    """
+    Parses `source` `repeat` times with one engine.
+
+    Returns:
+        tuple: (list of durations in seconds, last DataFrame)
+    """
+    durations = []
+    df = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # load_data prints a message per call: keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = read_data.load_data(source, use_cache=False, engine=engine)
+        durations.append(time.perf_counter() - start)
+        if df is None:
+            raise RuntimeError(f"Lecture de {source} impossible avec le moteur {engine}")
+    return durations, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parseur C contre pyarrow sur un fichier annuel INERIS")
+    parser.add_argument("--year", type=int, default=2012, help="année du fichier à lire (défaut : 2012)")
+    parser.add_argument("--file", default=None, help="fichier (ou membre d'archive) à lire à la place")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre de lectures par moteur (défaut : 5)")
+    args = parser.parse_args()
+
+    source = args.file or resolve_raw_file(f"Indicateurs_QualiteAir_France_Commune_{args.year}_Ineris_v.Sep2020.csv")
+    print(f"Fichier : {source}")
+
+    results = {}
+    frames = {}
+    for engine in ENGINES:
+        durations, frames[engine] = time_engine(source, engine, args.repeat)
+        results[engine] = statistics.median(durations)
+        print(f"  {engine:8} médiane {results[engine] * 1000:8.1f} ms   min {min(durations) * 1000:8.1f} ms"
+              f"   ({len(frames[engine])} lignes)")
+
+    print(f"  Accélération pyarrow : x{results['c'] / results['pyarrow']:.2f}")
+
+    expected, actual = apply_schema(frames["c"]), apply_schema(frames["pyarrow"])
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_categorical=False)
+        print("  ✓ Résultats identiques après application du schéma")
+    except AssertionError as e:
+        print(f"  ✗ Résultats différents : {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
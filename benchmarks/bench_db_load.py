@@ -0,0 +1,126 @@
+"""
+Benchmark du chargement de la base SQLite. Trois modes :
+
+    legacy    chargement d'origine : CSV entier lu par pandas puis
+              df.to_sql(if_exists="append") dans la table air_quality
+              (id INTEGER PRIMARY KEY AUTOINCREMENT), réglages SQLite par défaut
+    standard  create_database : CSV entier inséré dans la base existante,
+              index maintenus ligne à ligne
+    bulk      create_database(bulk=True) : chargeur en masse (--bulk)
+
+Chaque mode reconstruit une base neuve dans un dossier temporaire à partir du
+CSV nettoyé. Le rapport donne le débit (lignes/s), le temps CPU du processus
+Python rapporté au temps total (proche de 100 % = limité par Python), la
+taille du fichier produit et l'accélération par rapport au mode legacy.
+
+Usage :
+    python benchmarks/bench_db_load.py
+    python benchmarks/bench_db_load.py --repeat 3 --csv data/cleaned/cleaned_air_quality_with_year.csv
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(base_dir)
+
+import pandas as pd
+
+from src.database.create_db import DATA_PATH, create_database
+from src.utils.schema import COLUMNS, RAW_COLUMNS
+
+# Table of the original loader
+LEGACY_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS air_quality (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    com_insee TEXT,
+    commune TEXT,
+    population REAL,
+    annee INTEGER,
+    {', '.join(f'{col} REAL' for col in COLUMNS[4:])}
+)
+"""
+
+
+def legacy_load(db_path, data_path):
+    """
+    Original loader of create_db.py: whole CSV read by pandas, then
+    df.to_sql(if_exists="append") into the AUTOINCREMENT table, default pragmas.
+    """
+    df = pd.read_csv(data_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute(LEGACY_TABLE_SQL)
+    conn.commit()
+    df = df.rename(columns=RAW_COLUMNS)[list(RAW_COLUMNS.values())]
+    conn.execute("DELETE FROM air_quality")
+    conn.commit()
+    df.to_sql("air_quality", conn, if_exists="append", index=False)
+    conn.commit()
+    conn.close()
+    return True
+
+
+MODES = {
+    "legacy": legacy_load,
+    "standard": lambda db_path, data_path: create_database(db_path=db_path, data_path=data_path, verbose=False),
+    "bulk": lambda db_path, data_path: create_database(bulk=True, db_path=db_path, data_path=data_path,
+                                                       verbose=False),
+}
+
+
+def run_once(mode, data_path, folder):
+    """
+    Builds a fresh database with one loader.
+
+    Returns:
+        tuple: (wall time, CPU time, rows, database size in bytes)
+    """
+    db_path = os.path.join(folder, f"bench_{mode}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = MODES[mode](db_path, data_path)
+    wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    if not ok:
+        raise RuntimeError(f"Chargement impossible depuis {data_path}")
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT COUNT(*) FROM air_quality").fetchone()[0]
+    conn.close()
+    return wall, cpu, rows, os.path.getsize(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chargement d'origine, standard et en masse de air_quality.db")
+    parser.add_argument("--csv", default=DATA_PATH, help="CSV nettoyé à charger")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de chargements par mode (défaut : 3)")
+    args = parser.parse_args()
+
+    print(f"CSV : {args.csv}")
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in MODES:
+            runs = [run_once(mode, args.csv, folder) for _ in range(args.repeat)]
+            wall = statistics.median(run[0] for run in runs)
+            best = min(run[0] for run in runs)
+            cpu = statistics.median(run[1] for run in runs)
+            rows, size = runs[-1][2], runs[-1][3]
+            results[mode] = wall
+            print(f"  {mode:8} {rows / wall:10.0f} lignes/s   médiane {wall:6.2f} s   min {best:6.2f} s   "
+                  f"CPU Python {cpu / wall:4.0%}   {size / 1e6:6.1f} Mo   x{results['legacy'] / wall:.2f}")
+
+    print(f"  Accélération par rapport au chargement d'origine : standard x{results['legacy'] / results['standard']:.2f}, "
+          f"en masse x{results['legacy'] / results['bulk']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark du temps d'import des modules du projet.
+
+Chaque module est importé dans un interpréteur neuf avec `python -X importtime`
+(aucun cache de modules entre deux mesures). Le script affiche, pour chaque
+module, le temps médian sur plusieurs exécutions et les dépendances les plus
+coûteuses (temps cumulé), ce qui permet de repérer un import lourd ajouté par
+erreur au démarrage.
+
+Usage :
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 7 --top 15 src.utils.common_functions
+    python benchmarks/bench_import_time.py --max-ms 800   # code de sortie 1 si dépassé
+
+Le code de sortie vaut aussi 1 si sklearn, seaborn, matplotlib ou plotly est
+importé par l'un des modules mesurés.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules imported at startup by main.py and the database scripts
+DEFAULT_MODULES = [
+    "config",
+    "src.utils.schema",
+    "src.utils.common_functions",
+    "src.database.visualize_from_db",
+    "main",
+]
+
+# Heavy dependencies that must not be imported at startup
+HEAVY_MODULES = ["sklearn", "seaborn", "matplotlib", "plotly"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(module):
+    """
+    Imports a module in a fresh interpreter with -X importtime
+    (module None: empty interpreter, to measure the startup imports).
+
+    Returns:
+        dict: {imported module: cumulative time in microseconds}
+    """
+    env = dict(os.environ, PYTHONPATH=base_dir + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+        cwd=base_dir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import de {module} impossible :\n{result.stderr.strip().splitlines()[-1]}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            profile[match.group(4)] = int(match.group(2))
+    return profile
+
+
+def benchmark_module(module, repeat):
+    """
+    Returns the median cumulative import time of a module and its profile
+    (median per imported module) over `repeat` fresh interpreters.
+    """
+    profiles = [import_profile(module) for _ in range(repeat)]
+    names = set().union(*profiles)
+    median_profile = {name: statistics.median(p.get(name, 0) for p in profiles) for name in names}
+    return median_profile.get(module, 0), median_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import des modules du projet")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help="modules à mesurer (défaut : modules de démarrage)")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre d'interpréteurs par module (défaut : 5)")
+    parser.add_argument("--top", type=int, default=10, help="nombre de dépendances affichées (défaut : 10)")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="seuil en ms : code de sortie 1 si un module le dépasse")
+    args = parser.parse_args()
+
+    # Modules already imported by the interpreter startup (site...) are not reported
+    startup = set(import_profile(None))
+
+    failed = False
+    for module in args.modules:
+        total, profile = benchmark_module(module, args.repeat)
+        print(f"\n{module} : {total / 1000:.1f} ms (médiane sur {args.repeat} exécutions)")
+
+        # Top-level packages only, to keep the report readable
+        top_level = {name: t for name, t in profile.items()
+                     if "." not in name and name != module and name not in startup}
+        for name, t in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {t / 1000:8.1f} ms  {name}")
+
+        heavy = [name for name in HEAVY_MODULES if name in profile]
+        if heavy:
+            print(f"  ✗ Dépendances lourdes importées au démarrage : {', '.join(heavy)}")
+            failed = True
+
+        if args.max_ms is not None and total / 1000 > args.max_ms:
+            print(f"  ✗ {total / 1000:.1f} ms > seuil de {args.max_ms} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark des stockages de src.database.storage : base SQLite contre jeu
+Parquet partitionné par année, avec la même API de requête.
+
+Trois lectures sont mesurées pour chaque stockage :
+
+    scan       toute la table (toutes les colonnes, toutes les années)
+    année      une année, toutes les colonnes
+    commune    l'historique d'une commune (toutes les années)
+
+Les résultats des deux stockages sont comparés. Si le jeu Parquet n'existe
+pas, il est construit à partir de la base dans un dossier temporaire.
+
+Usage :
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --year 2015 --commune 75056 --repeat 9
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(base_dir)
+
+import pandas as pd
+
+from src.database.connection import DB_PATH, close_pools
+from src.database.storage import PARQUET_DIR, build_parquet_dataset, get_storage
+from src.utils.schema import ANNEE, COM_INSEE, COMMUNE
+
+BACKENDS = ["sqlite", "parquet"]
+
+
+def cases(year, commune):
+    """
+    Returns {case name: query arguments}.
+    """
+    return {
+        "scan": {},
+        "année": {"year": year},
+        "commune": {"com_insee": commune},
+    }
+
+
+def time_query(storage, options, repeat):
+    """
+    Runs one query `repeat` times.
+
+    Returns:
+        tuple: (list of durations in seconds, last DataFrame)
+    """
+    durations = []
+    df = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = storage.query(**options)
+        durations.append(time.perf_counter() - start)
+    return durations, df
+
+
+def same_rows(a, b):
+    """
+    Compares two results whatever their row order.
+    """
+    frames = []
+    for df in (a, b):
+        df = df.copy()
+        for col in (COM_INSEE, COMMUNE):
+            df[col] = df[col].astype(str)
+        frames.append(df.sort_values([ANNEE, COM_INSEE], ignore_index=True))
+    try:
+        pd.testing.assert_frame_equal(*frames)
+        return True
+    except AssertionError:
+        return False
+
+
+def run(db_path, folder, year, commune, repeat):
+    storages = {
+        "sqlite": get_storage("sqlite", db_path=db_path),
+        "parquet": get_storage("parquet", folder=folder),
+    }
+    commune = commune or storages["sqlite"].query(columns=[COM_INSEE], year=year)[COM_INSEE].iloc[0]
+    print(f"Base : {db_path}\nParquet : {folder}\nAnnée {year}, commune {commune}\n")
+
+    failed = False
+    for case, options in cases(year, commune).items():
+        results = {}
+        frames = {}
+        for backend in BACKENDS:
+            durations, frames[backend] = time_query(storages[backend], options, repeat)
+            results[backend] = statistics.median(durations)
+            print(f"  {case:8} {backend:8} médiane {results[backend] * 1000:8.1f} ms   "
+                  f"min {min(durations) * 1000:8.1f} ms   ({len(frames[backend])} lignes)")
+
+        identical = same_rows(frames["sqlite"], frames["parquet"])
+        failed |= not identical
+        print(f"  {case:8} parquet / sqlite : x{results['sqlite'] / results['parquet']:.2f}"
+              f"   {'✓ résultats identiques' if identical else '✗ résultats différents'}\n")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base SQLite contre jeu Parquet partitionné par année")
+    parser.add_argument("--db", default=DB_PATH, help="base SQLite")
+    parser.add_argument("--folder", default=PARQUET_DIR, help="jeu Parquet (construit s'il n'existe pas)")
+    parser.add_argument("--year", type=int, default=2012, help="année lue (défaut : 2012)")
+    parser.add_argument("--commune", default=None, help="code INSEE de la commune (défaut : la première de l'année)")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre de lectures par mesure (défaut : 5)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Base de données introuvable : {args.db}")
+        sys.exit(1)
+
+    if os.path.isdir(args.folder):
+        failed = run(args.db, args.folder, args.year, args.commune, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = os.path.join(tmp, "parquet")
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_parquet_dataset(args.db, folder)
+            failed = run(args.db, folder, args.year, args.commune, args.repeat)
+
+    close_pools()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,7 @@
-import pandas as pd 
-import numpy as np 
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix 
+import os
+
+# pandas n'est importé que dans les méthodes de treatment_data : config est
+# importé par des scripts (get_data.py...) qui n'en ont pas besoin.
 
 class treatment_data():
     def __init__(self, file_path):
@@ -13,6 +9,8 @@ class treatment_data():
         self.data = None
         
     def load_data(self):
+        import pandas as pd
+
         try:
             # Lecture du fichier CSV avec des paramètres pour gérer les erreurs
             self.data = pd.read_csv(
@@ -27,6 +25,8 @@ class treatment_data():
             return False
 
     def preprocess(self):
+        import pandas as pd
+
         if self.data is None:
             print("Aucune donnée n'a été chargée. Appelez d'abord load_data()")
             return None
@@ -85,4 +85,18 @@ if __name__ == "__main__":
 
 DATA_URL = "https://zenodo.org/records/5043645/files/Indicateurs_QualiteAir_France_Commune_2000-2015_Ineris_v.Sep2020.zip?download=1"
 
+# Optional checksum of the archive, "<algorithm>:<hex>" as shown on Zenodo (e.g. "md5:...").
+# When None the checksum published by the Zenodo record of DATA_URL is used; if the record
+# cannot be read, the download is only checked against the size announced by the server.
+DATA_CHECKSUM = None
+
 RAW_DATA_PATH = "data/raw/Indicateurs_QualiteAir_France_Commune_2000-2015_Ineris_v.Sep2020.csv"
+
+# Archive kept by `get_data(extract=False)`; the yearly CSVs are then read directly from it
+RAW_ARCHIVE_PATH = "data/raw/Indicateurs_QualiteAir_France_Commune_2000-2015_Ineris_v.Sep2020.zip"
+
+# Storage backend of the query API (src/database/storage.py): "sqlite" (data/air_quality.db)
+# or "parquet" (dataset partitioned by year). The AIR_QUALITY_STORAGE environment variable overrides it.
+STORAGE_BACKEND = os.environ.get("AIR_QUALITY_STORAGE", "sqlite")
+
+PARQUET_DATASET_PATH = "data/parquet"
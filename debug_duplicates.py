@@ -1,51 +1,45 @@
-import sqlite3
+import argparse
+
 import pandas as pd
 
-db_path = "data/air_quality.db"
-conn = sqlite3.connect(db_path)
+from src.database.connection import read_connection
+from src.database.create_db import DATA_PATH, prepare_frame
+from src.utils.duplicates import DuplicateTracker, print_report
 
-# Check the number of lines per municipality and year
-query = """
-SELECT com_insee, annee, COUNT(*) as count
-FROM air_quality
-GROUP BY com_insee, annee
-HAVING COUNT(*) > 1
-LIMIT 10
-"""
-df_dup = pd.read_sql_query(query, conn)
-print("Communes avec duplications:")
-print(df_dup)
+db_path = "data/air_quality.db"
 
-# Count the total number of lines with duplicates
-query2 = """
-SELECT COUNT(*) as total_groups, SUM(count) as total_rows
-FROM (
-    SELECT com_insee, annee, COUNT(*) as count
-    FROM air_quality
-    GROUP BY com_insee, annee
-    HAVING COUNT(*) > 1
-)
-"""
-df_count = pd.read_sql_query(query2, conn)
-print("\nStatistiques des duplications:")
-print(df_count)
+parser = argparse.ArgumentParser(description="Rapport des clés (com_insee, annee) en double")
+parser.add_argument("--csv", nargs="?", const=DATA_PATH, default=None,
+                    help="analyse le CSV nettoyé (une passe, par blocs) au lieu du rapport de la base")
+args = parser.parse_args()
 
-# Check a specific municipality
-query3 = """
-SELECT *
-FROM air_quality
-WHERE com_insee = (
-    SELECT com_insee
-    FROM air_quality
-    GROUP BY com_insee, annee
-    HAVING COUNT(*) > 1
-    LIMIT 1
-)
-AND annee = 2000
-LIMIT 5
-"""
-df_sample = pd.read_sql_query(query3, conn)
-print("\nExemple de lignes dupliquées:")
-print(df_sample)
+if args.csv:
+    # Single pass over the cleaned CSV, block by block (exact / conflicting duplicates)
+    tracker = DuplicateTracker()
+    for chunk in pd.read_csv(args.csv, dtype={'COM Insee': str}, chunksize=100_000):
+        tracker.update(prepare_frame(chunk))
+    print(f"{tracker.rows} lignes analysées : {args.csv}")
+    print_report(tracker.report())
+else:
+    # Read-only connection: the script never writes to the database
+    with read_connection(db_path) as conn:
+        # The (com_insee, annee) key is unique in air_quality: the keys found more than
+        # once in the cleaned data are analysed and recorded in duplicate_keys while
+        # loading (the last row of each key is kept)
+        report = pd.read_sql_query(
+            "SELECT com_insee, annee, occurrences, distinct_values, kind FROM duplicate_keys "
+            "ORDER BY annee, com_insee",
+            conn
+        )
+        print_report(report)
 
-conn.close()
+        # Row kept for a duplicated municipality (lookup by the unique index)
+        query = """
+        SELECT a.*
+        FROM air_quality a
+        JOIN (SELECT com_insee, annee FROM duplicate_keys ORDER BY annee, com_insee LIMIT 1) d
+          ON a.com_insee = d.com_insee AND a.annee = d.annee
+        """
+        df_sample = pd.read_sql_query(query, conn)
+        print("\nLigne conservée pour une clé dupliquée:")
+        print(df_sample)
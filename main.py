@@ -2,23 +2,44 @@
 Script pour générer des graphiques de pollution en France.
 Crée des histogrammes et des scatter plots pour chaque polluant et année.
 """
+import argparse
 import webbrowser
 import os
 import html
-import pandas as pd
-from plotly.io import write_html
-from src.utils.common_functions import load_commune_mappings, load_data_for_year
-from src.visualizations.scatter_plots import create_pollution_scatter
-from src.visualizations.histograms import create_pollution_histogram
+from src.utils.common_functions import load_commune_mappings, load_all_years
+from src.utils.schema import ANNEE, COMMUNE, concat_frames, pollutant_column
 
 
-def generate_graphs():
+def generate_graphs(max_workers=None, render_workers=None, shared_bins=True, max_points=None, density=False,
+                    bundle=False, use_cache=True):
     """
     Fonction pour générer tous les graphiques (histogrammes et scatter plots).
+
+    Args:
+        max_workers (int): Nombre de processus utilisés pour charger les
+            fichiers annuels en parallèle (défaut : nombre de cœurs, 1 = séquentiel)
+        render_workers (int): Nombre de processus utilisés pour générer les
+            graphiques (défaut : nombre de cœurs, 1 = séquentiel)
+        shared_bins (bool): Mêmes classes d'histogramme pour toutes les années
+            d'un polluant (années directement comparables) ; sinon les classes
+            couvrent les valeurs de chaque année
+        max_points (int): Nombre maximal de points par nuage de points, au-delà
+            les points sont décimés en conservant les extrêmes (défaut : tous)
+        density (bool): Génère aussi les cartes de densité population /
+            concentration (assets/density)
+        bundle (bool): Un fichier par polluant et type de graphique, avec
+            toutes les années et un curseur d'année (assets/bundles) au lieu
+            d'un fichier par année
+        use_cache (bool): Ne regénère que les graphiques dont les données,
+            les paramètres ou le code ont changé (data/cache/render.json)
     """
+    from src.visualizations.bundles import BUNDLE_DIR, bundle_path
+    from src.visualizations.histograms import global_edges
+    from src.visualizations.render_cache import RenderCache
+    from src.visualizations.render_pool import RenderJob, bundle_jobs, job_columns, render_jobs
+
     try:
         print("\nChargement des données pour toutes les années...")
-        data = pd.DataFrame()
         
         commune_to_insee, insee_to_commune = load_commune_mappings()
         if commune_to_insee is None or insee_to_commune is None:
@@ -27,21 +48,22 @@ def generate_graphs():
         
         print(f"Correspondances des communes chargées : {len(commune_to_insee)} communes")
         
-        for year in range(2000, 2016):
-            if year == 2006:
-                continue
-            print(f"\nChargement des données pour l'année {year}...")
-            year_data = load_data_for_year(year)
-            if year_data is not None:
-                communes_manquantes = [c for c in year_data['Commune'] if c not in commune_to_insee]
-                if communes_manquantes:
-                    print(f"Attention : {len(communes_manquantes)} communes non trouvées en {year}")
-                data = pd.concat([data, year_data], ignore_index=True)
-        
-        if data.empty:
+        years = [year for year in range(2000, 2016) if year != 2006]
+        data_by_year = load_all_years(years, max_workers=max_workers)
+        for year, year_data in data_by_year.items():
+            # Une recherche vectorisée dans l'index pour toutes les lignes de l'année
+            communes_manquantes = int((~commune_to_insee.has_names(year_data[COMMUNE].to_numpy(dtype=str))).sum())
+            if communes_manquantes:
+                print(f"Attention : {communes_manquantes} communes non trouvées en {year}")
+
+        if not data_by_year:
             print("Erreur : aucune donnée chargée.")
             return
 
+        # Une seule concaténation au lieu d'une par année
+        data = concat_frames(list(data_by_year.values()))
+        del data_by_year
+
         # Créer les dossiers de sortie
         script_dir = os.path.dirname(os.path.abspath(__file__))
         output_hist_dir = os.path.join(script_dir, 'assets', 'html_histograms')
@@ -49,50 +71,65 @@ def generate_graphs():
         os.makedirs(output_hist_dir, exist_ok=True)
         os.makedirs(output_scatter_dir, exist_ok=True)
         print(f"Dossiers créés :\n- Histogrammes : {output_hist_dir}\n- Scatter : {output_scatter_dir}")
+        output_density_dir = os.path.join(script_dir, 'assets', 'density')
+        if density:
+            os.makedirs(output_density_dir, exist_ok=True)
+            print(f"- Densité : {output_density_dir}")
 
         # Polluants et colonnes
         polluants_tous = ['NO2', 'PM10', 'O3', 'Somo 35', 'AOT 40']
         polluant_2009 = 'PM25'
-        noms_colonnes = {
-            'NO2': 'Moyenne annuelle de concentration de NO2 (ug/m3)',
-            'PM10': 'Moyenne annuelle de concentration de PM10 (ug/m3)',
-            'O3': 'Moyenne annuelle de concentration de O3 (ug/m3)',
-            'Somo 35': 'Moyenne annuelle de somo 35 (ug/m3.jour)',
-            'AOT 40': "Moyenne annuelle d'AOT 40 (ug/m3.heure)",
-            'PM25': 'Moyenne annuelle de concentration de PM25 (ug/m3)'
-        }
-
-        années = sorted(data['Année'].unique())
+
+        # Classes d'histogramme communes à toutes les années de chaque polluant
+        edges = {}
+        if shared_bins:
+            for polluant in polluants_tous + [polluant_2009]:
+                colonne = pollutant_column(polluant)
+                if colonne in data.columns:
+                    edges[polluant] = global_edges(data[colonne])
+
+        # Une tâche par graphique (année, polluant, type) : chaque tâche ne
+        # reçoit que les colonnes utiles de l'année
+        jobs = []
+        années = sorted(data[ANNEE].unique())
         for année in années:
-            print(f"\nTraitement de l'année {année}...")
-            données_année = data[data['Année'] == année]
+            données_année = data[data[ANNEE] == année]
             
             polluants_à_traiter = polluants_tous.copy()
             if année >= 2009:
                 polluants_à_traiter.append(polluant_2009)
             
             for polluant in polluants_à_traiter:
-                colonne = noms_colonnes[polluant]
+                colonne = pollutant_column(polluant)
                 if colonne not in données_année.columns:
                     print(f"  Données non disponibles pour {polluant} en {année}")
                     continue
-                
-                try:
-                    # Scatter plot
-                    fig_scatter = create_pollution_scatter(données_année, insee_to_commune, polluant)
-                    scatter_file = os.path.join(output_scatter_dir, f'{polluant}_scatter_{année}.html')
-                    write_html(fig_scatter, scatter_file, auto_open=False, include_plotlyjs='cdn')
-                    
-                    # Histogramme
-                    fig_hist = create_pollution_histogram(données_année, polluant)
-                    hist_file = os.path.join(output_hist_dir, f'{polluant}_histogram_{année}.html')
-                    write_html(fig_hist, hist_file, auto_open=False, include_plotlyjs='cdn')
-                    
-                    print(f"  ✓ Graphiques générés pour {polluant}")
-                except Exception as e:
-                    print(f"  ✗ Erreur lors de la génération des graphiques pour {polluant} : {e}")
-
-        print("\nToutes les visualisations ont été générées avec succès !")
+
+                jobs.append(RenderJob('scatter', polluant, année,
+                                      os.path.join(output_scatter_dir, f'{polluant}_scatter_{année}.html'),
+                                      data=données_année[job_columns('scatter', colonne)],
+                                      options=dict(max_points=max_points)))
+                jobs.append(RenderJob('histogram', polluant, année,
+                                      os.path.join(output_hist_dir, f'{polluant}_histogram_{année}.html'),
+                                      data=données_année[job_columns('histogram', colonne)],
+                                      options=dict(edges=edges.get(polluant))))
+                if density:
+                    jobs.append(RenderJob('density', polluant, année,
+                                          os.path.join(output_density_dir, f'{polluant}_density_{année}.html'),
+                                          data=données_année[job_columns('density', colonne)]))
+        del data
+
+        if bundle:
+            os.makedirs(BUNDLE_DIR, exist_ok=True)
+            print(f"Fichiers regroupés par polluant : {BUNDLE_DIR}")
+            jobs = bundle_jobs(jobs, bundle_path)
+
+        errors = render_jobs(jobs, max_workers=render_workers, insee_to_commune=insee_to_commune,
+                             cache=RenderCache.load() if use_cache else None)
+        if errors:
+            print(f"\n{len(errors)} graphiques n'ont pas pu être générés.")
+        else:
+            print("\nToutes les visualisations ont été générées avec succès !")
         
     except Exception as e:
         print(f"Une erreur s'est produite : {e}")
@@ -293,9 +330,28 @@ and references the HTML files already generated in ../output/FINAL_superposed_gr
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Génération des graphiques et du dashboard")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processus utilisés pour générer les graphiques (défaut : nombre de cœurs, 1 = séquentiel)")
+    parser.add_argument("--load-workers", type=int, default=None,
+                        help="processus utilisés pour charger les fichiers annuels "
+                             "(défaut : nombre de cœurs, 1 = séquentiel)")
+    parser.add_argument("--bins-per-year", action="store_true",
+                        help="classes d'histogramme propres à chaque année (défaut : communes à toutes les années)")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="points maximum par nuage de points, décimés en gardant les extrêmes (défaut : tous)")
+    parser.add_argument("--density", action="store_true",
+                        help="génère aussi les cartes de densité population / concentration")
+    parser.add_argument("--bundle", action="store_true",
+                        help="un fichier par polluant et type de graphique, toutes années comprises")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="regénère tous les graphiques, même inchangés")
+    args = parser.parse_args()
+
     # Générer les graphiques (scatter plots et histogrammes)
     print("=== Génération des graphiques ===")
-    generate_graphs()
+    generate_graphs(max_workers=args.load_workers, render_workers=args.workers, shared_bins=not args.bins_per_year, max_points=args.max_points,
+                    density=args.density, bundle=args.bundle, use_cache=not args.no_cache)
     
     # Générer le dashboard
     print("\n=== Génération du dashboard ===")
@@ -0,0 +1,195 @@
+"""
+Connexions en lecture seule à la base SQLite, partagées par les lecteurs.
+
+Les lecteurs (graphiques, carte, scripts de contrôle, futurs workers ou API)
+empruntent une connexion à un pool borné au lieu d'ouvrir la base à chaque
+fois :
+
+    with read_connection() as conn:
+        df = pd.read_sql_query("SELECT ...", conn)
+
+Chaque connexion est ouverte en lecture seule (URI `mode=ro`, PRAGMA
+query_only) : elle ne prend jamais de verrou d'écriture et, la base étant en
+mode WAL, les lecteurs ne bloquent ni le chargeur ni les autres lecteurs. Une
+connexion n'est utilisée que par un thread à la fois ; elle garde ses
+requêtes préparées (cache de sqlite3) et son cache de pages d'un emprunt à
+l'autre.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DB_PATH = os.path.join(base_dir, "data", "air_quality.db")
+
+# Maximum number of open connections per database
+POOL_SIZE = 8
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 30
+
+# Read settings of each connection: memory-mapped reads (256 MiB), 32 MiB
+# page cache, prepared statements kept by sqlite3
+READ_PRAGMAS = [
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -32768",
+    "PRAGMA temp_store = MEMORY",
+]
+CACHED_STATEMENTS = 256
+
+
+def open_read_only(db_path=DB_PATH):
+    """
+    Ouvre une connexion en lecture seule sur une base existante.
+
+    Raises:
+        FileNotFoundError: Si la base n'existe pas
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Base de données introuvable : {db_path}")
+
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+    # check_same_thread=False: a pooled connection may be borrowed by another
+    # thread later on, never by two threads at once
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                           cached_statements=CACHED_STATEMENTS, timeout=POOL_TIMEOUT)
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _is_database_error(error):
+    """
+    True for sqlite3 errors, raised as is or wrapped by pandas
+    (pandas.errors.DatabaseError, raised by read_sql_query, keeps the
+    sqlite3 error as its cause).
+    """
+    return isinstance(error, sqlite3.Error) or isinstance(error.__cause__, sqlite3.Error)
+
+
+class ConnectionPool:
+    """
+    Pool borné de connexions en lecture seule sur une base.
+
+    Les connexions sont créées à la demande (au plus `size`) et rendues au
+    pool après usage ; la dernière rendue est la prochaine prêtée (ses pages
+    sont encore en cache). Un emprunteur attend au plus `timeout` secondes
+    qu'une connexion se libère.
+
+    Chaque emprunt occupe une place du pool jusqu'à sa fin, quelle qu'en soit
+    l'issue : une connexion dont la requête a échoué est fermée et sa place
+    libérée, les autres sont rendues au pool.
+    """
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Aucune connexion libre sur {self.db_path} après {self.timeout} s")
+        try:
+            if self._closed:
+                raise RuntimeError(f"Pool fermé : {self.db_path}")
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            return open_read_only(self.db_path)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn):
+        try:
+            # Rollback ends the read transaction left open by a cursor not fully consumed
+            conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put_nowait(conn)
+        self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Prête une connexion pour la durée du bloc `with`.
+        """
+        conn = self._acquire()
+        failed = False
+        try:
+            yield conn
+        except BaseException as e:
+            # A connection whose query failed is not given back to the pool
+            failed = _is_database_error(e)
+            raise
+        finally:
+            if failed:
+                self._discard(conn)
+            else:
+                self._release(conn)
+
+    def close(self):
+        """
+        Ferme les connexions libres ; celles encore prêtées seront fermées à leur retour.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """
+    Renvoie le pool partagé d'une base (créé au premier appel).
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = _pools[key] = ConnectionPool(key)
+        return pool
+
+
+@contextmanager
+def read_connection(db_path=DB_PATH):
+    """
+    Prête une connexion en lecture seule du pool partagé de `db_path`.
+    """
+    with get_pool(db_path).connection() as conn:
+        yield conn
+
+
+def close_pools():
+    """
+    Ferme les pools partagés (par exemple avant de remplacer le fichier de la base).
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
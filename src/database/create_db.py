@@ -2,97 +2,640 @@
 import sqlite3
 import pandas as pd
 import os
+import sys
+import argparse
 
-def create_database():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.utils.duplicates import CONFLICTING, DuplicateTracker, analyze_duplicates, print_report, summarize
+from src.utils.manifest import load_manifest, partition_path
+from src.utils.schema import (ANNEE, COLUMNS, COM_INSEE, COMMUNE, POLLUTANT_COLUMNS, POPULATION,
+                              normalize_insee, rename_columns)
+from src.database.summary import create_summary_tables, load_summary, refresh_summaries
+from src.database.connection import close_pools
+from src.database.storage import build_parquet_dataset
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DATA_PATH = os.path.join(base_dir, "data", "cleaned", "cleaned_air_quality_with_year.csv")
+DB_PATH = os.path.join(base_dir, "data", "air_quality.db")
+
+# Official postal code base: coordinates and official name of the communes
+POSTAL_PATH = os.path.join(base_dir, "data", "cleaned", "base-officielle-codes-postaux.csv")
+
+# Rows read from the CSV and inserted per transaction by the bulk loader
+# (pandas reader; the pyarrow reader works by blocks of BULK_BLOCK_SIZE bytes)
+BULK_CHUNK_SIZE = 100_000
+BULK_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Connection settings of the bulk loader. The database is rebuilt in a new
+# file that replaces the old one only once complete, so no journal and no
+# fsync are needed while loading (64 MiB page cache, temporary structures in
+# memory). The finished database is switched to WAL for its readers.
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+]
+
+CREATE_COMMUNE_SQL = """
+CREATE TABLE IF NOT EXISTS commune (
+    id INTEGER PRIMARY KEY,
+    com_insee TEXT NOT NULL UNIQUE,
+    nom TEXT,
+    nom_officiel TEXT,
+    latitude REAL,
+    longitude REAL
+)
+"""
+
+# One row per commune and year; the primary key (commune_id, annee) is the
+# natural key of the data and also serves the lookups by commune
+CREATE_MEASUREMENT_SQL = """
+CREATE TABLE IF NOT EXISTS measurement (
+    commune_id INTEGER NOT NULL REFERENCES commune (id),
+    annee INTEGER NOT NULL,
+    population REAL,
+    pm25 REAL,
+    pm25_pop REAL,
+    pm10 REAL,
+    pm10_pop REAL,
+    no2 REAL,
+    no2_pop REAL,
+    o3 REAL,
+    o3_pop REAL,
+    aot40 REAL,
+    somo35 REAL,
+    somo35_pop REAL,
+    PRIMARY KEY (commune_id, annee)
+) WITHOUT ROWID
+"""
+
+CREATE_MANIFEST_SQL = """
+CREATE TABLE IF NOT EXISTS load_manifest (
+    annee INTEGER PRIMARY KEY,
+    partition_sha256 TEXT,
+    rows INTEGER
+)
+"""
+
+# Keys (com_insee, annee) found more than once in the cleaned data: number of
+# rows, number of distinct values and kind ('exact' or 'conflicting')
+CREATE_DUPLICATES_SQL = """
+CREATE TABLE IF NOT EXISTS duplicate_keys (
+    com_insee TEXT,
+    annee INTEGER,
+    occurrences INTEGER,
+    distinct_values INTEGER,
+    kind TEXT,
+    PRIMARY KEY (com_insee, annee)
+)
+"""
+
+# Columns added to duplicate_keys since its creation
+DUPLICATES_COLUMNS = {"distinct_values": "INTEGER", "kind": "TEXT"}
+
+# Spatial index of the commune coordinates (one point per commune, id = commune.id).
+# R-tree coordinates are 32-bit floats rounded outwards: queries test the
+# exact latitude / longitude of the commune as well.
+CREATE_RTREE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS commune_rtree USING rtree (
+    id,
+    min_lat, max_lat,
+    min_lon, max_lon
+)
+"""
+
+# Measured columns of the measurement table
+MEASURES = [POPULATION] + POLLUTANT_COLUMNS
+
+# Compatibility views: air_quality has the columns of the former table,
+# air_quality_geo adds the official name and the coordinates of the commune
+VIEWS = [
+    f"""
+    CREATE VIEW IF NOT EXISTS air_quality AS
+    SELECT c.com_insee, c.nom AS commune, m.population, m.annee,
+           {', '.join(f'm.{col}' for col in POLLUTANT_COLUMNS)}
+    FROM measurement m JOIN commune c ON c.id = m.commune_id
+    """,
+    f"""
+    CREATE VIEW IF NOT EXISTS air_quality_geo AS
+    SELECT c.com_insee, c.nom AS commune, c.nom_officiel, c.latitude, c.longitude,
+           m.population, m.annee, {', '.join(f'm.{col}' for col in POLLUTANT_COLUMNS)}
+    FROM measurement m JOIN commune c ON c.id = m.commune_id
+    """,
+]
+
+# Secondary indexes, built after a bulk load rather than maintained row by row.
+# (annee, population) serves the queries by year and by year + population.
+INDEXES = {
+    "idx_measurement_annee_population":
+        "CREATE INDEX IF NOT EXISTS idx_measurement_annee_population ON measurement (annee, population)",
+}
+
+# Last name seen for a commune wins
+UPSERT_COMMUNE_SQL = (
+    "INSERT INTO commune (com_insee, nom) VALUES (?, ?) "
+    "ON CONFLICT (com_insee) DO UPDATE SET nom = excluded.nom"
+)
+
+# Duplicate policy: the last row of a (com_insee, annee) key in the cleaned CSV wins
+_UPDATE_MEASURES = ", ".join(f"{col} = excluded.{col}" for col in MEASURES)
+INSERT_SQL = (
+    f"INSERT INTO measurement (commune_id, annee, {', '.join(MEASURES)}) "
+    f"VALUES ({', '.join('?' * (len(MEASURES) + 2))}) "
+    f"ON CONFLICT (commune_id, annee) DO UPDATE SET {_UPDATE_MEASURES}"
+)
+
+RECORD_DUPLICATES_SQL = (
+    "INSERT OR REPLACE INTO duplicate_keys (com_insee, annee, occurrences, distinct_values, kind) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def prepare_frame(df):
+    """
+    Harmonise les colonnes du CSV nettoyé avec celles de la table air_quality
+    """
+    # Harmonisation des noms de colonnes avant insertion (schéma commun)
+    df = rename_columns(df)
+    df[COM_INSEE] = normalize_insee(df[COM_INSEE])
+
+    # Garder uniquement les colonnes utiles
+    return df[COLUMNS]
+
+
+def read_cleaned_csv(path):
+    # Les mesures restent en float64 : la base stocke des REAL en double précision
+    return prepare_frame(pd.read_csv(path, dtype={'COM Insee': str}))
+
+
+def iter_cleaned_csv(path, chunk_size=BULK_CHUNK_SIZE, block_size=BULK_BLOCK_SIZE):
+    """
+    Lit le CSV nettoyé bloc par bloc, avec le lecteur en flux de pyarrow
+    (multithreadé) s'il est installé, sinon avec pandas.
+
+    Yields:
+        pandas.DataFrame: Blocs préparés pour l'insertion
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv
+    except ImportError:
+        for chunk in pd.read_csv(path, dtype={'COM Insee': str}, chunksize=chunk_size):
+            yield prepare_frame(chunk)
+        return
+
+    # Types déclarés : un bloc sans valeur (PM25 avant 2009) ne doit pas fixer le type
+    header = pd.read_csv(path, nrows=0).columns
+    column_types = {col: pa.float64() for col in header}
+    column_types.update({'COM Insee': pa.string(), 'Commune': pa.string(), 'Année': pa.int64()})
+
+    reader = csv.open_csv(
+        path,
+        read_options=csv.ReadOptions(block_size=block_size),
+        convert_options=csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+    )
+    for batch in reader:
+        yield prepare_frame(batch.to_pandas())
+
+
+class CommuneIds:
+    """
+    Ids and names of the communes already in the commune table, kept from one
+    chunk of a load to the next: each chunk only writes its new or renamed
+    communes and only reads back the ids of the communes it created.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = {}
+        self.last_id = 0
+
+    def read_new(self, conn):
+        """
+        Reads the communes created since the last call (ids are allocated in
+        increasing order).
+        """
+        for code, commune_id, name in conn.execute("SELECT com_insee, id, nom FROM commune WHERE id > ?",
+                                                   (self.last_id,)):
+            self.ids[code] = commune_id
+            self.names[code] = name
+            self.last_id = max(self.last_id, commune_id)
+
+
+def insert_frame(conn, df, commune_ids=None):
+    """
+    Inserts a prepared DataFrame: its communes in the commune table, then its
+    rows in the measurement table with a single executemany (NaN is stored
+    as NULL).
+
+    Rows whose key (com_insee, annee) was already loaded replace the previous
+    row. The duplicated keys are analysed by the caller (src.utils.duplicates)
+    and recorded with record_duplicates.
+
+    Args:
+        commune_ids (CommuneIds): Communes known from the previous chunks of
+            the same load (default: read from the table)
+    """
+    if commune_ids is None:
+        commune_ids = CommuneIds()
+    if not commune_ids.last_id:
+        commune_ids.read_new(conn)
+
+    # Commune dimension first (new communes and new names only), then the
+    # measurements keyed by commune id
+    communes = df[[COM_INSEE, COMMUNE]].drop_duplicates(subset=[COM_INSEE], keep='last')
+    known = communes[COM_INSEE].map(commune_ids.ids).notna()
+    names = communes[COM_INSEE].map(commune_ids.names)
+    same_name = names.eq(communes[COMMUNE]) | (names.isna() & communes[COMMUNE].isna())
+    stale = communes[~(known & same_name)]
+    if len(stale):
+        conn.executemany(UPSERT_COMMUNE_SQL, stale.itertuples(index=False, name=None))
+        commune_ids.names.update(zip(stale[COM_INSEE], stale[COMMUNE]))
+        commune_ids.read_new(conn)
+
+    rows = zip(df[COM_INSEE].map(commune_ids.ids).tolist(), *(df[col].tolist() for col in [ANNEE] + MEASURES))
+    conn.executemany(INSERT_SQL, rows)
+
+
+def record_duplicates(conn, report):
+    """
+    Enregistre un rapport de doublons (src.utils.duplicates) dans duplicate_keys.
+    """
+    conn.executemany(RECORD_DUPLICATES_SQL, report.itertuples(index=False, name=None))
+
+
+def check_duplicates(report, strict=False):
+    """
+    Étape de validation du chargement : affiche le rapport de doublons.
+
+    Returns:
+        bool: False si `strict` et qu'une clé a des lignes de valeurs
+        différentes (le chargement doit alors être abandonné)
+    """
+    print_report(report, limit=5)
+    if strict and summarize(report)["conflicting"]:
+        print("✗ Doublons conflictuels : chargement abandonné (--strict)")
+        return False
+    return True
+
+
+def migrate_schema(conn):
+    """
+    Met à niveau une base où air_quality est encore une table (schéma d'avant
+    le découpage commune / measurement) : les clés en double sont
+    enregistrées dans duplicate_keys, les lignes sont recopiées dans commune
+    et measurement (la dernière ligne chargée de chaque clé est conservée),
+    puis l'ancienne table est supprimée pour laisser place à la vue et le
+    fichier est compacté (VACUUM) pour rendre sa place.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'air_quality'").fetchone()
+    if row is None or row[0] != 'table':
+        return
+
+    print("Migration de la table air_quality vers les tables commune / measurement...")
+    # Duplicates of the old table, in a single pass over its rows (in load order, block by block)
+    tracker = DuplicateTracker()
+    for chunk in pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM air_quality ORDER BY id", conn,
+                                   chunksize=BULK_CHUNK_SIZE):
+        tracker.update(chunk)
+    with conn:
+        record_duplicates(conn, tracker.report())
+        conn.execute("""
+        INSERT INTO commune (com_insee, nom)
+        SELECT com_insee, commune FROM air_quality WHERE com_insee IS NOT NULL ORDER BY id
+        ON CONFLICT (com_insee) DO UPDATE SET nom = excluded.nom
+        """)
+        conn.execute(f"""
+        INSERT INTO measurement (commune_id, annee, {', '.join(MEASURES)})
+        SELECT c.id, a.annee, {', '.join(f'a.{col}' for col in MEASURES)}
+        FROM air_quality a JOIN commune c ON c.com_insee = a.com_insee
+        WHERE true ORDER BY a.id
+        ON CONFLICT (commune_id, annee) DO UPDATE SET {_UPDATE_MEASURES}
+        """)
+        conn.execute("DROP TABLE air_quality")
+    # Pages of the dropped table are only freed by VACUUM, outside any transaction
+    conn.execute("VACUUM")
+
+
+def create_schema(conn, indexes=True):
+    """
+    Crée les tables, migre une base existante puis crée les vues de
+    compatibilité et, si demandé, les index secondaires.
+    """
+    with conn:
+        for sql in (CREATE_COMMUNE_SQL, CREATE_MEASUREMENT_SQL, CREATE_DUPLICATES_SQL, CREATE_MANIFEST_SQL):
+            conn.execute(sql)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(duplicate_keys)")}
+        for col, sql_type in DUPLICATES_COLUMNS.items():
+            if col not in existing:
+                conn.execute(f"ALTER TABLE duplicate_keys ADD COLUMN {col} {sql_type}")
+    create_summary_tables(conn)
+    migrate_schema(conn)
+    create_spatial_index(conn)
+    with conn:
+        for sql in VIEWS:
+            conn.execute(sql)
+        if indexes:
+            for sql in INDEXES.values():
+                conn.execute(sql)
+
+
+def create_spatial_index(conn):
+    """
+    Crée l'index R-tree des coordonnées des communes.
+
+    Returns:
+        bool: False si SQLite a été compilé sans le module R-tree
+    """
+    try:
+        with conn:
+            conn.execute(CREATE_RTREE_SQL)
+    except sqlite3.OperationalError as e:
+        print(f"ATTENTION : index spatial indisponible ({e}) : les requêtes par zone parcourront la table commune")
+        return False
+    return True
+
+
+def refresh_spatial_index(conn):
+    """
+    Reconstruit l'index R-tree à partir des coordonnées de la table commune
+    (communes ajoutées, supprimées ou déplacées).
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'commune_rtree'").fetchone()
+    if exists is None:
+        return
+    with conn:
+        conn.execute("DELETE FROM commune_rtree")
+        conn.execute("""
+        INSERT INTO commune_rtree (id, min_lat, max_lat, min_lon, max_lon)
+        SELECT id, latitude, latitude, longitude, longitude FROM commune
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """)
+
+
+def load_coordinates(conn, postal_path=POSTAL_PATH):
+    """
+    Renseigne le nom officiel et les coordonnées des communes à partir de la
+    base officielle des codes postaux (première ligne de chaque code INSEE).
+
+    Returns:
+        int: Nombre de communes de la base ayant des coordonnées
+    """
+    if not os.path.exists(postal_path):
+        print(f"Base des codes postaux introuvable : {postal_path}")
+        return 0
+    try:
+        df = pd.read_csv(postal_path, dtype={"code_commune_insee": str},
+                         usecols=["code_commune_insee", "nom_de_la_commune", "latitude", "longitude"])
+    except (ValueError, pd.errors.ParserError) as e:
+        print(f"ATTENTION : Base des codes postaux illisible '{postal_path}' : {e}")
+        return 0
+
+    df = df.drop_duplicates(subset=["code_commune_insee"], keep="first")
+    codes = normalize_insee(df["code_commune_insee"])
+    with conn:
+        conn.executemany(
+            "UPDATE commune SET nom_officiel = ?, latitude = ?, longitude = ? WHERE com_insee = ?",
+            zip(df["nom_de_la_commune"].tolist(), df["latitude"].tolist(), df["longitude"].tolist(), codes.tolist())
+        )
+    refresh_spatial_index(conn)
+    return conn.execute("SELECT COUNT(*) FROM commune WHERE latitude IS NOT NULL").fetchone()[0]
+
+
+def _remove_db_files(path):
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def bulk_load(db_path, data_path, strict=False):
+    """
+    Chargement en masse : la base est reconstruite dans un fichier temporaire.
+    Le CSV nettoyé est lu par blocs (iter_cleaned_csv), chaque bloc est inséré par executemany
+    dans sa propre transaction (les doublons sont résolus par la clé primaire), les index secondaires sont construits en une
+    passe à la fin et ANALYZE met à jour les statistiques de l'optimiseur.
+    Le fichier terminé remplace ensuite l'ancienne base d'un seul coup.
+
+    Aucune connexion ne doit être ouverte sur `db_path` pendant l'appel.
+    Les doublons sont analysés au fil des blocs ; avec `strict`, des doublons
+    conflictuels abandonnent le chargement et l'ancienne base est conservée.
+
+    Returns:
+        int: Nombre de lignes insérées (None si le chargement est abandonné)
+    """
+    tmp_path = db_path + ".tmp"
+    _remove_db_files(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        # The primary key of measurement resolves the duplicates while loading
+        create_schema(conn, indexes=False)
+
+        n_rows = 0
+        tracker = DuplicateTracker()
+        commune_ids = CommuneIds()
+        for df in iter_cleaned_csv(data_path):
+            tracker.update(df)
+            with conn:
+                insert_frame(conn, df, commune_ids)
+            n_rows += len(df)
+
+        report = tracker.report()
+        if not check_duplicates(report, strict):
+            conn.close()
+            _remove_db_files(tmp_path)
+            return None
+        with conn:
+            record_duplicates(conn, report)
+
+        refresh_summaries(conn)
+        with conn:
+            for sql in INDEXES.values():
+                conn.execute(sql)
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = WAL")
+    except Exception:
+        conn.close()
+        _remove_db_files(tmp_path)
+        raise
+    conn.close()
+
+    # The old journal files must not be replayed on the new database
+    for suffix in ("-journal", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp_path, db_path)
+    return n_rows
+
+
+def load_changed_years(conn, strict=False):
+    """
+    Chargement incrémental : ne recharge que les années dont la partition
+    nettoyée (data/cleaned/by_year/) a changé depuis le dernier chargement.
+
+    Les mesures d'une année modifiée sont remplacées dans une seule
+    transaction ; les années inchangées ne sont pas touchées. Avec `strict`,
+    une année ayant des doublons conflictuels n'est pas rechargée.
+
+    Returns:
+        bool: False si le manifeste est absent (un chargement complet est nécessaire)
+    """
+    manifest = load_manifest()
+    if not manifest["files"]:
+        print("Manifeste du nettoyage introuvable : chargement complet.")
+        return False
+
+    wanted = {entry["year"]: entry for entry in manifest["files"].values()}
+    loaded = dict(conn.execute("SELECT annee, partition_sha256 FROM load_manifest").fetchall())
+
+    changed = [year for year, entry in sorted(wanted.items()) if loaded.get(year) != entry["partition_sha256"]]
+    present = {row[0] for row in conn.execute("SELECT DISTINCT annee FROM measurement")}
+    removed = sorted(year for year in present | set(loaded) if year not in wanted)
+
+    if not changed and not removed:
+        print("Aucune année modifiée : base de données à jour.")
+        # Synthèse absente (base migrée) : recalculée entièrement
+        refresh_summaries(conn, [])
+        return True
+
+    commune_ids = CommuneIds()
+    for year in changed:
+        entry = wanted[year]
+        df = read_cleaned_csv(partition_path(year))
+        report = analyze_duplicates(df)
+        if len(report) and not check_duplicates(report, strict):
+            print(f"  ✗ {year} : année non rechargée")
+            continue
+        with conn:
+            conn.execute("DELETE FROM measurement WHERE annee = ?", (year,))
+            conn.execute("DELETE FROM duplicate_keys WHERE annee = ?", (year,))
+            insert_frame(conn, df, commune_ids)
+            record_duplicates(conn, report)
+            conn.execute(
+                "INSERT OR REPLACE INTO load_manifest (annee, partition_sha256, rows) VALUES (?, ?, ?)",
+                (year, entry["partition_sha256"], len(df))
+            )
+        print(f"  ✓ {year} : {len(df)} lignes rechargées")
+
+    for year in removed:
+        with conn:
+            conn.execute("DELETE FROM measurement WHERE annee = ?", (year,))
+            conn.execute("DELETE FROM duplicate_keys WHERE annee = ?", (year,))
+            conn.execute("DELETE FROM load_manifest WHERE annee = ?", (year,))
+        print(f"  ✗ {year} : année supprimée")
+
+    if removed:
+        # Communes that no longer have any measurement
+        with conn:
+            conn.execute("DELETE FROM commune WHERE id NOT IN (SELECT commune_id FROM measurement)")
+
+    # Statistiques et histogrammes des années modifiées seulement
+    refresh_summaries(conn, changed + removed)
+    return True
+
+
+def create_database(incremental=False, bulk=False, db_path=DB_PATH, data_path=DATA_PATH, verbose=True, parquet=False,
+                    strict=False):
     """
     Script de création et peuplement de la base de données SQLite
+
+    Args:
+        incremental (bool): Ne recharger que les années modifiées depuis le
+            dernier chargement (nécessite `clean_data.py --incremental`)
+        bulk (bool): Chargement complet en masse (voir bulk_load) au lieu
+            d'une insertion du CSV entier dans la base existante
+        db_path (str): Base à créer (défaut : data/air_quality.db)
+        data_path (str): CSV nettoyé à charger
+        verbose (bool): Afficher la requête de vérification par année
+        parquet (bool): Exporter aussi la base en jeu Parquet partitionné
+            par année (stockage "parquet" de src.database.storage)
+        strict (bool): Refuser les données ayant des doublons conflictuels
+            (même clé com_insee, annee avec des valeurs différentes)
     """
     print("\n=== CRÉATION DE LA BASE DE DONNÉES ===")
-    
-    # Définir les chemins
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    data_path = os.path.join(base_dir, "data", "cleaned", "cleaned_air_quality_with_year.csv")
-    db_path = os.path.join(base_dir, "data", "air_quality.db")
-
-    # Charger le CSV nettoyé
-    print(f"Chargement du fichier nettoyé : {data_path}")
-    
-    if not os.path.exists(data_path):
-        print(f"Fichier CSV introuvable : {data_path}")
-        return False
-        
-    df = pd.read_csv(data_path)
 
     # Connexion à la base (elle est créée si elle n'existe pas)
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    # Création de la table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS air_quality (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        com_insee TEXT,
-        commune TEXT,
-        population REAL,
-        annee INTEGER,
-        pm25 REAL,
-        pm25_pop REAL,
-        pm10 REAL,
-        pm10_pop REAL,
-        no2 REAL,
-        no2_pop REAL,
-        o3 REAL,
-        o3_pop REAL,
-        aot40 REAL,
-        somo35 REAL,
-        somo35_pop REAL
-    )
-    """)
-
-    conn.commit()
-
-    # Harmonisation des noms de colonnes avant insertion
-    mapping = {
-        'COM Insee': 'com_insee',
-        'Commune': 'commune',
-        'Population': 'population',
-        'Année': 'annee',
-        'Moyenne annuelle de concentration de PM25 (ug/m3)': 'pm25',
-        'Moyenne annuelle de concentration de PM25 ponderee par la population (ug/m3)': 'pm25_pop',
-        'Moyenne annuelle de concentration de PM10 (ug/m3)': 'pm10',
-        'Moyenne annuelle de concentration de PM10 ponderee par la population (ug/m3)': 'pm10_pop',
-        'Moyenne annuelle de concentration de NO2 (ug/m3)': 'no2',
-        'Moyenne annuelle de concentration de NO2 ponderee par la population (ug/m3)': 'no2_pop',
-        'Moyenne annuelle de concentration de O3 (ug/m3)': 'o3',
-        'Moyenne annuelle de concentration de O3 ponderee par la population (ug/m3)': 'o3_pop',
-        "Moyenne annuelle d'AOT 40 (ug/m3.heure)": 'aot40',
-        'Moyenne annuelle de somo 35 (ug/m3.jour)': 'somo35',
-        'Moyenne annuelle de somo 35 pondere par la population (ug/m3.jour)': 'somo35_pop',
-    }
-
-    df = df.rename(columns=mapping)
+    # Création des tables commune / measurement, des vues et des index
+    # (une base existante au format air_quality est migrée)
+    create_schema(conn)
+    # Mode WAL (persistant) : les lecteurs en lecture seule ne bloquent pas le chargement
+    conn.execute("PRAGMA journal_mode = WAL")
 
-    # Garder uniquement les colonnes utiles
-    cols = list(mapping.values())
-    df = df[cols]
+    if not (incremental and load_changed_years(conn, strict)):
+        # Charger le CSV nettoyé
+        print(f"Chargement du fichier nettoyé : {data_path}")
+
+        if not os.path.exists(data_path):
+            print(f"Fichier CSV introuvable : {data_path}")
+            conn.close()
+            return False
 
-    # Vider la table avant insertion (optionnel)
-    cursor.execute("DELETE FROM air_quality")
-    conn.commit()
+        if bulk:
+            conn.close()
+            if bulk_load(db_path, data_path, strict) is None:
+                return False
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+        else:
+            df = read_cleaned_csv(data_path)
 
-    # Insérer les données dans SQLite
-    df.to_sql("air_quality", conn, if_exists="append", index=False)
-    conn.commit()
+            # Validation des doublons avant de toucher à la base
+            report = analyze_duplicates(df)
+            if not check_duplicates(report, strict):
+                conn.close()
+                return False
+
+            # Vider les tables avant insertion (optionnel)
+            cursor.execute("DELETE FROM measurement")
+            cursor.execute("DELETE FROM commune")
+            cursor.execute("DELETE FROM duplicate_keys")
+            # Le prochain chargement incrémental repartira de zéro
+            cursor.execute("DELETE FROM load_manifest")
+            conn.commit()
+
+            # Insérer les données dans SQLite (doublons résolus par la clé primaire)
+            with conn:
+                insert_frame(conn, df)
+                record_duplicates(conn, report)
+            refresh_summaries(conn)
+
+    # Coordonnées des communes (plus de fusion avec le CSV à chaque carte)
+    located = load_coordinates(conn)
 
     # Vérification
     count = cursor.execute("SELECT COUNT(*) FROM air_quality").fetchone()[0]
-    
+    communes = cursor.execute("SELECT COUNT(*) FROM commune").fetchone()[0]
+
     print(f" Base de données créée avec succès : {db_path}")
-    print(f"Nombre de lignes insérées : {count}")
+    print(f"Nombre de lignes dans la base : {count}")
+    print(f"Nombre de communes : {communes} (dont {located} avec coordonnées)")
+    duplicates = cursor.execute(
+        "SELECT COUNT(*), COALESCE(SUM(occurrences - 1), 0), COALESCE(SUM(kind = ?), 0) FROM duplicate_keys",
+        (CONFLICTING,)
+    ).fetchone()
+    print(f"Clés (com_insee, annee) en double : {duplicates[0]} ({duplicates[1]} lignes remplacées, "
+          f"{duplicates[2]} conflictuelles)")
 
-    # Test query
-    query = "SELECT annee, COUNT(*) as nb_communes, AVG(no2) as moyenne_no2 FROM air_quality GROUP BY annee;"
-    df_test = pd.read_sql_query(query, conn)
+    if parquet:
+        print("Export du jeu Parquet partitionné par année...")
+        build_parquet_dataset(db_path)
+        # The export reads through the shared pool: no connection stays open on the file
+        close_pools()
+
+    if not verbose:
+        conn.close()
+        return True
+
+    # Test query : lue dans la table de synthèse (pas de parcours de measurement)
+    df_test = load_summary(conn, 'no2')[['annee', 'n', 'mean', 'weighted_mean']]
+    df_test.columns = ['annee', 'nb_communes', 'moyenne_no2', 'moyenne_no2_ponderee']
     print("\ Données par année :")
     print(df_test)
 
@@ -100,4 +643,15 @@ def create_database():
     return True
 
 if __name__ == "__main__":
-    create_database()
+    parser = argparse.ArgumentParser(description="Création de la base SQLite (tables commune / measurement)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne recharge que les années modifiées depuis le dernier chargement")
+    parser.add_argument("--bulk", action="store_true",
+                        help="chargement complet en masse (executemany par blocs, index reconstruits à la fin)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="exporte aussi la base en jeu Parquet partitionné par année (data/parquet/)")
+    parser.add_argument("--strict", action="store_true",
+                        help="abandonne le chargement si une clé (com_insee, annee) a des valeurs différentes")
+    args = parser.parse_args()
+
+    create_database(incremental=args.incremental, bulk=args.bulk, parquet=args.parquet, strict=args.strict)
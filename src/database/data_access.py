@@ -0,0 +1,208 @@
+"""
+Accès aux données de la base SQLite pour les graphiques.
+
+Au lieu de charger toute la table (SELECT * FROM air_quality) puis de filtrer
+en pandas, chaque graphique demande seulement ce dont il a besoin : l'année,
+le polluant, les colonnes et, pour les nuages de points, la population
+minimale sont passés à la requête SQL. Les requêtes sont paramétrées et leur
+texte ne dépend que de la forme de la demande : sqlite3 réutilise donc les
+requêtes préparées (cache de la connexion) d'une année à l'autre.
+
+    with read_connection() as conn:
+        df = fetch_pollutant(conn, 2012, 'no2', columns=[COM_INSEE, POPULATION],
+                             min_population=SCATTER_MIN_POPULATION)
+
+Les connexions viennent du pool en lecture seule de src.database.connection.
+"""
+import sqlite3
+from functools import lru_cache
+
+import pandas as pd
+
+from src.utils.schema import (ANNEE, COLUMNS, COM_INSEE, COMMUNE, POLLUTANT_COLUMNS, SCATTER_MIN_POPULATION,
+                              apply_schema)
+
+# Columns stored in the commune table; the others come from measurement
+COMMUNE_COLUMNS = {COM_INSEE: "c.com_insee", COMMUNE: "c.nom"}
+
+
+def _expression(col):
+    return COMMUNE_COLUMNS.get(col, f"m.{col}")
+
+
+@lru_cache(maxsize=None)
+def build_query(columns, by_year=True, min_population=False, not_null=None, order_by=None, by_commune=False):
+    """
+    Builds the SQL text of a request. Column names are checked against the
+    schema (they cannot be bound as parameters); the year and the population
+    threshold are bound parameters, so the same text serves every year.
+
+    Args:
+        columns (tuple): Canonical columns to return
+        by_year (bool): Filter on `annee = ?`
+        min_population (bool): Filter on `population > ?`
+        not_null (str): Column whose missing values are skipped
+        order_by (str): Sort column
+        by_commune (bool): Filter on `com_insee = ?` (history of one commune)
+
+    Returns:
+        str: The SQL query
+    """
+    unknown = [col for col in columns + (not_null, order_by) if col is not None and col not in COLUMNS]
+    if unknown:
+        raise KeyError(f"Colonnes inconnues : {unknown}. Colonnes disponibles : {COLUMNS}")
+
+    select = [f"{_expression(col)} AS {col}" for col in columns]
+    source = "measurement m"
+    if by_commune or any(col in COMMUNE_COLUMNS for col in columns + (not_null, order_by)):
+        source += " JOIN commune c ON c.id = m.commune_id"
+
+    where = []
+    if by_commune:
+        where.append("c.com_insee = ?")
+    if by_year:
+        where.append("m.annee = ?")
+    if min_population:
+        where.append("m.population > ?")
+    if not_null is not None:
+        where.append(f"{_expression(not_null)} IS NOT NULL")
+
+    query = f"SELECT {', '.join(select)} FROM {source}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    if order_by is not None:
+        query += f" ORDER BY {_expression(order_by)}"
+    return query
+
+
+def fetch_pollutant(conn, year, pollutant, columns=(), min_population=None, drop_missing=False, order_by=None):
+    """
+    Lit les valeurs d'un polluant pour une année, avec seulement les
+    colonnes demandées.
+
+    Args:
+        conn (sqlite3.Connection): Connexion à la base
+        year (int): Année
+        pollutant (str): Colonne canonique du polluant ('no2', 'pm10_pop'...)
+        columns (iterable): Colonnes supplémentaires (com_insee, population...)
+        min_population (float): Ne garder que les communes de population
+            strictement supérieure
+        drop_missing (bool): Ignorer les communes sans valeur pour le polluant
+        order_by (str): Colonne de tri
+
+    Returns:
+        pandas.DataFrame: Colonnes demandées puis le polluant, types compacts
+    """
+    if pollutant not in POLLUTANT_COLUMNS:
+        raise KeyError(f"Polluant inconnu : '{pollutant}'. Colonnes disponibles : {POLLUTANT_COLUMNS}")
+
+    selected = tuple(col for col in columns if col != pollutant) + (pollutant,)
+    query = build_query(selected, by_year=True, min_population=min_population is not None,
+                        not_null=pollutant if drop_missing else None, order_by=order_by)
+    params = (int(year),) if min_population is None else (int(year), min_population)
+    return apply_schema(pd.read_sql_query(query, conn, params=params))
+
+
+def fetch_columns(conn, columns=COLUMNS, year=None):
+    """
+    Lit des colonnes de toutes les communes (d'une année, ou de toutes).
+
+    Returns:
+        pandas.DataFrame: Colonnes demandées, types compacts
+    """
+    query = build_query(tuple(columns), by_year=year is not None)
+    params = () if year is None else (int(year),)
+    return apply_schema(pd.read_sql_query(query, conn, params=params))
+
+
+# Communes in the box, from the R-tree (commune_rtree) then the exact coordinates
+BBOX_RTREE_SQL = """
+SELECT c.com_insee, c.nom_officiel, c.latitude, c.longitude, m.population, m.{pollutant}
+FROM commune_rtree r
+JOIN commune c ON c.id = r.id
+JOIN measurement m ON m.commune_id = c.id AND m.annee = ?
+WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+  AND c.latitude BETWEEN ? AND ? AND c.longitude BETWEEN ? AND ?
+"""
+
+# Same query without the spatial index (database built without the R-tree module)
+BBOX_SCAN_SQL = """
+SELECT c.com_insee, c.nom_officiel, c.latitude, c.longitude, m.population, m.{pollutant}
+FROM commune c
+JOIN measurement m ON m.commune_id = c.id AND m.annee = ?
+WHERE c.latitude BETWEEN ? AND ? AND c.longitude BETWEEN ? AND ?
+"""
+
+
+def fetch_bbox(conn, year, pollutant, south, west, north, east):
+    """
+    Lit les mesures d'un polluant pour une année dans un rectangle de
+    coordonnées (la zone affichée d'une carte), avec l'index R-tree des
+    communes.
+
+    Args:
+        year (int): Année
+        pollutant (str): Colonne canonique du polluant
+        south, west, north, east (float): Latitudes et longitudes limites (degrés)
+
+    Returns:
+        pandas.DataFrame: com_insee, nom_officiel, latitude, longitude,
+        population et le polluant, une ligne par commune de la zone
+    """
+    if pollutant not in POLLUTANT_COLUMNS:
+        raise KeyError(f"Polluant inconnu : '{pollutant}'. Colonnes disponibles : {POLLUTANT_COLUMNS}")
+
+    box = (south, north, west, east)
+    try:
+        df = pd.read_sql_query(BBOX_RTREE_SQL.format(pollutant=pollutant), conn, params=(int(year),) + box + box)
+    except pd.errors.DatabaseError:
+        df = pd.read_sql_query(BBOX_SCAN_SQL.format(pollutant=pollutant), conn, params=(int(year),) + box)
+    return apply_schema(df)
+
+
+def available_series(conn):
+    """
+    Renvoie, pour chaque année, les polluants ayant au moins une valeur. La
+    table de synthèse (pollutant_summary) est lue si elle est remplie, sinon
+    les valeurs sont comptées dans measurement.
+
+    Returns:
+        dict: {annee: set de colonnes de polluants}
+    """
+    series = {}
+    try:
+        rows = conn.execute("SELECT annee, pollutant FROM pollutant_summary WHERE n > 0").fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+
+    if not rows:
+        counts = ", ".join(f"COUNT({col})" for col in POLLUTANT_COLUMNS)
+        for row in conn.execute(f"SELECT {ANNEE}, {counts} FROM measurement GROUP BY {ANNEE}"):
+            series[row[0]] = {col for col, n in zip(POLLUTANT_COLUMNS, row[1:]) if n > 0}
+        return series
+
+    for year, pollutant in rows:
+        series.setdefault(year, set()).add(pollutant)
+    return series
+
+
+def value_ranges(conn):
+    """
+    Renvoie l'étendue (min, max) de chaque polluant sur toutes les années.
+    La table histogram_edges est lue si elle est remplie, sinon l'étendue est
+    calculée sur measurement.
+
+    Returns:
+        dict: {colonne de polluant: (min, max)} des polluants renseignés
+    """
+    try:
+        rows = conn.execute("SELECT pollutant, lower, upper FROM histogram_edges").fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+
+    if not rows:
+        extremes = ", ".join(f"MIN({col}), MAX({col})" for col in POLLUTANT_COLUMNS)
+        row = conn.execute(f"SELECT {extremes} FROM measurement").fetchone()
+        rows = [(col, row[2 * i], row[2 * i + 1]) for i, col in enumerate(POLLUTANT_COLUMNS)]
+
+    return {col: (lower, upper) for col, lower, upper in rows if lower is not None}
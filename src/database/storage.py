@@ -0,0 +1,309 @@
+"""
+Stockage des données nettoyées derrière une même API de requête.
+
+Deux stockages interchangeables :
+
+    sqlite   la base data/air_quality.db (tables commune / measurement),
+             lue par le pool de connexions en lecture seule
+    parquet  un jeu de données Parquet partitionné par année
+             (data/parquet/annee=2012/part-0.parquet, lignes triées par code
+             INSEE), construit à partir de la base
+
+Les deux acceptent les mêmes filtres (année, commune, population minimale,
+valeurs renseignées d'une colonne) et la même projection de colonnes, et
+renvoient des DataFrames au schéma commun. Le stockage utilisé par défaut est
+choisi par config.STORAGE_BACKEND (variable d'environnement
+AIR_QUALITY_STORAGE) :
+
+    storage = get_storage()              # ou get_storage("parquet")
+    df = storage.query(columns=[COM_INSEE, POPULATION, 'no2'], year=2012, min_population=1500)
+
+Construction du jeu Parquet (après create_db.py) :
+    python src/database/storage.py
+"""
+import argparse
+import os
+from abc import ABC, abstractmethod
+import shutil
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from config import PARQUET_DATASET_PATH, STORAGE_BACKEND
+from src.database.connection import DB_PATH, read_connection
+from src.database.data_access import available_series, build_query, value_ranges
+from src.utils.schema import ANNEE, COLUMNS, COM_INSEE, COMMUNE, POLLUTANT_COLUMNS, POPULATION, apply_schema
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+PARQUET_DIR = os.path.join(base_dir, PARQUET_DATASET_PATH)
+
+# Rows per Parquet row group: small enough for the min/max statistics of
+# com_insee to skip most of a partition when looking up one commune
+PARQUET_ROW_GROUP_SIZE = 4096
+
+
+class Storage(ABC):
+    """
+    API commune des stockages. Un stockage doit définir query, years,
+    available_series et value_ranges pour pouvoir être instancié.
+    """
+    name = None
+
+    @abstractmethod
+    def query(self, columns=None, year=None, com_insee=None, min_population=None, not_null=None, order_by=None):
+        """
+        Lit les lignes correspondant aux filtres, avec seulement les colonnes demandées.
+
+        Args:
+            columns (list): Colonnes canoniques à renvoyer (défaut : toutes)
+            year (int): Année
+            com_insee (str): Code INSEE d'une commune (historique de la commune)
+            min_population (float): Population strictement supérieure à
+            not_null (str): Colonne dont les valeurs manquantes sont ignorées
+            order_by (str): Colonne de tri
+
+        Returns:
+            pandas.DataFrame: Colonnes demandées, types compacts du schéma commun
+        """
+
+    @abstractmethod
+    def years(self):
+        """
+        Returns the sorted list of the years stored.
+        """
+
+    @abstractmethod
+    def available_series(self):
+        """
+        Returns {annee: set of pollutant columns having at least one value}.
+        """
+
+    @abstractmethod
+    def value_ranges(self):
+        """
+        Returns {pollutant column: (min, max)} over all the years, for the
+        pollutants having at least one value.
+        """
+
+    def data_signature(self, year):
+        """
+        Returns a string that changes whenever the rows of `year` change (used
+        as cache key without reading the rows), or None if unknown.
+        """
+        return None
+
+
+def _check_columns(columns):
+    columns = list(COLUMNS if columns is None else columns)
+    unknown = [col for col in columns if col not in COLUMNS]
+    if unknown:
+        raise KeyError(f"Colonnes inconnues : {unknown}. Colonnes disponibles : {COLUMNS}")
+    return columns
+
+
+class SqliteStorage(Storage):
+    """
+    Base SQLite : les filtres et la projection sont traduits en une requête
+    paramétrée (src.database.data_access.build_query).
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path=DB_PATH):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Base de données introuvable : {db_path}")
+        self.db_path = db_path
+
+    def query(self, columns=None, year=None, com_insee=None, min_population=None, not_null=None, order_by=None):
+        columns = _check_columns(columns)
+        sql = build_query(tuple(columns), by_year=year is not None, min_population=min_population is not None,
+                          not_null=not_null, order_by=order_by, by_commune=com_insee is not None)
+        # Same order as the WHERE clauses of build_query
+        params = [value for value in (com_insee, year, min_population) if value is not None]
+        with read_connection(self.db_path) as conn:
+            return apply_schema(pd.read_sql_query(sql, conn, params=params))
+
+    def years(self):
+        with read_connection(self.db_path) as conn:
+            return [row[0] for row in conn.execute(f"SELECT DISTINCT {ANNEE} FROM measurement ORDER BY {ANNEE}")]
+
+    def available_series(self):
+        with read_connection(self.db_path) as conn:
+            return available_series(conn)
+
+    def value_ranges(self):
+        with read_connection(self.db_path) as conn:
+            return value_ranges(conn)
+
+    def data_signature(self, year):
+        """
+        Reads the digest stored by the summary tables (year_digest).
+        """
+        with read_connection(self.db_path) as conn:
+            try:
+                row = conn.execute("SELECT sha256 FROM year_digest WHERE annee = ?", (int(year),)).fetchone()
+            except sqlite3.OperationalError:
+                return None
+        return row[0] if row else None
+
+
+class ParquetStorage(Storage):
+    """
+    Jeu Parquet partitionné par année (partitionnement « hive » : un dossier
+    annee=AAAA par année). Un filtre sur l'année ne lit qu'une partition, un
+    filtre sur la commune saute les groupes de lignes grâce aux statistiques
+    min / max du code INSEE.
+    """
+    name = "parquet"
+
+    def __init__(self, folder=PARQUET_DIR):
+        import pyarrow.dataset as ds
+
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"Jeu Parquet introuvable : {folder} (python src/database/storage.py)")
+        self.folder = folder
+        self.dataset = ds.dataset(folder, format="parquet", partitioning="hive")
+
+    def query(self, columns=None, year=None, com_insee=None, min_population=None, not_null=None, order_by=None):
+        import pyarrow.dataset as ds
+
+        columns = _check_columns(columns)
+        conditions = []
+        if com_insee is not None:
+            conditions.append(ds.field(COM_INSEE) == com_insee)
+        if year is not None:
+            conditions.append(ds.field(ANNEE) == int(year))
+        if min_population is not None:
+            conditions.append(ds.field(POPULATION) > min_population)
+        if not_null is not None:
+            conditions.append(ds.field(not_null).is_valid())
+
+        condition = None
+        for expression in conditions:
+            condition = expression if condition is None else condition & expression
+
+        read = columns if order_by is None or order_by in columns else columns + [order_by]
+        df = self.dataset.to_table(columns=read, filter=condition).to_pandas()
+        if order_by is not None:
+            df = df.sort_values(order_by, kind="stable", ignore_index=True)[columns]
+        return apply_schema(df)
+
+    def years(self):
+        return sorted(int(name.split("=", 1)[1]) for name in os.listdir(self.folder) if name.startswith(f"{ANNEE}="))
+
+    def available_series(self):
+        """
+        Counts the values from the row group statistics only (no data is read).
+        """
+        counts = {}
+        for fragment in self.dataset.get_fragments():
+            year = int(os.path.basename(os.path.dirname(fragment.path)).split("=", 1)[1])
+            metadata = fragment.metadata
+            names = metadata.schema.names
+            year_counts = counts.setdefault(year, dict.fromkeys(POLLUTANT_COLUMNS, 0))
+            for i in range(metadata.num_row_groups):
+                row_group = metadata.row_group(i)
+                for col in POLLUTANT_COLUMNS:
+                    column = row_group.column(names.index(col))
+                    nulls = column.statistics.null_count if column.statistics is not None else 0
+                    year_counts[col] += row_group.num_rows - nulls
+        return {year: {col for col, n in year_counts.items() if n > 0} for year, year_counts in counts.items()}
+
+    def value_ranges(self):
+        """
+        Reads the min / max from the row group statistics only (no data is read).
+        """
+        ranges = {}
+        for fragment in self.dataset.get_fragments():
+            metadata = fragment.metadata
+            names = metadata.schema.names
+            for i in range(metadata.num_row_groups):
+                row_group = metadata.row_group(i)
+                for col in POLLUTANT_COLUMNS:
+                    statistics = row_group.column(names.index(col)).statistics
+                    if statistics is None or not statistics.has_min_max:
+                        continue
+                    lower, upper = ranges.get(col, (statistics.min, statistics.max))
+                    ranges[col] = (min(lower, statistics.min), max(upper, statistics.max))
+        return {col: (float(lower), float(upper)) for col, (lower, upper) in ranges.items()}
+
+    def data_signature(self, year):
+        """
+        Size and modification time of the files of the year's partition (the
+        dataset is rewritten as a whole by build_parquet_dataset).
+        """
+        partition = os.path.join(self.folder, f"{ANNEE}={int(year)}")
+        if not os.path.isdir(partition):
+            return None
+        files = sorted(os.scandir(partition), key=lambda entry: entry.name)
+        return ";".join(f"{entry.name}:{entry.stat().st_size}:{entry.stat().st_mtime_ns}" for entry in files)
+
+
+BACKENDS = {"sqlite": SqliteStorage, "parquet": ParquetStorage}
+
+
+def get_storage(backend=None, **options):
+    """
+    Renvoie le stockage choisi (défaut : config.STORAGE_BACKEND).
+
+    Args:
+        backend (str): "sqlite" ou "parquet"
+        options: Arguments du stockage (db_path, folder)
+    """
+    backend = backend or STORAGE_BACKEND
+    try:
+        return BACKENDS[backend](**options)
+    except KeyError:
+        raise KeyError(f"Stockage inconnu : '{backend}'. Stockages disponibles : {list(BACKENDS)}") from None
+
+
+def build_parquet_dataset(db_path=DB_PATH, folder=PARQUET_DIR, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Exporte la base SQLite en jeu Parquet partitionné par année. Le jeu est
+    écrit dans un dossier temporaire qui remplace l'ancien une fois complet.
+
+    Returns:
+        int: Nombre de lignes exportées
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    storage = SqliteStorage(db_path)
+    tmp_folder = folder + ".tmp"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    n_rows = 0
+    columns = [col for col in COLUMNS if col != ANNEE]
+    # Declared schema: a year without any value must not get a null column type
+    schema = pa.schema([(col, pa.string() if col in (COM_INSEE, COMMUNE) else pa.float32()) for col in columns])
+    for year in storage.years():
+        df = storage.query(columns=columns, year=year, order_by=COM_INSEE)
+        # Plain strings in the files: the categories differ from one year to the other
+        for col in (COM_INSEE, COMMUNE):
+            df[col] = df[col].astype(str).where(df[col].notna(), None)
+        partition = os.path.join(tmp_folder, f"{ANNEE}={year}")
+        os.makedirs(partition)
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                       os.path.join(partition, "part-0.parquet"), row_group_size=row_group_size)
+        n_rows += len(df)
+        print(f"  ✓ {year} : {len(df)} lignes")
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
+    return n_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construction du jeu Parquet partitionné par année")
+    parser.add_argument("--db", default=DB_PATH, help="base SQLite à exporter")
+    parser.add_argument("--folder", default=PARQUET_DIR, help="dossier du jeu Parquet")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Base de données introuvable : {args.db}")
+        sys.exit(1)
+    print(f"Export de {args.db} vers {args.folder}")
+    rows = build_parquet_dataset(args.db, args.folder)
+    print(f"Jeu Parquet créé : {rows} lignes")
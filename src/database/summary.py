@@ -0,0 +1,259 @@
+"""
+Tables de synthèse de la base SQLite, maintenues au chargement.
+
+Pour chaque (année, polluant) :
+
+    pollutant_summary    nombre de communes renseignées, moyenne, moyenne
+                         pondérée par la population, min / max et quantiles
+    pollutant_histogram  effectifs par classe d'histogramme
+    year_digest          empreinte du contenu de l'année (codes, noms,
+                         population, polluants), qui sert de clé au cache
+                         des graphiques sans relire les données
+
+Les bornes des classes sont fixes pour un polluant (mêmes classes pour toutes
+les années, table histogram_edges) : elles couvrent le min / max de toutes
+les années. Les histogrammes et tableaux de bord lisent ainsi quelques
+centaines de lignes au lieu de parcourir toute la table measurement.
+
+Un chargement complet recalcule tout ; un chargement incrémental ne recalcule
+que les années modifiées, sauf si l'étendue d'un polluant a changé (les
+classes de toutes les années sont alors recalculées).
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.utils.schema import COM_INSEE, COMMUNE, POLLUTANT_COLUMNS, POPULATION
+
+# Number of histogram bins (same as the nbinsx of the plotly histograms)
+HISTOGRAM_BINS = 30
+
+QUANTILES = {"p05": 0.05, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p95": 0.95}
+
+CREATE_SUMMARY_SQL = f"""
+CREATE TABLE IF NOT EXISTS pollutant_summary (
+    annee INTEGER NOT NULL,
+    pollutant TEXT NOT NULL,
+    n INTEGER,
+    mean REAL,
+    weighted_mean REAL,
+    min REAL,
+    max REAL,
+    {', '.join(f'{name} REAL' for name in QUANTILES)},
+    PRIMARY KEY (annee, pollutant)
+) WITHOUT ROWID
+"""
+
+CREATE_EDGES_SQL = """
+CREATE TABLE IF NOT EXISTS histogram_edges (
+    pollutant TEXT PRIMARY KEY,
+    lower REAL,
+    upper REAL,
+    bins INTEGER
+)
+"""
+
+CREATE_HISTOGRAM_SQL = """
+CREATE TABLE IF NOT EXISTS pollutant_histogram (
+    pollutant TEXT NOT NULL,
+    annee INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    lower REAL,
+    upper REAL,
+    count INTEGER,
+    PRIMARY KEY (pollutant, annee, bin)
+) WITHOUT ROWID
+"""
+
+CREATE_DIGEST_SQL = """
+CREATE TABLE IF NOT EXISTS year_digest (
+    annee INTEGER PRIMARY KEY,
+    sha256 TEXT
+)
+"""
+
+SUMMARY_TABLES = ["pollutant_summary", "pollutant_histogram", "histogram_edges", "year_digest"]
+
+INSERT_SUMMARY_SQL = (
+    f"INSERT OR REPLACE INTO pollutant_summary "
+    f"(annee, pollutant, n, mean, weighted_mean, min, max, {', '.join(QUANTILES)}) "
+    f"VALUES ({', '.join('?' * (7 + len(QUANTILES)))})"
+)
+
+INSERT_HISTOGRAM_SQL = (
+    "INSERT OR REPLACE INTO pollutant_histogram (pollutant, annee, bin, lower, upper, count) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def create_summary_tables(conn):
+    """
+    Crée les tables de synthèse si elles n'existent pas.
+    """
+    with conn:
+        for sql in (CREATE_SUMMARY_SQL, CREATE_EDGES_SQL, CREATE_HISTOGRAM_SQL, CREATE_DIGEST_SQL):
+            conn.execute(sql)
+
+
+def weight_column(col):
+    """
+    Returns the column averaged by the population-weighted mean of a pollutant:
+    its `*_pop` column (concentration weighted by the population inside the
+    commune) when the data has one, the pollutant itself otherwise.
+    """
+    pop = f"{col}_pop"
+    return pop if pop in POLLUTANT_COLUMNS else col
+
+
+def histogram_edges(lower, upper, bins=HISTOGRAM_BINS):
+    """
+    Returns the bins + 1 edges of a pollutant (a single value gets a bin of width 1).
+    """
+    if lower == upper:
+        lower, upper = lower - 0.5, upper + 0.5
+    return np.linspace(lower, upper, bins + 1)
+
+
+def _stored_edges(conn):
+    return {row[0]: (row[1], row[2], row[3])
+            for row in conn.execute("SELECT pollutant, lower, upper, bins FROM histogram_edges")}
+
+
+def _global_ranges(conn):
+    """
+    Min / max of each pollutant over all the years of the measurement table.
+    """
+    sql = "SELECT " + ", ".join(f"MIN({col}), MAX({col})" for col in POLLUTANT_COLUMNS) + " FROM measurement"
+    row = conn.execute(sql).fetchone()
+    return {col: (row[2 * i], row[2 * i + 1]) for i, col in enumerate(POLLUTANT_COLUMNS)}
+
+
+def year_digest(df):
+    """
+    Returns the SHA-256 of the rows of one year (sorted by INSEE code).
+    """
+    digest = hashlib.sha256(",".join(df.columns).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def summarize_year(df, year, edges):
+    """
+    Computes the summary and histogram rows of one year.
+
+    Args:
+        df (pd.DataFrame): population and pollutant columns of the year
+        edges (dict): {pollutant: bin edges, or None if it has no value}
+
+    Returns:
+        tuple: (summary rows, histogram rows)
+    """
+    summaries, histograms = [], []
+    population = df[POPULATION].to_numpy(dtype='float64')
+
+    for col in POLLUTANT_COLUMNS:
+        values = df[col].to_numpy(dtype='float64')
+        valid = values[~np.isnan(values)]
+        if len(valid) == 0:
+            summaries.append((year, col, 0) + (None,) * (4 + len(QUANTILES)))
+            continue
+
+        weighted = df[weight_column(col)].to_numpy(dtype='float64')
+        mask = ~np.isnan(weighted) & ~np.isnan(population)
+        total = population[mask].sum()
+        weighted_mean = float(np.dot(weighted[mask], population[mask]) / total) if total > 0 else None
+
+        quantiles = np.quantile(valid, list(QUANTILES.values()))
+        summaries.append((year, col, len(valid), float(valid.mean()), weighted_mean,
+                          float(valid.min()), float(valid.max())) + tuple(quantiles.tolist()))
+
+        if edges.get(col) is not None:
+            counts, bin_edges = np.histogram(valid, bins=edges[col])
+            histograms.extend(
+                (col, year, i, float(bin_edges[i]), float(bin_edges[i + 1]), int(count))
+                for i, count in enumerate(counts)
+            )
+
+    return summaries, histograms
+
+
+def refresh_summaries(conn, years=None):
+    """
+    Recalcule les tables de synthèse, dans une seule transaction.
+
+    Args:
+        years (iterable): Années modifiées (ajoutées, rechargées ou
+            supprimées) ; None recalcule toutes les années
+
+    Returns:
+        list: Années recalculées
+    """
+    create_summary_tables(conn)
+
+    ranges = _global_ranges(conn)
+    stored = _stored_edges(conn)
+    wanted = {col: (lower, upper, HISTOGRAM_BINS) for col, (lower, upper) in ranges.items() if lower is not None}
+    # The bins of every year follow the range of the pollutant
+    if years is None or wanted != stored:
+        years = None
+
+    present = [row[0] for row in conn.execute("SELECT DISTINCT annee FROM measurement ORDER BY annee")]
+    targets = present if years is None else sorted(set(years) & set(present))
+    edges = {col: histogram_edges(*wanted[col]) if col in wanted else None for col in POLLUTANT_COLUMNS}
+
+    columns = ", ".join([f"c.com_insee AS {COM_INSEE}", f"c.nom AS {COMMUNE}"]
+                        + [f"m.{col}" for col in [POPULATION] + POLLUTANT_COLUMNS])
+    with conn:
+        if years is None:
+            for table in SUMMARY_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            conn.executemany("INSERT INTO histogram_edges (pollutant, lower, upper, bins) VALUES (?, ?, ?, ?)",
+                             [(col,) + wanted[col] for col in POLLUTANT_COLUMNS if col in wanted])
+        else:
+            for year in years:
+                conn.execute("DELETE FROM pollutant_summary WHERE annee = ?", (year,))
+                conn.execute("DELETE FROM pollutant_histogram WHERE annee = ?", (year,))
+                conn.execute("DELETE FROM year_digest WHERE annee = ?", (year,))
+
+        for year in targets:
+            df = pd.read_sql_query(
+                f"SELECT {columns} FROM measurement m JOIN commune c ON c.id = m.commune_id "
+                f"WHERE m.annee = ? ORDER BY c.com_insee", conn, params=(year,)
+            )
+            summaries, histograms = summarize_year(df, year, edges)
+            conn.executemany(INSERT_SUMMARY_SQL, summaries)
+            conn.executemany(INSERT_HISTOGRAM_SQL, histograms)
+            conn.execute("INSERT OR REPLACE INTO year_digest (annee, sha256) VALUES (?, ?)", (year, year_digest(df)))
+
+    return targets
+
+
+def load_summary(conn, pollutant=None):
+    """
+    Lit la synthèse par année (d'un polluant, ou de tous).
+
+    Returns:
+        pd.DataFrame: Une ligne par (annee, pollutant)
+    """
+    query = "SELECT * FROM pollutant_summary"
+    params = ()
+    if pollutant is not None:
+        query += " WHERE pollutant = ?"
+        params = (pollutant,)
+    return pd.read_sql_query(query + " ORDER BY pollutant, annee", conn, params=params)
+
+
+def load_histogram(conn, pollutant, year=None):
+    """
+    Lit les effectifs par classe d'un polluant (d'une année, ou de toutes).
+
+    Returns:
+        pd.DataFrame: Colonnes annee, bin, lower, upper, count
+    """
+    query = "SELECT annee, bin, lower, upper, count FROM pollutant_histogram WHERE pollutant = ?"
+    params = (pollutant,)
+    if year is not None:
+        query += " AND annee = ?"
+        params += (year,)
+    return pd.read_sql_query(query + " ORDER BY annee, bin", conn, params=params)
@@ -1,84 +1,75 @@
 # visualize_from_database.py
+import argparse
 import os
-import sqlite3
-import pandas as pd
-from plotly.io import write_html
+from src.database.storage import get_storage
 from src.utils.common_functions import load_commune_mappings
-from src.visualizations.scatter_plots import create_pollution_scatter
-from src.visualizations.histograms import create_pollution_histogram
+from src.utils.schema import POPULATION, SCATTER_MIN_POPULATION, apply_schema, pollutant_column
 
 
 def load_data_from_database():
     """
-    Charge les données depuis la base SQLite
+    Charge toute la table depuis le stockage configuré (les graphiques
+    lisent seulement leurs colonnes avec Storage.query)
     """
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-    db_path = os.path.join(base_dir, "data", "air_quality.db")
 
-    if not os.path.exists(db_path):
-        print(f" Base de données introuvable : {db_path}")
+    try:
+        df = get_storage().query()
+    except FileNotFoundError as e:
+        print(f" {e}")
         return None
 
-    conn = sqlite3.connect(db_path)
-    query = "SELECT * FROM air_quality"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
     return df, base_dir
 
 
 def prepare_data(df):
     """
-    Prépare les données en harmonisant les noms de colonnes
-    pour la compatibilité avec les fonctions de visualisation
+    Prépare les données : les colonnes de la base portent déjà les noms
+    canoniques, il reste à appliquer les types compacts du schéma commun
     """
-    # CORRECTION : Mapping vers les noms attendus par les fonctions de visualisation
-    rename_mapping = {
-        "com_insee": "COM Insee",
-        "commune": "Commune", 
-        "population": "Population",
-        "annee": "Année",
-        "pm25": "Moyenne annuelle de concentration de PM25 (ug/m3)",
-        "pm25_pop": "Moyenne annuelle de concentration de PM25 ponderee (ug/m3)",  # SUPPRIMÉ "par la population"
-        "pm10": "Moyenne annuelle de concentration de PM10 (ug/m3)", 
-        "pm10_pop": "Moyenne annuelle de concentration de PM10 ponderee (ug/m3)",  # SUPPRIMÉ "par la population"
-        "no2": "Moyenne annuelle de concentration de NO2 (ug/m3)",
-        "no2_pop": "Moyenne annuelle de concentration de NO2 ponderee (ug/m3)",    # SUPPRIMÉ "par la population"
-        "o3": "Moyenne annuelle de concentration de O3 (ug/m3)",
-        "o3_pop": "Moyenne annuelle de concentration de O3 ponderee (ug/m3)",      # SUPPRIMÉ "par la population"
-        "aot40": "Moyenne annuelle de concentration de AOT40 (ug/m3)",             # CORRIGÉ
-        "somo35": "Moyenne annuelle de concentration de SOMO35 (ug/m3)",           # CORRIGÉ
-        "somo35_pop": "Moyenne annuelle de concentration de SOMO35 ponderee (ug/m3)" # SUPPRIMÉ "par la population"
-    }
-
-    df.rename(columns=rename_mapping, inplace=True)
-    return df
-
-
-def generate_visualizations():
+    return apply_schema(df)
+
+
+def generate_visualizations(render_workers=None, shared_bins=True, max_points=None, density=False, bundle=False,
+                            use_cache=True):
     """
     Script de visualisation des données de pollution à partir de la base SQLite.
     Génère des graphiques (scatter + histogrammes) pour chaque polluant et chaque année.
+
+    Args:
+        render_workers (int): Nombre de processus utilisés pour générer les
+            graphiques (défaut : nombre de cœurs, 1 = séquentiel)
+        shared_bins (bool): Mêmes classes d'histogramme pour toutes les années
+            d'un polluant (étendue lue dans le stockage)
+        max_points (int): Nombre maximal de points par nuage de points, au-delà
+            les points sont décimés en conservant les extrêmes (défaut : tous)
+        density (bool): Génère aussi les cartes de densité population /
+            concentration (toutes les communes)
+        bundle (bool): Un fichier par polluant et type de graphique, avec
+            toutes les années et un curseur d'année (assets/bundles)
+        use_cache (bool): Ne regénère que les graphiques dont les données,
+            les paramètres ou le code ont changé (data/cache/render.json)
     """
-    print("\n=== VISUALISATION À PARTIR DE LA BASE DE DONNÉES ===")
+    from src.database.summary import histogram_edges
+    from src.visualizations.bundles import BUNDLE_DIR, bundle_path
+    from src.visualizations.render_cache import RenderCache
+    from src.visualizations.render_pool import RenderJob, bundle_jobs, job_columns, render_jobs
 
-    try:
-        # Charger les données
-        result = load_data_from_database()
-        if result is None:
-            return
-        df, base_dir = result
+    print("\n=== VISUALISATION À PARTIR DE LA BASE DE DONNÉES ===")
 
-        print(f" {len(df)} lignes chargées depuis la base de données\n")
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 
-        # Préparer les données
-        df = prepare_data(df)
+    # Stockage choisi par config.STORAGE_BACKEND (base SQLite ou jeu Parquet)
+    try:
+        storage = get_storage()
+    except FileNotFoundError as e:
+        print(f" {e}")
+        return
+    print(f"Stockage : {storage.name}")
 
-        # Debug : afficher les colonnes disponibles
-        print("Colonnes disponibles après renommage :")
-        for col in df.columns:
-            print(f"  - {col}")
-        print()
+    try:
+        # Années et polluants renseignés (synthèse du stockage) : aucune donnée chargée ici
+        séries = storage.available_series()
 
         # Charger les correspondances des communes
         commune_to_insee, insee_to_commune = load_commune_mappings()
@@ -87,66 +78,78 @@ def generate_visualizations():
             return
 
         # Vérification des années disponibles
-        années = sorted(df["Année"].unique())
+        années = sorted(séries)
         print(f"Années trouvées dans la base : {années}\n")
 
         # Créer le dossier de sortie
         output_dir = os.path.join(base_dir, "src", "database", "output")
         os.makedirs(output_dir, exist_ok=True)
 
-        # CORRECTION : Définir les polluants avec les noms exacts attendus par les fonctions
-        noms_colonnes = {
-            'NO2': "Moyenne annuelle de concentration de NO2 (ug/m3)",
-            'NO2 ponderee': "Moyenne annuelle de concentration de NO2 ponderee (ug/m3)",
-            'PM10': "Moyenne annuelle de concentration de PM10 (ug/m3)",
-            'PM10 ponderee': "Moyenne annuelle de concentration de PM10 ponderee (ug/m3)",
-            'PM25': "Moyenne annuelle de concentration de PM25 (ug/m3)",
-            'PM25 ponderee': "Moyenne annuelle de concentration de PM25 ponderee (ug/m3)",
-            'O3': "Moyenne annuelle de concentration de O3 (ug/m3)",
-            'O3 ponderee': "Moyenne annuelle de concentration de O3 ponderee (ug/m3)",
-            'AOT40': "Moyenne annuelle de concentration de AOT40 (ug/m3)",
-            'SOMO35': "Moyenne annuelle de concentration de SOMO35 (ug/m3)",
-            'SOMO35 ponderee': "Moyenne annuelle de concentration de SOMO35 ponderee (ug/m3)"
-        }
-
-        # Génération des graphiques
-        for année in années:
-            print(f" Traitement de l'année {année}...")
-            data_année = df[df["Année"] == année]
+        # Polluants à représenter et colonnes correspondantes du schéma commun
+        polluants = ['NO2', 'NO2 ponderee', 'PM10', 'PM10 ponderee', 'PM25', 'PM25 ponderee',
+                     'O3', 'O3 ponderee', 'AOT40', 'SOMO35', 'SOMO35 ponderee']
+        noms_colonnes = {polluant: pollutant_column(polluant) for polluant in polluants}
 
+        # Classes d'histogramme communes à toutes les années de chaque polluant
+        étendues = storage.value_ranges() if shared_bins else {}
+        classes = {colonne: histogram_edges(*étendues[colonne]) for colonne in étendues}
+
+        # Une tâche par graphique : chaque processus exécute lui-même la requête
+        # de son graphique sur le stockage
+        jobs = []
+        for année in années:
             for polluant, colonne in noms_colonnes.items():
-                # Vérification plus détaillée
-                if colonne not in data_année.columns:
-                    print(f"Colonne '{colonne}' non trouvée pour {polluant} en {année}")
-                    continue
-                
                 # Vérifier s'il y a des données non nulles
-                if data_année[colonne].isna().all():
+                if colonne not in séries[année]:
                     print(f"Données manquantes pour {polluant} en {année}")
                     continue
 
-                print(f"Génération des graphiques pour {polluant}...")
-
-                try:
-                    # Créer et sauvegarder le graphique de dispersion
-                    fig_scatter = create_pollution_scatter(data_année, insee_to_commune, polluant)
-                    scatter_file = os.path.join(output_dir, f"{polluant.replace(' ', '_')}_{année}_scatter.html")
-                    write_html(fig_scatter, scatter_file, auto_open=False, include_plotlyjs='cdn')
-
-                    # Créer et sauvegarder l'histogramme
-                    fig_hist = create_pollution_histogram(data_année, polluant)
-                    hist_file = os.path.join(output_dir, f"{polluant.replace(' ', '_')}_{année}_histogram.html")
-                    write_html(fig_hist, hist_file, auto_open=False, include_plotlyjs='cdn')
-
-                    print(f"Graphiques générés avec succès pour {polluant}")
-                except Exception as e:
-                    print(f"Erreur sur {polluant} ({année}) : {str(e)}")
-
-        print("\nToutes les visualisations ont été générées dans le dossier 'output'.")
+                nom = f"{polluant.replace(' ', '_')}_{année}"
+                # Nuage de points : communes de plus de 1500 habitants, triées par
+                # population dans la requête (index annee, population)
+                jobs.append(RenderJob('scatter', polluant, année, os.path.join(output_dir, f"{nom}_scatter.html"),
+                                      query=dict(columns=job_columns('scatter', colonne), year=année,
+                                                 min_population=SCATTER_MIN_POPULATION, order_by=POPULATION),
+                                      options=dict(max_points=max_points)))
+                # Histogramme : seulement les valeurs renseignées du polluant
+                jobs.append(RenderJob('histogram', polluant, année, os.path.join(output_dir, f"{nom}_histogram.html"),
+                                      query=dict(columns=job_columns('histogram', colonne), year=année,
+                                                 not_null=colonne),
+                                      options=dict(edges=classes.get(colonne))))
+                # Densité : toutes les communes dont la valeur est renseignée
+                if density:
+                    jobs.append(RenderJob('density', polluant, année, os.path.join(output_dir, f"{nom}_density.html"),
+                                          query=dict(columns=job_columns('density', colonne), year=année,
+                                                     not_null=colonne)))
+
+        if bundle:
+            os.makedirs(BUNDLE_DIR, exist_ok=True)
+            print(f"Fichiers regroupés par polluant : {BUNDLE_DIR}")
+            jobs = bundle_jobs(jobs, bundle_path)
+
+        render_jobs(jobs, max_workers=render_workers, insee_to_commune=insee_to_commune,
+                    cache=RenderCache.load() if use_cache else None)
+        print("\nLes visualisations ont été générées dans le dossier 'output'.")
 
     except Exception as e:
         print(f"\n Une erreur s'est produite : {str(e)}")
 
 
 if __name__ == "__main__":
-    generate_visualizations()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Graphiques par polluant et par année à partir du stockage")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processus utilisés pour générer les graphiques (défaut : nombre de cœurs, 1 = séquentiel)")
+    parser.add_argument("--bins-per-year", action="store_true",
+                        help="classes d'histogramme propres à chaque année (défaut : communes à toutes les années)")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="points maximum par nuage de points, décimés en gardant les extrêmes (défaut : tous)")
+    parser.add_argument("--density", action="store_true",
+                        help="génère aussi les cartes de densité population / concentration")
+    parser.add_argument("--bundle", action="store_true",
+                        help="un fichier par polluant et type de graphique, toutes années comprises")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="regénère tous les graphiques, même inchangés")
+    args = parser.parse_args()
+    generate_visualizations(render_workers=args.workers, shared_bins=not args.bins_per_year,
+                            max_points=args.max_points, density=args.density, bundle=args.bundle,
+                            use_cache=not args.no_cache)
\ No newline at end of file
@@ -1,56 +1,35 @@
 import pandas as pd
+import numpy as np
 import os
-import glob
 import warnings
 import re
+import sys
+import argparse
+import shutil
 
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.append(base_dir)
+from src.utils.common_functions import read_data
+from src.utils.duplicates import RAW_KEY, DuplicateTracker, analyze_duplicates, print_report, summarize
+from src.utils.manifest import load_manifest, partition_path, PARTITIONS_DIR, raw_file_signature, save_manifest
+from src.utils.sources import RAW_ARCHIVE_PATH, file_sha256, list_raw_sources, open_source, source_name
 
 # Folder containing raw CSV files (data/raw/)
 data_folder = os.path.join(base_dir, "data", "raw")
 
 # Folder to save the cleaned CSV (data/cleaned/)
 output_folder = os.path.join(base_dir, "data", "cleaned")
-os.makedirs(output_folder, exist_ok=True)
 
-print(" Dossier source :", data_folder)
-print(" Dossier de sortie :", output_folder)
+OUTPUT_FILENAME = "cleaned_air_quality_with_year.csv"
 
-# List all CSV files
-all_files = glob.glob(os.path.join(data_folder, "*.csv"))
+# Number of rows read at once by the streaming cleaner
+CHUNK_SIZE = 50_000
 
-if not all_files:
-    print(" Aucun fichier CSV trouvé dans le dossier raw !")
-    exit()
-
-list_of_dfs = []
-
-# Reading files and adding the year
-for filepath in all_files:
-    match = re.search(r'(\d{4})', os.path.basename(filepath))
-    year = int(match.group(1)) if match else None
-
-    df = pd.read_csv(filepath, encoding="latin1", skiprows=1)
-    df['Année'] = year
-    list_of_dfs.append(df)
-
-# Harmonize columns
-all_columns = set()
-for df in list_of_dfs:
-    all_columns.update(df.columns)
-all_columns = list(all_columns)
-
-for i, df in enumerate(list_of_dfs):
-    for col in all_columns:
-        if col not in df.columns:
-            df[col] = pd.NA
-    list_of_dfs[i] = df[all_columns]
-
-# Merge all files
-final_df = pd.concat(list_of_dfs, ignore_index=True)
+# Number of bins of the histogram used to locate the medians in streaming mode
+MEDIAN_BINS = 4096
 
 # Pollutant columns for which NA is replaced by the median
 pollutants_cols = [
@@ -67,26 +46,429 @@ pollutants_cols = [
     'Moyenne annuelle de somo 35 pondere par la population (ug/m3.jour)'
 ]
 
-# Fill NA with the median if the column exists
-for col in pollutants_cols:
-    if col in final_df.columns:
-        final_df[col].fillna(final_df[col].median(skipna=True), inplace=True)
 
-# COM Insee: replace NA with "Unknown"
-if 'COM Insee' in final_df.columns:
-    final_df['COM Insee'].fillna('Unknown', inplace=True)
+def list_raw_files(folder=data_folder):
+    """
+    Lists the raw CSV files, sorted by name (hence by year). Files that were
+    not extracted are read directly from the ZIP archive.
+    """
+    return list_raw_sources(folder)
+
+
+def year_from_path(filepath):
+    """
+    Extracts the year from the name of a raw file (or archive member).
+    """
+    match = re.search(r'(\d{4})', source_name(filepath))
+    return int(match.group(1)) if match else None
+
+
+def clean_in_memory(all_files, output_path):
+    """
+    Loads every raw file, merges them and writes the cleaned CSV.
+    The whole dataset is held in memory.
+
+    Returns:
+        tuple: Shape of the cleaned DataFrame
+    """
+    list_of_dfs = []
+
+    # Reading files and adding the year
+    for filepath in all_files:
+        # Same parser as the rest of the project, backed by the on-disk cache
+        df = read_data.load_data(filepath)
+        if df is None:
+            print(f" Fichier ignoré : {filepath}")
+            continue
+        df['Année'] = year_from_path(filepath)
+        list_of_dfs.append(df)
+
+    # Harmonize columns (in order of first appearance)
+    all_columns = []
+    for df in list_of_dfs:
+        all_columns += [col for col in df.columns if col not in all_columns]
+
+    for i, df in enumerate(list_of_dfs):
+        for col in all_columns:
+            if col not in df.columns:
+                df[col] = pd.NA
+        list_of_dfs[i] = df[all_columns]
+
+    # Merge all files
+    final_df = pd.concat(list_of_dfs, ignore_index=True)
+
+    # Fill NA with the median if the column exists
+    for col in pollutants_cols:
+        if col in final_df.columns:
+            final_df[col].fillna(final_df[col].median(skipna=True), inplace=True)
+
+    # COM Insee: replace NA with "Unknown"
+    if 'COM Insee' in final_df.columns:
+        final_df['COM Insee'].fillna('Unknown', inplace=True)
+
+    # Population: replace NA with 0
+    if 'Population' in final_df.columns:
+        final_df['Population'].fillna(0, inplace=True)
+
+    # Check for duplicates by commune and year (exact / conflicting)
+    print_report(analyze_duplicates(final_df, key=RAW_KEY))
+
+    # Save the cleaned file
+    final_df.to_csv(output_path, index=False)
+    return final_df.shape
+
+
+def _read_header(filepath):
+    with open_source(filepath) as f:
+        return pd.read_csv(f, encoding='cp1252', skiprows=1, nrows=0).columns.tolist()
+
+
+def _iter_chunks(filepath, chunk_size, usecols=None):
+    """
+    Reads a raw file chunk by chunk, with the same typing as read_data.load_data.
+    """
+    with open_source(filepath) as f:
+        reader = pd.read_csv(
+            f,
+            encoding='cp1252',
+            skiprows=1,
+            usecols=usecols,
+            dtype={'COM Insee': str, 'Commune': str},
+            chunksize=chunk_size
+        )
+        for chunk in reader:
+            yield read_data.coerce_numeric(chunk)
+
+
+def _streaming_medians(files_columns, chunk_size, n_bins=MEDIAN_BINS):
+    """
+    Computes the exact median of each pollutant column with bounded memory.
+
+    1. count / min / max of every column,
+    2. histogram of the values to find the bins holding the middle ranks,
+    3. collect only the values of those bins and select the middle ranks.
+
+    Memory does not depend on the number of rows, only on the chunk size,
+    the number of bins and the number of values falling in the middle bins.
+
+    Returns:
+        tuple: ({column: median}, population_has_na)
+    """
+    columns = [col for col in pollutants_cols if any(col in cols for cols in files_columns.values())]
+
+    def scan():
+        for filepath, cols in files_columns.items():
+            usecols = [col for col in columns if col in cols] + ['Population']
+            for chunk in _iter_chunks(filepath, chunk_size, usecols=usecols):
+                yield chunk
+
+    # Pass 1: count, min, max
+    stats = {col: [0, np.inf, -np.inf] for col in columns}
+    population_has_na = False
+    for chunk in scan():
+        population_has_na = population_has_na or bool(chunk['Population'].isna().any())
+        for col in columns:
+            if col not in chunk.columns:
+                continue
+            values = chunk[col].dropna().to_numpy(dtype='float64')
+            if len(values):
+                stats[col][0] += len(values)
+                stats[col][1] = min(stats[col][1], values.min())
+                stats[col][2] = max(stats[col][2], values.max())
+
+    def bin_of(values, col):
+        _, vmin, vmax = stats[col]
+        if vmax == vmin:
+            return np.zeros(len(values), dtype=np.int64)
+        bins = ((values - vmin) / (vmax - vmin) * n_bins).astype(np.int64)
+        return np.clip(bins, 0, n_bins - 1)
+
+    # Pass 2: histogram of each column
+    counts = {col: np.zeros(n_bins, dtype=np.int64) for col in columns if stats[col][0]}
+    for chunk in scan():
+        for col in counts:
+            if col in chunk.columns:
+                values = chunk[col].dropna().to_numpy(dtype='float64')
+                counts[col] += np.bincount(bin_of(values, col), minlength=n_bins)
+
+    # Ranks of the middle values, and the bins containing them
+    targets = {}
+    for col, col_counts in counts.items():
+        n = stats[col][0]
+        ranks = ((n - 1) // 2, n // 2)
+        cumulative = np.cumsum(col_counts)
+        bins = [int(np.searchsorted(cumulative, rank, side='right')) for rank in ranks]
+        offset = int(cumulative[min(bins)] - col_counts[min(bins)])
+        targets[col] = (set(bins), [rank - offset for rank in ranks], [])
+
+    # Pass 3: collect the values of the middle bins only
+    for chunk in scan():
+        for col, (bins, _, selected) in targets.items():
+            if col in chunk.columns:
+                values = chunk[col].dropna().to_numpy(dtype='float64')
+                selected.append(values[np.isin(bin_of(values, col), list(bins))])
+
+    medians = {col: np.nan for col in columns}
+    for col, (_, local_ranks, selected) in targets.items():
+        values = np.sort(np.concatenate(selected))
+        medians[col] = (values[local_ranks[0]] + values[local_ranks[1]]) / 2
+
+    return medians, population_has_na
+
+
+def _harmonized_columns(all_files):
+    """
+    Reads the headers of the raw files.
+
+    Returns:
+        tuple: ({filepath: columns} for the valid files, harmonized columns)
+    """
+    files_columns = {}
+    for filepath in all_files:
+        columns = _read_header(filepath)
+        if not read_data.check_columns(columns):
+            print(f" Fichier ignoré : {filepath}")
+            continue
+        files_columns[filepath] = columns
+
+    all_columns = []
+    for columns in files_columns.values():
+        all_columns += [col for col in columns + ['Année'] if col not in all_columns]
+    return files_columns, all_columns
+
+
+def _write_clean_file(filepath, out, all_columns, medians, population_has_na,
+                      chunk_size, header, tracker):
+    """
+    Cleans one raw file chunk by chunk and appends it to an open output file.
+    The duplicates are collected by `tracker` (DuplicateTracker).
+
+    Returns:
+        int: Number of rows written
+    """
+    year = year_from_path(filepath)
+    n_rows = 0
+    for chunk in _iter_chunks(filepath, chunk_size):
+        chunk['Année'] = year
+        chunk = chunk.reindex(columns=all_columns)
+
+        for col, median in medians.items():
+            chunk[col] = chunk[col].fillna(median)
+        chunk['COM Insee'] = chunk['COM Insee'].fillna('Unknown')
+        chunk['Population'] = chunk['Population'].fillna(0)
+        if not population_has_na:
+            chunk['Population'] = chunk['Population'].astype('int64')
+
+        # Check for duplicates by commune and year
+        tracker.update(chunk)
+
+        chunk.to_csv(out, index=False, header=header and n_rows == 0)
+        n_rows += len(chunk)
+    return n_rows
+
+
+def clean_streaming(all_files, output_path, chunk_size=CHUNK_SIZE):
+    """
+    Produces the same cleaned CSV as clean_in_memory, chunk by chunk.
+
+    A first pass computes the medians used to fill missing pollutant values,
+    a second pass fills each chunk and appends it directly to the output
+    file. Peak memory is bounded by `chunk_size` rows.
+
+    Returns:
+        tuple: Shape of the cleaned dataset
+    """
+    files_columns, all_columns = _harmonized_columns(all_files)
+
+    print(" Passe 1 : calcul des médianes...")
+    medians, population_has_na = _streaming_medians(files_columns, chunk_size)
+
+    print(" Passe 2 : nettoyage et écriture par blocs...")
+    n_rows = 0
+    reports = []
+    trackers = {}
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+        for filepath in files_columns:
+            year = year_from_path(filepath)
+            # Keys are only compared within a year: drop the other years' keys
+            if year not in trackers:
+                reports += [tracker.report() for tracker in trackers.values()]
+                trackers = {year: DuplicateTracker(RAW_KEY)}
+            n_rows += _write_clean_file(
+                filepath, out, all_columns, medians, population_has_na,
+                chunk_size, header=(n_rows == 0), tracker=trackers[year]
+            )
+
+    os.replace(tmp_path, output_path)
+    reports += [tracker.report() for tracker in trackers.values()]
+    print_report(pd.concat(reports, ignore_index=True) if reports else DuplicateTracker(RAW_KEY).report())
+    return (n_rows, len(all_columns))
+
+
+def _combined_matches(output_path, combined):
+    """
+    True if the combined CSV is the one written by the last incremental run
+    (same size, then same SHA-256).
+    """
+    if not combined or not os.path.exists(output_path):
+        return False
+    if os.path.getsize(output_path) != combined.get("size"):
+        return False
+    return file_sha256(output_path) == combined.get("sha256")
+
+
+def clean_incremental(all_files, output_path, chunk_size=CHUNK_SIZE):
+    """
+    Streaming cleaner that only reprocesses the raw files that changed.
+
+    Each raw file produces one cleaned partition per year in
+    data/cleaned/by_year/, described in data/cleaned/manifest.json (hash of
+    the raw file, rows, columns, fill values). Unchanged partitions are kept
+    as is and their raw files are not read; the combined CSV is then rebuilt
+    by concatenating the partitions.
+
+    The size and SHA-256 of the combined CSV are kept in the manifest: if
+    the file was rewritten since (clean_in_memory / clean_streaming write
+    the same file with medians over all years), it is rebuilt from the
+    partitions even when no raw file changed.
+
+    Missing pollutant values are filled with the median of their own raw
+    file (year), not with the median over all years as in clean_in_memory /
+    clean_streaming: a partition only depends on its raw file, so a new or
+    modified year never rewrites the other partitions. Only a change of the
+    harmonized columns regenerates every partition.
+
+    Returns:
+        tuple: Shape of the cleaned dataset
+    """
+    manifest = load_manifest()
+    previous_files = manifest["files"]
+    files_columns, all_columns = _harmonized_columns(all_files)
+
+    # Raw files that are new or changed since the last run
+    signatures = {}
+    changed = []
+    for filepath in files_columns:
+        name = source_name(filepath)
+        previous = previous_files.get(name)
+        signatures[name] = raw_file_signature(filepath, previous)
+        if (previous is None or previous["hash"] != signatures[name]["hash"]
+                or not os.path.exists(partition_path(year_from_path(filepath)))):
+            changed.append(filepath)
+    removed = [name for name in previous_files if name not in signatures]
+
+    if all_columns != manifest["columns"]:
+        if previous_files:
+            print(" Colonnes modifiées : toutes les partitions sont régénérées.")
+        changed = list(files_columns)
+
+    if not changed and not removed:
+        if _combined_matches(output_path, manifest.get("combined")):
+            print(" Aucun fichier brut modifié : données nettoyées à jour.")
+            n_rows = sum(entry["rows"] for entry in previous_files.values())
+            return (n_rows, len(all_columns))
+        print(" Fichier combiné absent ou réécrit hors du mode incrémental : reconstruction à partir des partitions.")
+    else:
+        print(f" Nettoyage de {len(changed)} fichier(s) modifié(s)...")
+    os.makedirs(PARTITIONS_DIR, exist_ok=True)
+    files = {name: entry for name, entry in previous_files.items() if name in signatures}
+    for filepath in changed:
+        name = source_name(filepath)
+        year = year_from_path(filepath)
+        path = partition_path(year)
+
+        # Fill values of this file only
+        medians, population_has_na = _streaming_medians({filepath: files_columns[filepath]}, chunk_size)
+        medians = {col: (None if pd.isna(median) else float(median)) for col, median in medians.items()}
+        fill_values = {col: (np.nan if median is None else median) for col, median in medians.items()}
+
+        tracker = DuplicateTracker(RAW_KEY)
+        with open(path + ".tmp", "w", encoding="utf-8", newline="") as out:
+            rows = _write_clean_file(
+                filepath, out, all_columns, fill_values, population_has_na,
+                chunk_size, header=True, tracker=tracker
+            )
+        os.replace(path + ".tmp", path)
+        duplicates = summarize(tracker.report())
+        files[name] = {
+            **signatures[name],
+            "year": year,
+            "rows": rows,
+            "duplicates": duplicates["extra_rows"],
+            "duplicate_keys": duplicates["keys"],
+            "conflicting_keys": duplicates["conflicting"],
+            "columns": files_columns[filepath],
+            "medians": medians,
+            "population_has_na": population_has_na,
+            "partition": os.path.basename(path),
+            "partition_sha256": file_sha256(path),
+        }
+        print(f"  ✓ {year} : {rows} lignes")
+
+    # Partitions of raw files that no longer exist
+    for name in removed:
+        path = partition_path(previous_files[name]["year"])
+        if os.path.exists(path) and all(entry["year"] != previous_files[name]["year"] for entry in files.values()):
+            os.remove(path)
+        print(f"  ✗ {name} supprimé")
+
+    # Rebuild the combined CSV from the partitions, in year order
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        for i, entry in enumerate(sorted(files.values(), key=lambda e: e["year"])):
+            with open(partition_path(entry["year"]), "rb") as part:
+                header = part.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(part, out)
+    os.replace(tmp_path, output_path)
+
+    combined = {"file": os.path.basename(output_path), "size": os.path.getsize(output_path),
+                "sha256": file_sha256(output_path)}
+    manifest.update({"columns": all_columns, "files": files, "combined": combined})
+    save_manifest(manifest)
+
+    # Duplicates of the unchanged partitions come from the manifest
+    keys = sum(entry.get("duplicate_keys", entry["duplicates"]) for entry in files.values())
+    conflicting = sum(entry.get("conflicting_keys", 0) for entry in files.values())
+    print(f"🔹 Doublons (com_insee, annee) : {keys} clés, "
+          f"{sum(entry['duplicates'] for entry in files.values())} lignes en trop "
+          f"({keys - conflicting} exacts, {conflicting} conflictuels)")
+    return (sum(entry["rows"] for entry in files.values()), len(all_columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fusion et nettoyage des fichiers bruts INERIS")
+    parser.add_argument("--stream", action="store_true",
+                        help="nettoyage par blocs, à mémoire bornée")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne retraite que les fichiers bruts modifiés (implique --stream ; "
+                             "valeurs manquantes remplacées par la médiane de leur année)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"nombre de lignes par bloc en mode --stream (défaut : {CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    os.makedirs(output_folder, exist_ok=True)
+    print(" Dossier source :", data_folder)
+    if os.path.exists(RAW_ARCHIVE_PATH):
+        print(" Archive source :", RAW_ARCHIVE_PATH)
+    print(" Dossier de sortie :", output_folder)
 
-# Population: replace NA with 0
-if 'Population' in final_df.columns:
-    final_df['Population'].fillna(0, inplace=True)
+    # List all CSV files
+    all_files = list_raw_files()
 
-# Check for duplicates by commune and year
-duplicated_count = final_df.duplicated(subset=['COM Insee', 'Année']).sum()
-print(f"🔹 Nombre de doublons par 'COM Insee' et 'Année' : {duplicated_count}")
+    if not all_files:
+        print(" Aucun fichier CSV trouvé dans le dossier raw ni dans l'archive !")
+        exit()
 
-# Save the cleaned file
-output_path = os.path.join(output_folder, "cleaned_air_quality_with_year.csv")
-final_df.to_csv(output_path, index=False)
+    output_path = os.path.join(output_folder, OUTPUT_FILENAME)
+    if args.incremental:
+        shape = clean_incremental(all_files, output_path, chunk_size=args.chunk_size)
+    elif args.stream:
+        shape = clean_streaming(all_files, output_path, chunk_size=args.chunk_size)
+    else:
+        shape = clean_in_memory(all_files, output_path)
 
-print(" Fusion et nettoyage terminés ! Dimension du DataFrame :", final_df.shape)
-print(" Fichier sauvegardé dans :", output_path)
+    print(" Fusion et nettoyage terminés ! Dimension du DataFrame :", shape)
+    print(" Fichier sauvegardé dans :", output_path)
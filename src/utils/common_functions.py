@@ -1,30 +1,47 @@
 import pandas as pd 
-import numpy as np
 import os 
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
-from plotly.offline import plot as write_html
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from visualizations.scatter_plots import create_pollution_scatter
-from visualizations.histograms import create_pollution_histogram
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.utils.commune_index import load_commune_index
+from src.utils.raw_cache import read_cached, write_cached
+from src.utils.schema import ANNEE, COM_INSEE, COMMUNE, RAW_DTYPES, apply_schema, normalize_insee, pollutant_column
+from src.utils.sources import open_source, resolve_raw_file, source_exists
+# plotly and the visualization modules are imported on first use only
+# (see process_and_visualize_data / render_visualizations), so loading data
+# stays cheap to import.
+
+# Default CSV parser of read_data.load_data: "c" (pandas) or "pyarrow"
+# (multithreaded, typed with RAW_DTYPES, falls back to "c" if unavailable)
+CSV_ENGINE = "c"
 
 class read_data:
     def __init__(self):
         pass
 
     @staticmethod
-    def load_data(file_path):
+    def load_data(file_path, use_cache=True, engine=None):
         """
         Loads data from a CSV file with error handling and formatting.
 
+        The parsed and typed data is kept in an on-disk Parquet cache
+        (see src/utils/raw_cache.py), so the next runs skip text parsing and
+        type coercion as long as the source file is unchanged.
+
+        `file_path` can also designate a member of the ZIP archive,
+        "archive.zip::member.csv": the member is decompressed on the fly
+        into the parser, without being extracted to disk.
+
+        With engine="pyarrow", the file is parsed by the multithreaded
+        pyarrow CSV reader with the INERIS column types declared up front
+        (schema.RAW_DTYPES); the pandas C parser is used if pyarrow is not
+        installed or rejects the file.
+
 Args:
-file_path (str): Path to the CSV file to load
+file_path (str): Path to the CSV file (or archive member) to load
+use_cache (bool): Read/write the on-disk cache (default: True)
+engine (str): "c" or "pyarrow" (default: CSV_ENGINE)
 
 Returns:
 pandas.DataFrame: DataFrame containing the loaded data, or None in case of error
@@ -33,40 +50,42 @@ pandas.DataFrame: DataFrame containing the loaded data, or None in case of error
             if file_path is None:
                 raise ValueError("Le chemin du fichier ne peut pas être None")
             
-            if not os.path.exists(file_path):
+            if not source_exists(file_path):
                 print(f"ERREUR : Le fichier '{file_path}' n'existe pas.")
                 return None
-                
-            data = pd.read_csv(
-                file_path,
-                encoding='cp1252',    
-                skiprows=1,           
-                sep=',',              
-                decimal='.',          
-                thousands=None,       
-                low_memory=False
-            )
+
+            if use_cache:
+                data = read_cached(file_path)
+                if data is not None:
+                    print("Fichier chargé depuis le cache!")
+                    return data
+
+            data = None
+            if (engine or CSV_ENGINE) == "pyarrow":
+                data = read_data.read_csv_pyarrow(file_path)
+
+            if data is None:
+                with open_source(file_path) as f:
+                    data = pd.read_csv(
+                        f,
+                        encoding='cp1252',    
+                        skiprows=1,           
+                        sep=',',              
+                        decimal='.',          
+                        thousands=None,       
+                        # Text columns, as in the pyarrow and streaming readers:
+                        # INSEE codes keep their leading zeros ('01001')
+                        dtype={'COM Insee': str, 'Commune': str},
+                        low_memory=False
+                    )
             
-            if len(data.columns) not in [12, 14]:
-                print(f"ATTENTION : Nombre incorrect de colonnes ({len(data.columns)}). Attendu : 12 ou 14")
-                print("Colonnes trouvées :")
-                print(data.columns.tolist())
+            if not read_data.check_columns(data.columns):
                 return None
-                
-            required_columns = [
-                'COM Insee',
-                'Commune',
-                'Population',
-                'Moyenne annuelle de concentration de NO2 (ug/m3)',
-                'Moyenne annuelle de concentration de PM10 (ug/m3)',
-                'Moyenne annuelle de concentration de O3 (ug/m3)'
-            ]
-            missing_columns = [col for col in required_columns if col not in data.columns]
-            if missing_columns:
-                print("ERREUR : Colonnes manquantes :")
-                print(missing_columns)
-                return None
-                
+
+            data = read_data.coerce_numeric(data)
+            if use_cache:
+                write_cached(file_path, data)
+
             print("Fichier chargé avec succès!")
             return data
             
@@ -80,18 +99,97 @@ pandas.DataFrame: DataFrame containing the loaded data, or None in case of error
             print(f"ERREUR : Problème lors du chargement du fichier '{file_path}' : {e}")
             return None
     
+    @staticmethod
+    def read_csv_pyarrow(file_path):
+        """
+        Parses a raw INERIS file with the pyarrow CSV reader (multithreaded).
+
+        The cp1252 text is transcoded by pyarrow while reading, and the known
+        columns get their type up front (schema.RAW_DTYPES) instead of being
+        inferred then coerced.
+
+        Returns:
+            pandas.DataFrame: The parsed data, or None if pyarrow is not
+                installed or cannot parse the file (the caller then falls
+                back to the pandas C parser)
+        """
+        try:
+            import pyarrow as pa
+            from pyarrow import csv
+        except ImportError:
+            print("ATTENTION : pyarrow n'est pas installé, utilisation du parseur C de pandas")
+            return None
+
+        try:
+            read_options = csv.ReadOptions(encoding='cp1252', skip_rows=1, use_threads=True)
+            convert_options = csv.ConvertOptions(
+                column_types={col: pa.type_for_alias(dtype) for col, dtype in RAW_DTYPES.items()},
+                strings_can_be_null=True
+            )
+            with open_source(file_path) as f:
+                table = csv.read_csv(f, read_options=read_options, convert_options=convert_options)
+            return table.to_pandas()
+
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"ATTENTION : Lecture pyarrow impossible pour '{file_path}', utilisation du parseur C ({e})")
+            return None
+
+    @staticmethod
+    def check_columns(columns):
+        """
+        Checks that the header of a raw INERIS file has the expected layout
+        (12 or 14 columns, including the required ones).
+
+        Returns:
+            bool: True if the columns are valid
+        """
+        if len(columns) not in [12, 14]:
+            print(f"ATTENTION : Nombre incorrect de colonnes ({len(columns)}). Attendu : 12 ou 14")
+            print("Colonnes trouvées :")
+            print(list(columns))
+            return False
+
+        required_columns = [
+            'COM Insee',
+            'Commune',
+            'Population',
+            'Moyenne annuelle de concentration de NO2 (ug/m3)',
+            'Moyenne annuelle de concentration de PM10 (ug/m3)',
+            'Moyenne annuelle de concentration de O3 (ug/m3)'
+        ]
+        missing_columns = [col for col in required_columns if col not in columns]
+        if missing_columns:
+            print("ERREUR : Colonnes manquantes :")
+            print(missing_columns)
+            return False
+
+        return True
+
+    @staticmethod
+    def coerce_numeric(df):
+        """
+        Converts the measurement columns (everything after 'COM Insee' and
+        'Commune') to numeric types, invalid values becoming NaN.
+        Columns that are already numeric are left untouched.
+        """
+        for col in df.columns[2:]:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+
     @staticmethod
     def process_data(df):
         """    
 Processes the data to ensure that the columns are correctly separated and typed.    
+The result follows the canonical layout of src/utils/schema.py (short column
+names, categorical communes, float32 measurements).
 """
         if df is None:
             return None
         
         try:
-            numeric_columns = df.columns[2:]
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+            df = read_data.coerce_numeric(df)
+            df = apply_schema(df)
             
             print("\nVérification de la cohérence des données :")
             print(f"Nombre total de lignes : {len(df)}")
@@ -117,21 +215,19 @@ Processes the data to ensure that the columns are correctly separated and typed.
             print("Erreur : DataFrame non fourni")
             return None, None
             
-        if 'COM Insee' not in df.columns or 'Commune' not in df.columns:
-            print("Erreur : Les colonnes 'COM Insee' et 'Commune' sont requises")
+        if COM_INSEE not in df.columns or COMMUNE not in df.columns:
+            print(f"Erreur : Les colonnes '{COM_INSEE}' et '{COMMUNE}' sont requises")
             print(f"Colonnes disponibles : {df.columns.tolist()}")
             return None, None
             
         try:
-            # Convert INSEE codes to string for consistency
-            df['COM Insee'] = df['COM Insee'].astype(str)
-            
             # Remove any potential duplicates
-            df_unique = df[['Commune', 'COM Insee']].drop_duplicates()
+            df_unique = df[[COMMUNE, COM_INSEE]].drop_duplicates()
             
-            # Create the dictionaries
-            commune_to_insee = dict(zip(df_unique['Commune'], df_unique['COM Insee']))
-            insee_to_commune = dict(zip(df_unique['COM Insee'], df_unique['Commune']))
+            # Create the dictionaries (INSEE codes as 5-character strings for consistency)
+            codes = normalize_insee(df_unique[COM_INSEE].astype(object))
+            commune_to_insee = dict(zip(df_unique[COMMUNE], codes))
+            insee_to_commune = dict(zip(codes, df_unique[COMMUNE]))
             
             
             print(f"\nDictionnaires créés avec succès:")
@@ -162,39 +258,35 @@ Processes the data to ensure that the columns are correctly separated and typed.
 def load_commune_mappings():
     """    
     Loads the correspondences between INSEE codes and municipality names.
-    
-    Args:
-        year (int): The year for which to load the data (default: 2000)
+
+    The correspondences come from the persisted commune index (see
+    src/utils/commune_index.py), built once from every year of raw data and
+    then memory-mapped: communes that only appear after 2000 are included,
+    and no CSV is parsed once the index exists.
         
     Returns:
-        tuple: (municipality_to_insee, insee_to_municipality) correspondence dictionaries
+        tuple: (municipality_to_insee, insee_to_municipality) read-only
+            mappings with the same lookups as dictionaries
     """
     try:
-        # Upload the CSV file
-        script_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        data_path = os.path.join(script_dir, "data", "raw", "Indicateurs_QualiteAir_France_Commune_2000_Ineris_v.Sep2020.csv")
-        
-        data = read_data.load_data(data_path)
-        if data is None:
+        index = load_commune_index()
+        if index is None:
             raise ValueError("Impossible de charger les données pour les correspondances communes")
-        
-        # Create the mapping dictionaries
-        commune_to_insee = dict(zip(data['Commune'], data['COM Insee']))
-        insee_to_commune = dict(zip(data['COM Insee'], data['Commune']))
-        
-        return commune_to_insee, insee_to_commune
+
+        return index.commune_to_insee(), index.insee_to_commune()
         
     except Exception as e:
-        print(f"Erreur lors du chargement des correspondances communes")
+        print(f"Erreur lors du chargement des correspondances communes : {e}")
         return None, None
 
 
-def load_data_for_year(year):
+def load_data_for_year(year, engine=None):
     """    
     Loads data for a specific year.    
         
     Args:    
         year (int): The year for which to load data.    
+        engine (str): CSV parser, "c" or "pyarrow" (see read_data.load_data)
         
     Returns:    
         pd.DataFrame: Data for the specified year, or None if an error occurs.    
@@ -202,12 +294,12 @@ def load_data_for_year(year):
     try:
         if year == 2006:
             return None
-        script_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        data_path = os.path.join(script_dir, "data", "raw", f"Indicateurs_QualiteAir_France_Commune_{year}_Ineris_v.Sep2020.csv")
+        # Extracted file if present, member of the ZIP archive otherwise
+        data_path = resolve_raw_file(f"Indicateurs_QualiteAir_France_Commune_{year}_Ineris_v.Sep2020.csv")
         
-        data = read_data.load_data(data_path)
+        data = read_data.load_data(data_path, engine=engine)
         if data is not None:
-            data['Année'] = year
+            data[ANNEE] = year
             data = read_data.process_data(data)
             print(f"Données pour {year} chargées avec succès.")
             return data
@@ -218,6 +310,37 @@ def load_data_for_year(year):
         return None
 
 
+def load_all_years(years=None, max_workers=None):
+    """
+    Loads the data of several years in parallel.
+
+    Each yearly CSV is parsed by `load_data_for_year` in its own worker
+    process, so the cold load scales with the number of cores. The frames
+    are returned per year; callers that need a single frame concatenate
+    them once (pd.concat(frames.values())).
+
+    Args:
+        years (iterable): Years to load (default: 2000-2015, 2006 excluded)
+        max_workers (int): Number of worker processes (default: os.cpu_count()).
+            Use 1 to load the years serially in the current process.
+
+    Returns:
+        dict: {year (int): pd.DataFrame} for the years that could be loaded,
+            in increasing year order
+    """
+    if years is None:
+        years = [year for year in range(2000, 2016) if year != 2006]
+    years = sorted(years)
+
+    if max_workers == 1 or len(years) <= 1:
+        frames = [load_data_for_year(year) for year in years]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(load_data_for_year, years))
+
+    return {year: df for year, df in zip(years, frames) if df is not None}
+
+
 def process_and_visualize_data(data, insee_to_commune):
     """    
 Processes and visualises air pollution data over several years.
@@ -229,18 +352,17 @@ Processes and visualises air pollution data over several years.
     Returns:
         dict: Dictionary containing the generated figures
     """
+    from plotly.io import write_html
+    from src.visualizations.histograms import create_pollution_histogram
+    from src.visualizations.scatter_plots import create_pollution_scatter
     
-    script_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    output_dir = os.path.join(script_dir, 'output')
-    os.makedirs(output_dir, exist_ok=True)
-    print(f"\nDossier de sortie créé : {output_dir}")
-    
+    output_dir = _output_dir()
     
     all_figures = {}
     
-    for year in sorted(data['Année'].unique()):
+    for year in sorted(data[ANNEE].unique()):
         print(f"\nCréation des visualisations pour l'année {year}...")
-        year_data = data[data['Année'] == year]
+        year_data = data[data[ANNEE] == year]
         
         for pollutant in ['NO2', 'PM10', 'O3']:
             
@@ -248,8 +370,7 @@ Processes and visualises air pollution data over several years.
             
             fig_hist = create_pollution_histogram(year_data, pollutant)
             
-            scatter_file = os.path.join(output_dir, f'{pollutant}_moyenne_annuelle_{year}.html')
-            hist_file = os.path.join(output_dir, f'{pollutant}_histogram_{year}.html')
+            scatter_file, hist_file = _output_files(output_dir, pollutant, year)
             
             write_html(fig_scatter, scatter_file, auto_open=False, include_plotlyjs='cdn')
             write_html(fig_hist, hist_file, auto_open=False, include_plotlyjs='cdn')
@@ -258,4 +379,64 @@ Processes and visualises air pollution data over several years.
             all_figures[f'{pollutant}_histogram_{year}'] = fig_hist
     
     print("\nToutes les visualisations ont été générées avec succès !")
-    return all_figures
\ No newline at end of file
+    return all_figures
+
+
+def render_visualizations(data, insee_to_commune, max_workers=None, use_cache=True):
+    """
+    Same files as process_and_visualize_data, rendered in parallel and only
+    when their data, parameters or rendering code changed (see
+    src/visualizations/render_cache.py). No figure is kept in memory.
+    
+    Args:
+        data (pd.DataFrame): The DataFrame containing the data
+        insee_to_commune (dict): Dictionary mapping INSEE codes to commune names
+        max_workers (int): Number of rendering processes (default: number of
+            cores, 1 = sequential)
+        use_cache (bool): Skips the figures whose file is up to date
+        
+    Returns:
+        dict: Dictionary containing the paths of the generated HTML files
+    """
+    from src.visualizations.render_cache import RenderCache
+    from src.visualizations.render_pool import RenderJob, job_columns, render_jobs
+    
+    output_dir = _output_dir()
+    
+    all_files = {}
+    jobs = []
+    
+    for year in sorted(data[ANNEE].unique()):
+        year_data = data[data[ANNEE] == year]
+        
+        for pollutant in ['NO2', 'PM10', 'O3']:
+            column = pollutant_column(pollutant)
+            scatter_file, hist_file = _output_files(output_dir, pollutant, year)
+            
+            jobs.append(RenderJob('scatter', pollutant, year, scatter_file,
+                                  data=year_data[job_columns('scatter', column)]))
+            jobs.append(RenderJob('histogram', pollutant, year, hist_file,
+                                  data=year_data[job_columns('histogram', column)]))
+            
+            all_files[f'{pollutant}_scatter_{year}'] = scatter_file
+            all_files[f'{pollutant}_histogram_{year}'] = hist_file
+    
+    errors = render_jobs(jobs, max_workers=max_workers, insee_to_commune=insee_to_commune,
+                         cache=RenderCache.load() if use_cache else None)
+    for job, _ in errors:
+        all_files = {name: path for name, path in all_files.items() if path != job.path}
+    
+    return all_files
+
+
+def _output_dir():
+    script_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output_dir = os.path.join(script_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"\nDossier de sortie créé : {output_dir}")
+    return output_dir
+
+
+def _output_files(output_dir, pollutant, year):
+    return (os.path.join(output_dir, f'{pollutant}_moyenne_annuelle_{year}.html'),
+            os.path.join(output_dir, f'{pollutant}_histogram_{year}.html'))
@@ -0,0 +1,290 @@
+"""
+Index persistant des communes (code INSEE <-> nom de commune).
+
+L'index est construit une seule fois à partir des colonnes 'COM Insee' et
+'Commune' de tous les fichiers bruts (toutes les années, y compris les
+communes créées après 2000), puis enregistré dans data/index/ sous forme de
+tableaux numpy triés :
+
+    communes_codes.npy       codes INSEE triés
+    communes_names.npy       nom de chaque code (même ordre)
+    communes_name_order.npy  permutation qui trie les noms
+    communes_index.json      version et signature des fichiers bruts
+
+Les tableaux sont ouverts en mémoire partagée (mmap) et interrogés par
+recherche dichotomique (O(log n)) : le chargement coûte quelques
+millisecondes au lieu d'une lecture complète du CSV de l'année 2000.
+L'index est reconstruit automatiquement si les fichiers bruts changent.
+"""
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from src.utils.schema import normalize_insee
+from src.utils.sources import list_raw_sources, open_source, source_name, source_stat
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Folder containing the persisted index (data/index/)
+INDEX_DIR = os.path.join(base_dir, "data", "index")
+
+# Bump when the layout of the index changes (2: rows without INSEE code dropped)
+INDEX_VERSION = 2
+
+
+def _index_paths(folder):
+    return {
+        "codes": os.path.join(folder, "communes_codes.npy"),
+        "names": os.path.join(folder, "communes_names.npy"),
+        "name_order": os.path.join(folder, "communes_name_order.npy"),
+        "meta": os.path.join(folder, "communes_index.json"),
+    }
+
+
+def sources_signature(sources):
+    """
+    Signature of the raw sources the index is built from (name, size, mtime).
+    """
+    return [[source_name(source), *source_stat(source)] for source in sources]
+
+
+class CommuneIndex:
+    """
+    Sorted arrays of INSEE codes and commune names, with binary-search lookups.
+
+    Attributes:
+        codes (np.ndarray): INSEE codes (5 characters), sorted
+        names (np.ndarray): Name of each code, aligned with `codes`
+        name_order (np.ndarray): Permutation sorting `names` (stable)
+        distinct_names (int): Number of distinct names (homonyms counted once)
+    """
+
+    def __init__(self, codes, names, name_order, digest=None):
+        self.codes = codes
+        self.names = names
+        self.name_order = name_order
+        self._digest = digest
+        self.sorted_names = names[name_order]
+        self.distinct_names = int(np.count_nonzero(self.sorted_names[1:] != self.sorted_names[:-1])
+                                  + (len(self.sorted_names) > 0))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def digest(self):
+        """
+        SHA-256 of the codes and names (stored with the index, computed once
+        for an index built in memory; the arrays are never modified).
+        """
+        if self._digest is None:
+            digest = hashlib.sha256(np.ascontiguousarray(self.codes).tobytes())
+            digest.update(np.ascontiguousarray(self.names).tobytes())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Builds the index from a DataFrame with 'COM Insee' and 'Commune'
+        columns. When a code appears several times, the last name is kept
+        (the files are read in year order, so the most recent name wins).
+        Rows without an INSEE code are ignored.
+        """
+        df = df[df['COM Insee'].notna()]
+        codes = normalize_insee(df['COM Insee']).to_numpy(dtype=str)
+        names = df['Commune'].fillna('').to_numpy(dtype=str)
+
+        # Last occurrence of each code
+        reverse_unique = np.unique(codes[::-1], return_index=True)[1]
+        last = len(codes) - 1 - reverse_unique
+        codes, names = codes[last], names[last]
+
+        name_order = np.argsort(names, kind='stable')
+        return cls(codes, names, name_order)
+
+    def code_position(self, code):
+        position = int(np.searchsorted(self.codes, code))
+        if position < len(self.codes) and self.codes[position] == code:
+            return position
+        return None
+
+    def name_position(self, name):
+        position = int(np.searchsorted(self.sorted_names, name))
+        if position < len(self.sorted_names) and self.sorted_names[position] == name:
+            return int(self.name_order[position])
+        return None
+
+    def names_for(self, codes, default=None):
+        """
+        Vectorized lookup of the names of several INSEE codes.
+
+        Args:
+            codes (array-like): INSEE codes
+            default: Value used for unknown codes (default: the code itself)
+
+        Returns:
+            np.ndarray: Names, in the order of `codes`
+        """
+        codes = np.asarray(codes, dtype=str)
+        if not len(self.codes):
+            return codes.astype(object) if default is None else np.full(len(codes), default, dtype=object)
+        positions = np.clip(np.searchsorted(self.codes, codes), 0, len(self.codes) - 1)
+        found = self.codes[positions] == codes
+        result = np.where(found, self.names[positions], codes if default is None else default)
+        return result.astype(object)
+
+    def has_names(self, names):
+        """
+        Vectorized membership test of several commune names.
+
+        Returns:
+            np.ndarray: True for the names present in the index, in the order of `names`
+        """
+        names = np.asarray(names, dtype=str)
+        if not len(self.sorted_names):
+            return np.zeros(len(names), dtype=bool)
+        positions = np.clip(np.searchsorted(self.sorted_names, names), 0, len(self.sorted_names) - 1)
+        return self.sorted_names[positions] == names
+
+    def insee_to_commune(self):
+        return _CodeToName(self)
+
+    def commune_to_insee(self):
+        return _NameToCode(self)
+
+    def save(self, folder=INDEX_DIR, signature=None):
+        """
+        Writes the index arrays and their metadata (atomic per file).
+        """
+        os.makedirs(folder, exist_ok=True)
+        paths = _index_paths(folder)
+        for key in ("codes", "names", "name_order"):
+            tmp_path = paths[key] + ".tmp.npy"
+            np.save(tmp_path, getattr(self, key))
+            os.replace(tmp_path, paths[key])
+
+        meta = {"version": INDEX_VERSION, "communes": len(self), "digest": self.digest,
+                "sources": signature or []}
+        with open(paths["meta"] + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(paths["meta"] + ".tmp", paths["meta"])
+
+    @classmethod
+    def load(cls, folder=INDEX_DIR, mmap_mode="r"):
+        """
+        Opens a persisted index (memory-mapped by default).
+
+        Returns:
+            tuple: (CommuneIndex, metadata dict), or (None, None) if missing
+        """
+        paths = _index_paths(folder)
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None, None
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = [np.load(paths[key], mmap_mode=mmap_mode) for key in ("codes", "names", "name_order")]
+        return cls(*arrays, digest=meta.get("digest")), meta
+
+
+class _CodeToName(Mapping):
+    """
+    Read-only {INSEE code: commune name} view of a CommuneIndex.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, code):
+        position = self.index.code_position(str(code))
+        if position is None:
+            raise KeyError(code)
+        return str(self.index.names[position])
+
+    def __iter__(self):
+        return (str(code) for code in self.index.codes)
+
+    def __len__(self):
+        return len(self.index)
+
+    def names_for(self, codes, default=None):
+        return self.index.names_for(codes, default)
+
+
+class _NameToCode(Mapping):
+    """
+    Read-only {commune name: INSEE code} view of a CommuneIndex. For
+    homonymous communes, the smallest code is returned.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, name):
+        position = self.index.name_position(str(name))
+        if position is None:
+            raise KeyError(name)
+        return str(self.index.codes[position])
+
+    def __iter__(self):
+        return (str(name) for name in dict.fromkeys(self.index.sorted_names))
+
+    def __len__(self):
+        return self.index.distinct_names
+
+    def has_names(self, names):
+        return self.index.has_names(names)
+
+
+def build_commune_index(sources=None, folder=INDEX_DIR):
+    """
+    Builds the index from the raw sources (only the two commune columns are
+    parsed) and saves it.
+
+    Returns:
+        CommuneIndex: The new index, or None if there is no raw data
+    """
+    sources = list_raw_sources() if sources is None else sources
+    frames = []
+    for source in sources:
+        with open_source(source) as f:
+            frames.append(pd.read_csv(f, encoding='cp1252', skiprows=1,
+                                      usecols=['COM Insee', 'Commune'], dtype=str))
+    if not frames:
+        return None
+
+    index = CommuneIndex.from_frame(pd.concat(frames, ignore_index=True))
+    index.save(folder, signature=sources_signature(sources))
+    return index
+
+
+def load_commune_index(folder=INDEX_DIR, rebuild=False):
+    """
+    Returns the commune index, building it on first use or when the raw
+    files changed since it was built.
+
+    Returns:
+        CommuneIndex: The index, or None if it cannot be built
+    """
+    sources = list_raw_sources()
+    if not rebuild:
+        index, meta = CommuneIndex.load(folder)
+        if index is not None and meta.get("version") == INDEX_VERSION:
+            # Without raw data (index shipped alone) the stored index is used as is
+            if not sources or meta.get("sources") == sources_signature(sources):
+                return index
+
+    print("Construction de l'index des communes...")
+    return build_commune_index(sources, folder)
+
+
+if __name__ == "__main__":
+    index = load_commune_index(rebuild=True)
+    if index is None:
+        print("Aucun fichier brut trouvé : index non construit.")
+    else:
+        print(f"Index des communes enregistré dans {INDEX_DIR} : {len(index)} communes")
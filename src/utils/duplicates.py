@@ -0,0 +1,171 @@
+"""
+Détection des doublons (com_insee, annee) en une seule passe.
+
+Chaque ligne est réduite à deux empreintes 64 bits calculées en vectoriel
+(pandas.util.hash_pandas_object) : celle de sa clé et celle de ses valeurs.
+Une clé vue plusieurs fois est un doublon :
+
+    exact        toutes les lignes de la clé ont les mêmes valeurs
+    conflicting  au moins deux lignes de la clé ont des valeurs différentes
+
+Le même moteur sert au nettoyeur (DataFrame entier ou blocs), au chargeur
+SQLite (étape de validation avant écriture) et à debug_duplicates.py. Les
+empreintes des clés déjà vues sont gardées dans un tableau numpy trié : un
+bloc est comparé à ce tableau par recherche dichotomique (np.searchsorted),
+sans objet Python par ligne, et ses nouvelles clés y sont insérées à leur
+place (np.insert) sans retrier le tableau ; seules les lignes des clés en
+double sont examinées ensuite.
+
+    tracker = DuplicateTracker()
+    for chunk in chunks:
+        tracker.update(chunk)
+    report = tracker.report()
+    print_report(report)
+"""
+import numpy as np
+import pandas as pd
+
+from src.utils.schema import ANNEE, COM_INSEE
+
+# Key of the dataset: one row per commune and year
+KEY = (COM_INSEE, ANNEE)
+
+# Same key with the column names of the raw files and of the cleaned CSV
+RAW_KEY = ('COM Insee', 'Année')
+
+EXACT = 'exact'
+CONFLICTING = 'conflicting'
+
+REPORT_COLUMNS = ['com_insee', 'annee', 'occurrences', 'distinct_values', 'kind']
+
+
+def _hash_columns(df, columns):
+    # Categorical columns are hashed on their values, whatever their categories
+    return pd.util.hash_pandas_object(df[columns], index=False, categorize=True).to_numpy()
+
+
+class DuplicateTracker:
+    """
+    Détecteur de doublons alimenté bloc par bloc (un seul bloc pour un
+    DataFrame entier).
+
+    Args:
+        key (tuple): Colonnes de la clé (défaut : com_insee, annee)
+        value_columns (list): Colonnes comparées entre les lignes d'une même
+            clé (défaut : toutes les autres colonnes du premier bloc)
+    """
+
+    def __init__(self, key=KEY, value_columns=None):
+        self.key = list(key)
+        self.value_columns = value_columns
+        self.rows = 0
+        # Sorted hashes of the keys seen, and value hash of the first row of each key
+        self._seen_keys = np.empty(0, dtype=np.uint64)
+        self._seen_values = np.empty(0, dtype=np.uint64)
+        # Key hash -> [com_insee, annee, occurrences, set of value hashes], repeated keys only
+        self._groups = {}
+
+    def _lookup(self, keys):
+        """
+        Returns (seen, index): rows whose key was seen in a previous block, and
+        the position of their key in _seen_keys.
+        """
+        index = np.searchsorted(self._seen_keys, keys)
+        if not len(self._seen_keys):
+            return np.zeros(len(keys), dtype=bool), index
+        seen = self._seen_keys[np.minimum(index, len(self._seen_keys) - 1)] == keys
+        return seen, index
+
+    def update(self, df):
+        """
+        Ajoute un bloc de lignes.
+        """
+        if self.value_columns is None:
+            self.value_columns = [col for col in df.columns if col not in self.key]
+        keys = _hash_columns(df, self.key)
+        values = _hash_columns(df, self.value_columns)
+
+        # Distinct keys of the block and index of their first row
+        block_keys, first_rows, inverse, counts = np.unique(keys, return_index=True, return_inverse=True,
+                                                            return_counts=True)
+        seen, seen_index = self._lookup(block_keys)
+
+        # Rows whose key is repeated inside the block or was seen in a previous block
+        repeated = (counts > 1) | seen
+        positions = np.flatnonzero(repeated[inverse])
+        if len(positions):
+            codes = df[self.key[0]].to_numpy()[positions]
+            years = df[self.key[1]].to_numpy()[positions]
+            for position, code, year in zip(positions.tolist(), codes, years):
+                key = int(keys[position])
+                group = self._groups.get(key)
+                if group is None:
+                    group = self._groups[key] = [code, year, 0, set()]
+                    distinct = inverse[position]
+                    if seen[distinct]:
+                        group[2] = 1
+                        group[3].add(int(self._seen_values[seen_index[distinct]]))
+                group[2] += 1
+                group[3].add(int(values[position]))
+
+        # Keys seen for the first time (already sorted by np.unique), inserted at
+        # their searchsorted positions: one copy of the arrays, no re-sort
+        new = ~seen
+        if new.any():
+            positions = seen_index[new]
+            self._seen_keys = np.insert(self._seen_keys, positions, block_keys[new])
+            self._seen_values = np.insert(self._seen_values, positions, values[first_rows[new]])
+        self.rows += len(df)
+
+    def report(self):
+        """
+        Returns:
+            pandas.DataFrame: Une ligne par clé en double (com_insee, annee,
+            occurrences, distinct_values, kind), triée par année puis code
+        """
+        report = pd.DataFrame(
+            [(code, year, occurrences, len(hashes)) for code, year, occurrences, hashes in self._groups.values()],
+            columns=REPORT_COLUMNS[:-1]
+        )
+        report = report.astype({'annee': 'int64', 'occurrences': 'int64', 'distinct_values': 'int64'})
+        report['kind'] = np.where(report['distinct_values'] > 1, CONFLICTING, EXACT)
+        return report.sort_values(['annee', 'com_insee'], ignore_index=True)
+
+
+def analyze_duplicates(df, key=KEY, value_columns=None):
+    """
+    Analyse les doublons d'un DataFrame en une passe.
+
+    Returns:
+        pandas.DataFrame: Rapport (voir DuplicateTracker.report)
+    """
+    tracker = DuplicateTracker(key, value_columns)
+    tracker.update(df)
+    return tracker.report()
+
+
+def summarize(report):
+    """
+    Returns the counts of a report: duplicated keys, extra rows (rows beyond
+    the first of each key), exact and conflicting keys.
+    """
+    conflicting = int((report['kind'] == CONFLICTING).sum())
+    return {
+        "keys": len(report),
+        "extra_rows": int((report['occurrences'] - 1).sum()),
+        "exact": len(report) - conflicting,
+        "conflicting": conflicting,
+    }
+
+
+def print_report(report, limit=10):
+    """
+    Affiche un rapport compact : totaux puis les premières clés en double
+    (les clés conflictuelles d'abord).
+    """
+    counts = summarize(report)
+    print(f"🔹 Doublons (com_insee, annee) : {counts['keys']} clés, {counts['extra_rows']} lignes en trop "
+          f"({counts['exact']} exacts, {counts['conflicting']} conflictuels)")
+    if counts['keys'] and limit:
+        shown = report.sort_values('kind', key=lambda kind: kind != CONFLICTING, kind='stable').head(limit)
+        print(shown.to_string(index=False))
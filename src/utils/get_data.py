@@ -1,33 +1,306 @@
+import hashlib
+import json
 import os
+import re
+import shutil
+import time
+import argparse
 import requests
 import zipfile
-from config import DATA_URL, RAW_DATA_PATH
+from urllib.parse import unquote, urlparse
+from config import DATA_URL, RAW_DATA_PATH, RAW_ARCHIVE_PATH, DATA_CHECKSUM
 
-def get_data():
+# Size of the blocks written to disk while downloading / extracting
+CHUNK_SIZE = 1024 * 1024
+
+# Number of attempts before giving up a download
+MAX_RETRIES = 5
+
+
+class IncompleteDownloadError(IOError):
+    """
+    Raised when the connection ends before the announced size was received,
+    or when a partial file cannot be resumed.
+    """
+
+
+def file_checksum(path, algorithm="md5", chunk_size=CHUNK_SIZE):
+    """
+    Computes the checksum of a file by reading it in fixed-size chunks.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_checksum(path, checksum):
+    """
+    Verifies a file against a checksum written as "<algorithm>:<hex>"
+    (format used by Zenodo, e.g. "md5:0123...").
+
+    Raises:
+        ValueError: If the checksum does not match
+    """
+    algorithm, _, expected = checksum.partition(":")
+    actual = file_checksum(path, algorithm)
+    if actual.lower() != expected.lower():
+        raise ValueError(f"Somme de contrôle invalide pour {path} : {algorithm}:{actual} (attendu {checksum})")
+    print(f" Somme de contrôle vérifiée ({algorithm})")
+
+
+def zenodo_checksum(url, session=None, timeout=60):
+    """
+    Returns the checksum published by Zenodo for a file URL
+    (https://zenodo.org/records/<id>/files/<name>), read from the record API
+    (https://zenodo.org/api/records/<id>), e.g. "md5:0123...".
+
+    Returns None if the URL is not a Zenodo file or the record cannot be read.
+    """
+    parsed = urlparse(url)
+    match = re.fullmatch(r"/records?/(\d+)/files/(.+)", parsed.path)
+    if match is None:
+        return None
+    record, name = match.group(1), unquote(match.group(2))
+    try:
+        response = (session or requests).get(f"{parsed.scheme}://{parsed.netloc}/api/records/{record}",
+                                             timeout=timeout)
+        response.raise_for_status()
+        files = response.json().get("files", [])
+    except (requests.RequestException, ValueError) as e:
+        print(f" Somme de contrôle Zenodo indisponible ({e})")
+        return None
+    for entry in files:
+        if entry.get("key") == name:
+            return entry.get("checksum")
+    return None
+
+
+def content_range(response):
+    """
+    Parses the Content-Range header of a response ("bytes 100-199/1000" or
+    "bytes */1000").
+
+    Returns:
+        tuple: (first byte, total size), None for the unknown parts
+    """
+    match = re.fullmatch(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", response.headers.get("Content-Range", "").strip())
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None), (int(total) if total != "*" else None)
+
+
+def _read_part_info(info_path):
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _discard_part(part_path):
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_file(url, dest_path, chunk_size=CHUNK_SIZE, max_retries=MAX_RETRIES,
+                  retry_delay=2.0, checksum=None, session=None, timeout=60):
+    """
+    Downloads a file in fixed-size chunks, resuming after a dropped connection.
+
+    The data is written to `<dest_path>.part`, with the ETag / Last-Modified
+    and total size announced by the server in `<dest_path>.part.json`. When
+    the connection drops, the download restarts from the end of the partial
+    file with an HTTP Range request (or from zero if the server ignores
+    ranges). The partial file also survives between runs, so an interrupted
+    download resumes later.
+
+    A partial file is only resumed if it still belongs to the same file:
+    the request carries If-Range (the server answers with the whole file if
+    it changed), and the Content-Range of the answer must start at the end
+    of the partial file and announce the same total size. Otherwise the
+    partial file is discarded and the download starts over.
+
+    The complete file is checked against the total size announced by the
+    server and, if given, against `checksum`; it is discarded if either
+    check fails.
+
+    Args:
+        url (str): URL of the file
+        dest_path (str): Final path of the file
+        chunk_size (int): Size of the blocks written to disk
+        max_retries (int): Number of attempts before giving up
+        retry_delay (float): Base delay between attempts (seconds, linear backoff)
+        checksum (str): Optional "<algorithm>:<hex>" checksum to verify
+        session (requests.Session): Optional session (tests, proxies...)
+        timeout (float): Connection / read timeout in seconds
+
+    Returns:
+        str: dest_path
+
+    Raises:
+        IncompleteDownloadError: If the file is still incomplete after
+            `max_retries` attempts, or its size differs from the server's
+        ValueError: If the checksum does not match
+    """
+    http = session or requests.Session()
+    part_path = dest_path + ".part"
+    info_path = part_path + ".json"
+
+    for attempt in range(1, max_retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        info = _read_part_info(info_path) if offset else {}
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = info.get("etag") or info.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        try:
+            with http.get(url, stream=True, headers=headers, timeout=timeout) as response:
+                if offset and response.status_code == 416:
+                    _, total = content_range(response)
+                    if total == offset and info.get("total") in (None, total):
+                        # Nothing left to download: the partial file is complete
+                        break
+                    _discard_part(part_path)
+                    raise IncompleteDownloadError(
+                        f"fichier partiel de {offset} octets invalide (taille sur le serveur : {total})")
+                response.raise_for_status()
+
+                if offset and response.status_code == 206:
+                    start, total = content_range(response)
+                    if start != offset or info.get("total") not in (None, total):
+                        _discard_part(part_path)
+                        raise IncompleteDownloadError(
+                            f"reprise refusée : {response.headers.get('Content-Range')} "
+                            f"pour un fichier partiel de {offset} octets")
+                    print(f" Reprise du téléchargement à {offset} octets")
+                else:
+                    if offset:
+                        print(" Le serveur ne gère pas la reprise ou le fichier a changé : "
+                              "téléchargement depuis le début")
+                    offset = 0
+                    length = response.headers.get("Content-Length")
+                    # A compressed answer is longer once decoded: its length is not the file size
+                    encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+                    total = int(length) if length is not None and not encoded else None
+
+                info = {"url": url, "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"), "total": total}
+                with open(info_path, "w", encoding="utf-8") as f:
+                    json.dump(info, f)
+
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for block in response.iter_content(chunk_size=chunk_size):
+                        f.write(block)
+
+            size = os.path.getsize(part_path)
+            if total is not None and size < total:
+                raise IncompleteDownloadError(f"{size} octets reçus sur {total}")
+            break
+
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError, IncompleteDownloadError) as e:
+            if attempt == max_retries:
+                raise
+            print(f" Connexion interrompue ({e}), nouvelle tentative {attempt + 1}/{max_retries}...")
+            time.sleep(retry_delay * attempt)
+
+    size = os.path.getsize(part_path)
+    total = _read_part_info(info_path).get("total")
+    if total is not None and size != total:
+        _discard_part(part_path)
+        raise IncompleteDownloadError(f"Taille invalide pour {dest_path} : {size} octets (attendu {total})")
+
+    if checksum:
+        try:
+            verify_checksum(part_path, checksum)
+        except ValueError:
+            _discard_part(part_path)
+            raise
+    else:
+        print(f" Taille vérifiée ({size} octets), somme de contrôle md5:{file_checksum(part_path)} (non vérifiée)")
+
+    os.replace(part_path, dest_path)
+    if os.path.exists(info_path):
+        os.remove(info_path)
+    return dest_path
+
+
+def extract_members(zip_path, dest_folder, chunk_size=CHUNK_SIZE):
+    """
+    Extracts the members of a ZIP archive one at a time, each one streamed to
+    disk in fixed-size chunks.
+
+    Returns:
+        list: Paths of the extracted files
+    """
+    extracted = []
+    dest_root = os.path.abspath(dest_folder)
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for info in zip_ref.infolist():
+            if info.is_dir():
+                continue
+            target = os.path.abspath(os.path.join(dest_root, info.filename))
+            if os.path.commonpath([dest_root, target]) != dest_root:
+                print(f" Membre ignoré (chemin hors du dossier) : {info.filename}")
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zip_ref.open(info) as src, open(target + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, chunk_size)
+            os.replace(target + ".tmp", target)
+            extracted.append(target)
+            print(f"  ✓ {info.filename}")
+    return extracted
+
+
+def get_data(url=DATA_URL, raw_folder=None, checksum=DATA_CHECKSUM, extract=True, **download_options):
     """
     Download the ZIP file from Zenodo and store it in data/raw/.
 Then unzip its contents into data/raw/.
+
+    The download is streamed to disk and resumed if the connection drops
+    (see download_file); extra keyword arguments are passed to download_file.
+    Without a checksum (DATA_CHECKSUM), the archive is verified against the
+    checksum Zenodo publishes for it (see zenodo_checksum).
+
+    With extract=False the archive is kept as the only artifact
+    (RAW_ARCHIVE_PATH) and nothing is extracted: the yearly CSVs are then
+    read directly from the archive (see src/utils/sources.py).
     """
-    raw_folder = os.path.dirname(RAW_DATA_PATH)
+    raw_folder = raw_folder or os.path.dirname(RAW_DATA_PATH)
     os.makedirs(raw_folder, exist_ok=True)
 
-    zip_path = os.path.join(raw_folder, "temp.zip")
-
-    print(f" Téléchargement des données depuis : {DATA_URL}")
-    response = requests.get(DATA_URL)
-    response.raise_for_status()
+    if extract:
+        zip_path = os.path.join(raw_folder, "temp.zip")
+    else:
+        zip_path = os.path.join(raw_folder, os.path.basename(RAW_ARCHIVE_PATH))
 
-    with open(zip_path, "wb") as f:
-        f.write(response.content)
+    if checksum is None:
+        checksum = zenodo_checksum(url, session=download_options.get("session"))
+    print(f" Téléchargement des données depuis : {url}")
+    download_file(url, zip_path, checksum=checksum, **download_options)
     print(f" Fichier ZIP enregistré dans {zip_path}")
 
-    
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(raw_folder)
+    if not extract:
+        print(" Archive conservée sans extraction : les fichiers seront lus dans le ZIP.")
+        return
+
+    extract_members(zip_path, raw_folder)
     print(f" Fichiers extraits dans {raw_folder}")
 
     os.remove(zip_path)
     print(" Téléchargement et extraction terminés.")
 
 if __name__ == "__main__":
-    get_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Téléchargement des données INERIS depuis Zenodo")
+    parser.add_argument("--no-extract", action="store_true",
+                        help="conserve l'archive ZIP sans l'extraire (lecture directe dans le ZIP)")
+    args = parser.parse_args()
+
+    get_data(extract=not args.no_extract)
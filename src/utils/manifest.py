@@ -0,0 +1,76 @@
+"""
+Manifeste du nettoyage incrémental.
+
+Le manifeste (data/cleaned/manifest.json) décrit l'état des données nettoyées :
+empreinte de chaque fichier brut, partition annuelle produite, nombre de
+lignes, colonnes et médianes du fichier utilisées pour le remplissage des
+valeurs manquantes, ainsi que la taille et l'empreinte SHA-256 du CSV combiné
+écrit à partir des partitions. Le nettoyeur et le chargeur SQLite s'en servent pour ne
+traiter que les années nouvelles ou modifiées.
+"""
+import json
+import os
+
+from src.utils.sources import content_hash, source_stat
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+MANIFEST_PATH = os.path.join(base_dir, "data", "cleaned", "manifest.json")
+
+# Folder holding one cleaned CSV per year (data/cleaned/by_year/)
+PARTITIONS_DIR = os.path.join(base_dir, "data", "cleaned", "by_year")
+
+MANIFEST_VERSION = 3
+
+
+def partition_path(year, folder=PARTITIONS_DIR):
+    """
+    Returns the path of the cleaned partition of a year.
+    """
+    return os.path.join(folder, f"cleaned_air_quality_{year}.csv")
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Loads the manifest, or returns an empty one if it is missing or outdated.
+    """
+    empty = {"version": MANIFEST_VERSION, "columns": [], "files": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ATTENTION : Manifeste illisible '{path}', reconstruction complète ({e})")
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Writes the manifest atomically.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def raw_file_signature(filepath, previous=None):
+    """
+    Returns the signature of a raw source (size, mtime, content hash).
+
+    The content hash is only recomputed when size or mtime differ from the
+    previous signature, so unchanged files cost a single stat() call. For an
+    archive member the hash is the CRC-32 of the archive directory.
+    """
+    size, mtime_ns = source_stat(filepath)
+    signature = {"size": size, "mtime_ns": mtime_ns}
+    if previous and all(previous.get(k) == v for k, v in signature.items()) and previous.get("hash"):
+        signature["hash"] = previous["hash"]
+    else:
+        signature["hash"] = content_hash(filepath)
+    return signature
@@ -0,0 +1,146 @@
+"""
+Cache disque au format Parquet pour les fichiers CSV bruts INERIS.
+
+Chaque fichier brut est associé à un fichier Parquet typé (colonnes déjà
+converties en numérique) et à une petite fiche JSON décrivant la source
+(chemin, taille, date de modification, empreinte du contenu). Le cache est
+réutilisé tant que la source n'a pas changé et reconstruit sinon.
+
+La source peut être un fichier extrait ou un membre de l'archive ZIP
+("archive.zip::membre.csv", voir src/utils/sources.py).
+
+Le cache est optionnel : sans pyarrow, les fonctions se contentent de
+renvoyer None et le CSV est relu normalement.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from src.utils.sources import content_hash, source_name, source_stat, split_source
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Folder containing the cached Parquet files (data/cache/raw/)
+CACHE_DIR = os.path.join(base_dir, "data", "cache", "raw")
+
+# Bump when the cached layout changes to invalidate existing caches
+CACHE_VERSION = 3
+
+
+def parquet_available():
+    """
+    Returns True if a Parquet engine (pyarrow) is installed.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def source_signature(file_path):
+    """
+    Describes a raw source (path, archive member, size, modification time).
+    """
+    path, member = split_source(file_path)
+    size, mtime_ns = source_stat(file_path)
+    return {
+        "version": CACHE_VERSION,
+        "path": os.path.abspath(path),
+        "member": member,
+        "size": size,
+        "mtime_ns": mtime_ns,
+    }
+
+
+def cache_paths(file_path):
+    """
+    Returns the (parquet, json) cache paths associated with a raw source.
+    """
+    path, member = split_source(file_path)
+    key = os.path.abspath(path) + (f"::{member}" if member else "")
+    name = os.path.splitext(source_name(file_path))[0]
+    stem = f"{name}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+    return (os.path.join(CACHE_DIR, stem + ".parquet"),
+            os.path.join(CACHE_DIR, stem + ".json"))
+
+
+def read_cached(file_path):
+    """
+    Reads the cached DataFrame of a raw file if the cache is still valid.
+
+    The cache is valid when size and modification time are unchanged. When
+    only the modification time differs (file copied or touched), the content
+    hash is compared before rebuilding.
+
+    Returns:
+        pandas.DataFrame: The cached data, or None if there is no valid cache
+    """
+    if not parquet_available():
+        return None
+
+    parquet_path, meta_path = cache_paths(file_path)
+    if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        current = source_signature(file_path)
+        stored = {k: meta.get(k) for k in current}
+        if stored != current:
+            same_content = (
+                meta.get("version") == CACHE_VERSION
+                and meta.get("size") == current["size"]
+                and meta.get("hash") == content_hash(file_path)
+            )
+            if not same_content:
+                return None
+            # Same content, new mtime: refresh the signature only
+            meta.update(current)
+            _write_json(meta_path, meta)
+
+        return pd.read_parquet(parquet_path)
+
+    except Exception as e:
+        print(f"ATTENTION : Cache illisible pour '{file_path}', relecture du CSV ({e})")
+        return None
+
+
+def write_cached(file_path, df):
+    """
+    Stores the typed DataFrame of a raw file in the cache.
+
+    Returns:
+        bool: True if the cache was written
+    """
+    if not parquet_available():
+        return False
+
+    parquet_path, meta_path = cache_paths(file_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        meta = source_signature(file_path)
+        meta["hash"] = content_hash(file_path)
+        meta["rows"] = len(df)
+        meta["columns"] = df.columns.tolist()
+
+        tmp_path = parquet_path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+        _write_json(meta_path, meta)
+        return True
+
+    except Exception as e:
+        print(f"ATTENTION : Impossible d'écrire le cache pour '{file_path}' : {e}")
+        return False
+
+
+def _write_json(path, content):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
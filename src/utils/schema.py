@@ -0,0 +1,170 @@
+"""
+Schéma commun du jeu de données qualité de l'air.
+
+Définit les noms de colonnes canoniques (ceux de la base SQLite), les types
+compacts utilisés en mémoire et les correspondances avec les noms longs des
+fichiers INERIS. Tous les chargeurs passent par `apply_schema` pour obtenir
+la même structure :
+
+    com_insee   category (code INSEE sur 5 caractères, ex. '01001', '2A004')
+    commune     category
+    population  float32
+    annee       int16
+    pm25 ... somo35_pop   float32
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Canonical column names (identical to the SQLite columns)
+COM_INSEE = 'com_insee'
+COMMUNE = 'commune'
+POPULATION = 'population'
+ANNEE = 'annee'
+
+POLLUTANT_COLUMNS = [
+    'pm25', 'pm25_pop',
+    'pm10', 'pm10_pop',
+    'no2', 'no2_pop',
+    'o3', 'o3_pop',
+    'aot40',
+    'somo35', 'somo35_pop',
+]
+
+COLUMNS = [COM_INSEE, COMMUNE, POPULATION, ANNEE] + POLLUTANT_COLUMNS
+
+# Compact in-memory dtypes
+DTYPES = {
+    COM_INSEE: 'category',
+    COMMUNE: 'category',
+    POPULATION: 'float32',
+    ANNEE: 'int16',
+    **{col: 'float32' for col in POLLUTANT_COLUMNS},
+}
+
+# Column names of the raw INERIS files (and of the cleaned CSV)
+RAW_COLUMNS = {
+    'COM Insee': COM_INSEE,
+    'Commune': COMMUNE,
+    'Population': POPULATION,
+    'Année': ANNEE,
+    'Moyenne annuelle de concentration de PM25 (ug/m3)': 'pm25',
+    'Moyenne annuelle de concentration de PM25 ponderee par la population (ug/m3)': 'pm25_pop',
+    'Moyenne annuelle de concentration de PM10 (ug/m3)': 'pm10',
+    'Moyenne annuelle de concentration de PM10 ponderee par la population (ug/m3)': 'pm10_pop',
+    'Moyenne annuelle de concentration de NO2 (ug/m3)': 'no2',
+    'Moyenne annuelle de concentration de NO2 ponderee par la population (ug/m3)': 'no2_pop',
+    'Moyenne annuelle de concentration de O3 (ug/m3)': 'o3',
+    'Moyenne annuelle de concentration de O3 ponderee par la population (ug/m3)': 'o3_pop',
+    "Moyenne annuelle d'AOT 40 (ug/m3.heure)": 'aot40',
+    'Moyenne annuelle de somo 35 (ug/m3.jour)': 'somo35',
+    'Moyenne annuelle de somo 35 pondere par la population (ug/m3.jour)': 'somo35_pop',
+}
+
+# Types of the raw INERIS columns, declared up front to the CSV parser
+RAW_DTYPES = {
+    'COM Insee': 'string',
+    'Commune': 'string',
+    'Population': 'int64',
+    **{raw: 'float64' for raw, col in RAW_COLUMNS.items() if col in POLLUTANT_COLUMNS},
+}
+
+# Pollutant labels used by the renderers -> canonical column
+POLLUTANTS = {
+    'NO2': 'no2',
+    'NO2 ponderee': 'no2_pop',
+    'PM10': 'pm10',
+    'PM10 ponderee': 'pm10_pop',
+    'PM25': 'pm25',
+    'PM25 ponderee': 'pm25_pop',
+    'O3': 'o3',
+    'O3 ponderee': 'o3_pop',
+    'AOT 40': 'aot40',
+    'AOT40': 'aot40',
+    'Somo 35': 'somo35',
+    'SOMO35': 'somo35',
+    'SOMO35 ponderee': 'somo35_pop',
+}
+
+# Population filter of the scatter plots (communes of more than 1,500
+# inhabitants), shared by the renderers and the storage queries
+SCATTER_MIN_POPULATION = 1500
+
+
+def pollutant_column(pollutant_type):
+    """
+    Returns the canonical column of a pollutant label ('NO2', 'Somo 35', ...).
+    """
+    try:
+        return POLLUTANTS[pollutant_type]
+    except KeyError:
+        raise KeyError(f"Polluant inconnu : '{pollutant_type}'. "
+                       f"Polluants disponibles : {list(POLLUTANTS)}") from None
+
+
+def rename_columns(df):
+    """
+    Renames the raw INERIS columns to their canonical names, in place and
+    without copying the data.
+    """
+    df.columns = [RAW_COLUMNS.get(col, col) for col in df.columns]
+    return df
+
+
+def normalize_insee(values):
+    """
+    Formats INSEE codes as 5-character strings ('1001' -> '01001').
+    Missing codes are left missing.
+    """
+    values = pd.Series(values, copy=False)
+    if pd.api.types.is_float_dtype(values):
+        values = values.astype('Int64')
+    codes = values.astype('string').str.strip().str.zfill(5)
+    return codes.astype(object).where(codes.notna(), None)
+
+
+def apply_schema(df):
+    """
+    Converts a DataFrame (raw INERIS names or canonical names) to the
+    canonical layout and compact dtypes. Unknown columns are kept as is.
+
+    Returns:
+        pandas.DataFrame: The same DataFrame, renamed and typed
+    """
+    rename_columns(df)
+
+    for col, dtype in DTYPES.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if col == COM_INSEE:
+            df[col] = normalize_insee(df[col]).astype('category')
+        elif dtype == 'int16':
+            df[col] = pd.to_numeric(df[col]).astype(dtype)
+        elif dtype == 'float32':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def concat_frames(frames):
+    """
+    Concatenates frames in the canonical layout while keeping the categorical
+    columns categorical (pd.concat falls back to object when the categories
+    of the frames differ). The frames passed in are left unchanged.
+    """
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+
+    for col in (COM_INSEE, COMMUNE):
+        if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = union_categoricals([df[col] for df in frames]).categories
+            aligned = []
+            for df in frames:
+                # Shallow copy: only the recoded column is new, the others are shared
+                df = df.copy(deep=False)
+                df[col] = df[col].cat.set_categories(categories)
+                aligned.append(df)
+            frames = aligned
+
+    return pd.concat(frames, ignore_index=True)
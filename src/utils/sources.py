@@ -0,0 +1,180 @@
+"""
+Sources de données brutes : fichiers CSV sur disque ou membres d'archive ZIP.
+
+Un membre d'archive est désigné par la chaîne "<archive.zip>::<membre>", ce
+qui permet de lire les fichiers annuels directement dans l'archive Zenodo
+sans l'extraire :
+
+    data/raw/Indicateurs_..._2000-2015_Ineris_v.Sep2020.zip::Indicateurs_..._2000_Ineris_v.Sep2020.csv
+"""
+import glob
+import hashlib
+import os
+import zipfile
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Folder containing the raw files (data/raw/)
+RAW_DIR = os.path.join(base_dir, "data", "raw")
+
+# Zenodo archive kept as is when get_data is run without extraction
+RAW_ARCHIVE_PATH = os.path.join(RAW_DIR, "Indicateurs_QualiteAir_France_Commune_2000-2015_Ineris_v.Sep2020.zip")
+
+ARCHIVE_SEPARATOR = "::"
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Computes the SHA-256 of a file by reading it in fixed-size chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_source(source):
+    """
+    Splits a source into (path, member); member is None for a plain file.
+    """
+    path, sep, member = str(source).partition(ARCHIVE_SEPARATOR)
+    return path, (member if sep else None)
+
+
+def archive_source(archive_path, member):
+    """
+    Builds the source string of an archive member.
+    """
+    return f"{archive_path}{ARCHIVE_SEPARATOR}{member}"
+
+
+def source_name(source):
+    """
+    Returns the file name of a source (member name for an archive member).
+    """
+    path, member = split_source(source)
+    return os.path.basename(member or path)
+
+
+def _member_info(path, member):
+    with zipfile.ZipFile(path) as archive:
+        return archive.getinfo(member)
+
+
+def source_exists(source):
+    """
+    Returns True if the file (or the archive member) exists.
+    """
+    path, member = split_source(source)
+    if not os.path.isfile(path):
+        return False
+    if member is None:
+        return True
+    try:
+        _member_info(path, member)
+        return True
+    except (KeyError, zipfile.BadZipFile):
+        return False
+
+
+def open_source(source):
+    """
+    Opens a source in binary mode. Archive members are decompressed on the
+    fly while being read, nothing is written to disk.
+    """
+    path, member = split_source(source)
+    if member is None:
+        return open(path, "rb")
+
+    archive = zipfile.ZipFile(path)
+    try:
+        stream = archive.open(member)
+    except Exception:
+        archive.close()
+        raise
+    # Close the archive together with the member stream
+    close_stream = stream.close
+
+    def close():
+        close_stream()
+        archive.close()
+
+    stream.close = close
+    return stream
+
+
+def source_stat(source):
+    """
+    Returns (size, mtime_ns) of a source. For an archive member, the size is
+    the uncompressed size and the mtime is the one of the archive.
+    """
+    path, member = split_source(source)
+    mtime_ns = os.stat(path).st_mtime_ns
+    if member is None:
+        return os.path.getsize(path), mtime_ns
+    return _member_info(path, member).file_size, mtime_ns
+
+
+def content_hash(source):
+    """
+    Fingerprint of the content of a source: SHA-256 for a file, the CRC-32
+    stored in the archive directory for a member (no decompression needed).
+    """
+    path, member = split_source(source)
+    if member is None:
+        return file_sha256(path)
+    return f"crc32:{_member_info(path, member).CRC:08x}"
+
+
+def find_member(archive_path, filename):
+    """
+    Finds the member of an archive whose base name is `filename`.
+
+    Returns:
+        str: The source string of the member, or None if not found
+    """
+    if not os.path.isfile(archive_path):
+        return None
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in archive.namelist():
+            if os.path.basename(name) == filename:
+                return archive_source(archive_path, name)
+    return None
+
+
+def list_archive_csv(archive_path):
+    """
+    Lists the CSV members of an archive as source strings, sorted by name.
+    """
+    if not os.path.isfile(archive_path):
+        return []
+    with zipfile.ZipFile(archive_path) as archive:
+        names = [name for name in archive.namelist() if name.lower().endswith(".csv")]
+    return [archive_source(archive_path, name) for name in sorted(names, key=os.path.basename)]
+
+
+def resolve_raw_file(filename, folder=RAW_DIR, archive_path=RAW_ARCHIVE_PATH):
+    """
+    Returns the source of a raw file: the extracted CSV in data/raw/ if it
+    exists, otherwise the member of the same name in the archive.
+
+    Returns:
+        str: The source, or the (missing) extracted path if none is found
+    """
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        return path
+    return find_member(archive_path, filename) or path
+
+
+def list_raw_sources(folder=RAW_DIR, archive_path=RAW_ARCHIVE_PATH):
+    """
+    Lists the raw CSV sources sorted by file name (hence by year): the
+    extracted files of data/raw/, completed by the archive members that were
+    not extracted.
+    """
+    sources = {os.path.basename(path): path for path in glob.glob(os.path.join(folder, "*.csv"))}
+    for member in list_archive_csv(archive_path):
+        sources.setdefault(source_name(member), member)
+    return [sources[name] for name in sorted(sources)]
@@ -0,0 +1,158 @@
+"""
+Regroupement des graphiques d'un polluant (toutes les années) dans un seul
+fichier HTML.
+
+Le fichier contient les traces de chaque année sous forme de JSON compact
+(une entrée par année ; les mises en page identiques ne sont écrites qu'une
+fois) et un curseur d'année. Changer d'année met à jour la figure en place
+avec Plotly.react : plotly n'est chargé qu'une fois et aucune page n'est
+rechargée.
+
+L'année affichée peut être choisie par l'URL (NO2_histogram.html#2012) ou
+par une page parente (visionneuse) avec postMessage({year: 2012}).
+
+Les fichiers sont écrits dans assets/bundles et nommés d'après la colonne du
+polluant (bundle_path) : main.py, visualize_from_db.py et les visionneuses
+utilisent les mêmes noms, quel que soit le libellé du polluant ('Somo 35',
+'SOMO35'...).
+
+    write_bundle({2011: fig_2011, 2012: fig_2012}, bundle_path('histogram', 'NO2'), 'Histogrammes NO2')
+"""
+import json
+import os
+
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs_version
+
+from src.utils.schema import POLLUTANTS, pollutant_column
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Folder of the bundles, shared by the renderers and the viewers
+BUNDLE_DIR = os.path.join(base_dir, "assets", "bundles")
+
+# Same plotly.js as the pages written with include_plotlyjs='cdn'
+PLOTLY_CDN = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+BUNDLE_TEMPLATE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <script src="{plotly_src}"></script>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 10px; }}
+        .slider-container {{ display: flex; align-items: center; gap: 15px; padding: 10px 20px; }}
+        .slider-container input[type="range"] {{ flex: 1; }}
+        .year-display {{ font-size: 22px; font-weight: bold; color: #2c3e50; min-width: 60px; }}
+        #graph {{ width: 100%; height: 85vh; }}
+    </style>
+</head>
+<body>
+    <div class="slider-container">
+        <label for="year-slider">📅 Année :</label>
+        <input type="range" id="year-slider" min="0" max="{last}" value="{last}" step="1">
+        <div class="year-display" id="year-display"></div>
+    </div>
+    <div id="graph"></div>
+
+    <script>
+        const bundle = {bundle};
+        const graph = document.getElementById('graph');
+        const yearSlider = document.getElementById('year-slider');
+        const yearDisplay = document.getElementById('year-display');
+
+        function show(index) {{
+            const frame = bundle.frames[index];
+            yearSlider.value = index;
+            yearDisplay.textContent = bundle.years[index];
+            Plotly.react(graph, frame.data, bundle.layouts[frame.layout], {{responsive: true}});
+        }}
+
+        function showYear(year) {{
+            const index = bundle.years.indexOf(Number(year));
+            if (index >= 0) show(index);
+        }}
+
+        yearSlider.addEventListener('input', () => show(parseInt(yearSlider.value)));
+        window.addEventListener('message', event => {{
+            if (event.data && event.data.year !== undefined) showYear(event.data.year);
+        }});
+        window.addEventListener('hashchange', () => showYear(location.hash.slice(1)));
+
+        show({last});
+        if (location.hash) showYear(location.hash.slice(1));
+    </script>
+</body>
+</html>
+"""
+
+
+def bundle_name(chart, pollutant):
+    """
+    Nom du fichier groupé d'un polluant : '<colonne>_<chart>.html'
+    ('Somo 35', 'SOMO35' et 'somo 35' donnent somo35_histogram.html).
+    """
+    columns = {label.casefold(): column for label, column in POLLUTANTS.items()}
+    column = columns.get(pollutant.casefold()) or pollutant_column(pollutant)
+    return f"{column}_{chart}.html"
+
+
+def bundle_path(chart, pollutant, bundle_dir=BUNDLE_DIR):
+    """
+    Chemin du fichier groupé d'un polluant dans `bundle_dir` (voir bundle_name).
+    """
+    return os.path.join(bundle_dir, bundle_name(chart, pollutant))
+
+
+def bundle_json(figures):
+    """
+    Sérialise les figures d'un polluant.
+
+    Args:
+        figures (dict): {année: plotly.graph_objects.Figure}
+
+    Returns:
+        str: Objet JSON avec years (triées), layouts (mises en page
+            distinctes) et frames (traces de chaque année et indice de sa
+            mise en page)
+    """
+    years = sorted(figures)
+    layouts, layout_index, frames = [], {}, []
+    for year in years:
+        figure = figures[year].to_plotly_json()
+        layout = to_json_plotly(figure.get('layout', {}))
+        if layout not in layout_index:
+            layout_index[layout] = len(layouts)
+            layouts.append(layout)
+        frames.append(f'{{"data":{to_json_plotly(figure["data"])},"layout":{layout_index[layout]}}}')
+
+    # The traces and layouts are already JSON: they are inserted as is
+    return (f'{{"years":{json.dumps([int(year) for year in years])},'
+            f'"layouts":[{",".join(layouts)}],"frames":[{",".join(frames)}]}}')
+
+
+def write_bundle(figures, path, title, plotly_src=PLOTLY_CDN):
+    """
+    Écrit les figures d'un polluant (une par année) dans un seul fichier HTML
+    avec un curseur d'année.
+
+    Args:
+        figures (dict): {année: plotly.graph_objects.Figure}
+        path (str): Fichier HTML créé
+        title (str): Titre de la page
+        plotly_src (str): Adresse du script plotly.js
+
+    Returns:
+        str: Chemin du fichier créé
+    """
+    if not figures:
+        raise ValueError("Aucune figure à regrouper")
+
+    # "</" would close the <script> element if it appeared in a text of the figures
+    bundle = bundle_json(figures).replace("</", "<\\/")
+    html_content = BUNDLE_TEMPLATE.format(title=title, plotly_src=plotly_src, bundle=bundle,
+                                          last=len(figures) - 1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    return path
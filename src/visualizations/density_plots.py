@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from src.utils.schema import POPULATION, pollutant_column
+
+# Grid of the density plots: bins along log10(population) and along the concentration
+DENSITY_BINS = (40, 40)
+
+# Population quantiles of the median line (deciles)
+MEDIAN_GROUPS = 10
+
+
+def density_grid(data, column, bins=DENSITY_BINS):
+    """
+    Compte les communes par case (log10 population, concentration) en une
+    passe (np.histogram2d). Les communes sans population ou sans valeur sont
+    ignorées.
+
+    Args:
+        data (pd.DataFrame): Colonnes population et polluant
+        column (str): Colonne du polluant
+        bins (tuple): Nombre de classes (population, concentration)
+
+    Returns:
+        tuple: (counts de forme (classes concentration, classes population),
+            bornes log10 population, bornes concentration), ou None s'il n'y a
+            aucune commune
+    """
+    population = data[POPULATION].to_numpy(dtype='float64')
+    values = data[column].to_numpy(dtype='float64')
+    valid = (population > 0) & ~np.isnan(values)
+    if not valid.any():
+        return None
+
+    log_population = np.log10(population[valid])
+    counts, x_edges, y_edges = np.histogram2d(log_population, values[valid], bins=bins)
+    # Rows = concentration (y axis), columns = population (x axis)
+    return counts.T, x_edges, y_edges
+
+
+def decile_medians(data, column, groups=MEDIAN_GROUPS):
+    """
+    Médiane de la concentration par décile de population.
+
+    Returns:
+        pd.DataFrame: Colonnes log_population (médiane du groupe) et median,
+            une ligne par groupe
+    """
+    population = data[POPULATION].to_numpy(dtype='float64')
+    values = data[column].to_numpy(dtype='float64')
+    valid = (population > 0) & ~np.isnan(values)
+    frame = pd.DataFrame({'log_population': np.log10(population[valid]), 'value': values[valid]})
+    if frame.empty:
+        return pd.DataFrame(columns=['log_population', 'median'])
+
+    # Ranks instead of quantile edges: groups of equal size even with tied populations
+    frame['group'] = frame['log_population'].rank(method='first').sub(1).mul(groups).floordiv(len(frame))
+    medians = frame.groupby('group').median()
+    return medians.rename(columns={'value': 'median'}).reset_index(drop=True)
+
+
+def _log_ticks(x_edges):
+    """
+    Ticks at powers of ten (and 3 x powers of ten) within the log10 population range.
+    """
+    tickvals = [np.log10(m * 10 ** e) for e in range(0, 8) for m in (1, 3)]
+    tickvals = [v for v in tickvals if x_edges[0] <= v <= x_edges[-1]]
+    ticktext = [f"{10 ** v:,.0f}".replace(',', ' ') for v in tickvals]
+    return tickvals, ticktext
+
+
+def create_pollution_density(data, pollutant_type, bins=DENSITY_BINS, median_line=True, contour=False):
+    """
+    Crée une carte de densité population / concentration : nombre de communes
+    par case (log10 population, concentration), avec en option la médiane de
+    la concentration par décile de population. La taille de la figure ne
+    dépend que de la grille, pas du nombre de communes.
+
+    Args:
+        data (pd.DataFrame): Le DataFrame contenant les données
+        pollutant_type (str): Type de polluant ("NO2", "PM10", "O3"...)
+        bins (tuple): Nombre de classes (population, concentration)
+        median_line (bool): Ajoute la médiane par décile de population
+        contour (bool): Contours au lieu d'une grille de cases
+
+    Returns:
+        plotly.graph_objects.Figure: La figure créée
+    """
+    column_name = pollutant_column(pollutant_type)
+    grid = density_grid(data, column_name, bins)
+    if grid is None:
+        raise ValueError(f"Aucune valeur de {pollutant_type} avec une population renseignée")
+    counts, x_edges, y_edges = grid
+
+    x_centers = ((x_edges[:-1] + x_edges[1:]) / 2).round(4)
+    y_centers = ((y_edges[:-1] + y_edges[1:]) / 2).round(3)
+    # Empty cells are left transparent
+    z = np.where(counts > 0, counts, np.nan)
+    common = dict(
+        x=x_centers,
+        y=y_centers,
+        z=z,
+        colorscale='Viridis',
+        colorbar=dict(title='Communes'),
+        customdata=np.broadcast_to(np.round(10 ** x_centers), z.shape),
+        hovertemplate="Population ≈ %{customdata:,.0f} hab.<br>" +
+                     f"{pollutant_type}: %{{y:.1f}} µg/m³<br>" +
+                     "Nombre de communes: %{z}<extra></extra>",
+        name='Densité'
+    )
+    traces = [go.Contour(**common, contours_coloring='heatmap', line_width=0) if contour
+              else go.Heatmap(**common)]
+
+    if median_line:
+        medians = decile_medians(data, column_name)
+        traces.append(go.Scatter(
+            x=medians['log_population'].round(4),
+            y=medians['median'].round(3),
+            mode='lines+markers',
+            name='Médiane par décile de population',
+            line=dict(color='rgb(255,80,80)', width=2),
+            marker=dict(size=6),
+            hovertemplate=f"Médiane {pollutant_type}: %{{y:.1f}} µg/m³<extra></extra>"
+        ))
+
+    tickvals, ticktext = _log_ticks(x_edges)
+    layout = go.Layout(
+        title=dict(
+            text=f'Densité des communes : population et concentration de {pollutant_type}',
+            font=dict(size=24)
+        ),
+        xaxis=dict(
+            title='Population des communes (échelle logarithmique)',
+            tickvals=tickvals,
+            ticktext=ticktext,
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='LightGray'
+        ),
+        yaxis=dict(
+            title='Concentration de SOMO 35 (µg/m³)' if pollutant_type == 'SOMO 35'
+            else 'Concentration de AOT 40 (µg/m³)' if pollutant_type == 'AOT 40'
+            else f'Concentration de {pollutant_type} (µg/m³)',
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='LightGray'
+        ),
+        legend=dict(x=0.01, y=0.99)
+    )
+
+    fig = go.Figure(data=traces, layout=layout)
+    return fig
@@ -1,41 +1,54 @@
+import numpy as np
 import plotly.graph_objects as go
 from plotly.io import write_html
+from src.database.summary import HISTOGRAM_BINS, histogram_edges
+from src.utils.schema import pollutant_column
 
-def create_pollution_histogram(data, pollutant_type):
+
+def bin_values(values, bins=HISTOGRAM_BINS, edges=None):
     """
-    Creates a histogram for NO₂, PM₁₀, O₃, SOMO₃₅, AOT₄₀, or PM₂.₅.
+    Computes the histogram of a column with NumPy (missing values ignored).
+
+    Args:
+        values (pd.Series): Concentrations
+        bins (int): Number of bins, when no edges are given
+        edges (array): Bin edges shared by several figures (e.g. the same
+            edges for every year, see global_edges)
 
     Returns:
-    plotly.graph_objects.Figure: The created figure
+        tuple: (counts, edges)
     """
-    if pollutant_type == 'Somo 35':
-        column_name = 'Moyenne annuelle de somo 35 (ug/m3.jour)'
-    elif pollutant_type == 'AOT 40':
-        column_name = "Moyenne annuelle d'AOT 40 (ug/m3.heure)"
-    elif pollutant_type == 'PM25':
-        column_name = 'Moyenne annuelle de concentration de PM25 (ug/m3)'
-    else:
-        column_name = f'Moyenne annuelle de concentration de {pollutant_type} (ug/m3)'
-    values = data[column_name]
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    return np.histogram(values, bins=bins if edges is None else edges)
 
-    trace = go.Histogram(
-        x=values,
-        name=f'Distribution {pollutant_type}',
-        nbinsx=30,
-        marker_color='rgb(70, 130, 180)',  # Bleu acier, plus visible
-        hovertemplate="<b>Concentration</b>: %{x:.1f} µg/m³<br>" +
-                     "Nombre de communes: %{y}<extra></extra>"
-    )
 
-    layout = go.Layout(
+def global_edges(values, bins=HISTOGRAM_BINS):
+    """
+    Returns bin edges covering all the given values (all the years of a
+    pollutant), or None if there is no value.
+    """
+    values = np.asarray(values, dtype='float64')
+    lower, upper = np.nanmin(values, initial=np.inf), np.nanmax(values, initial=-np.inf)
+    if lower > upper:
+        return None
+    return histogram_edges(lower, upper, bins)
+
+
+def _axis_title(pollutant_type):
+    return ('Concentration de SOMO 35 (µg/m³)' if pollutant_type == 'SOMO 35'
+            else 'Concentration de AOT 40 (µg/m³)' if pollutant_type == 'AOT 40'
+            else f'Concentration de {pollutant_type} (µg/m³)')
+
+
+def _layout(pollutant_type):
+    return go.Layout(
         title=dict(
             text=f'Distribution des concentrations de {pollutant_type}',
             font=dict(size=24)
         ),
         xaxis=dict(
-            title='Concentration de SOMO 35 (µg/m³)' if pollutant_type == 'SOMO 35'
-            else 'Concentration de AOT 40 (µg/m³)' if pollutant_type == 'AOT 40'
-            else f'Concentration de {pollutant_type} (µg/m³)',  
+            title=_axis_title(pollutant_type),
             showgrid=True,
             gridwidth=1,
             gridcolor='LightGray'
@@ -45,8 +58,63 @@ def create_pollution_histogram(data, pollutant_type):
             showgrid=True,
             gridwidth=1,
             gridcolor='LightGray'
-        )
+        ),
+        bargap=0
+    )
+
+
+def create_binned_histogram(counts, edges, pollutant_type):
+    """
+    Creates a histogram from counts already computed (bin_values, or the
+    pollutant_histogram summary table): one bar per bin, so the figure only
+    holds 3 numbers per bin instead of every value.
+
+    Returns:
+    plotly.graph_objects.Figure: The created figure
+    """
+    edges = np.asarray(edges, dtype='float64')
+    trace = go.Bar(
+        x=((edges[:-1] + edges[1:]) / 2).round(4),
+        y=np.asarray(counts, dtype='int64'),
+        width=np.diff(edges).round(4),
+        customdata=np.column_stack([edges[:-1], edges[1:]]).round(2),
+        name=f'Distribution {pollutant_type}',
+        marker_color='rgb(70, 130, 180)',  # Bleu acier, plus visible
+        hovertemplate="<b>Concentration</b>: %{customdata[0]:.1f} - %{customdata[1]:.1f} µg/m³<br>" +
+                     "Nombre de communes: %{y}<extra></extra>"
+    )
+    return go.Figure(data=[trace], layout=_layout(pollutant_type))
+
+
+def create_pollution_histogram(data, pollutant_type, binned=True, edges=None):
+    """
+    Creates a histogram for NO₂, PM₁₀, O₃, SOMO₃₅, AOT₄₀, or PM₂.₅.
+
+    Args:
+        binned (bool): Bins the values in Python and draws bars (a few KB of
+            HTML); False embeds the raw values in a go.Histogram binned by
+            the browser
+        edges (array): Bin edges of the binned mode (default: 30 bins over
+            the values of the figure)
+
+    Returns:
+    plotly.graph_objects.Figure: The created figure
+    """
+    column_name = pollutant_column(pollutant_type)
+    values = data[column_name]
+
+    if binned:
+        counts, bin_edges = bin_values(values, edges=edges)
+        return create_binned_histogram(counts, bin_edges, pollutant_type)
+
+    trace = go.Histogram(
+        x=values,
+        name=f'Distribution {pollutant_type}',
+        nbinsx=HISTOGRAM_BINS,
+        marker_color='rgb(70, 130, 180)',  # Bleu acier, plus visible
+        hovertemplate="<b>Concentration</b>: %{x:.1f} µg/m³<br>" +
+                     "Nombre de communes: %{y}<extra></extra>"
     )
 
-    fig = go.Figure(data=[trace], layout=layout)
-    return fig
\ No newline at end of file
+    fig = go.Figure(data=[trace], layout=_layout(pollutant_type))
+    return fig
@@ -1,9 +1,13 @@
 import pandas as pd
 import folium
 from folium.plugins import HeatMap
-import sqlite3
 import json
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.database.connection import read_connection
+from src.utils.schema import ANNEE, COMMUNE, POPULATION, apply_schema, pollutant_column
 
 output_dir = "assets"
 os.makedirs(output_dir, exist_ok=True)
@@ -15,92 +19,51 @@ print("🔄 Chargement des données depuis la base de données...")
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 db_path = os.path.join(base_dir, "data", "air_quality.db")
 
-# Connect to the database
-conn = sqlite3.connect(db_path)
-
-# Using DISTINCT to avoid duplicates
+# One row per (com_insee, annee); the coordinates and the official name of
+# the communes are stored in the database (view air_quality_geo)
 query = """
-SELECT DISTINCT com_insee, commune, population, annee, 
-       pm25, pm10, no2, o3, aot40, somo35
-FROM air_quality
+SELECT com_insee, commune, nom_officiel AS nom_de_la_commune, latitude, longitude,
+       population, annee, pm25, pm10, no2, o3, aot40, somo35
+FROM air_quality_geo
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL
 ORDER BY annee, com_insee
 """
-df_pollution = pd.read_sql_query(query, conn)
-conn.close()
-
-print(f"✅ Données chargées depuis la base : {len(df_pollution)} lignes")
-
-# Renommer les colonnes pour correspondre au format attendu
-df_pollution = df_pollution.rename(columns={
-    'com_insee': 'COM Insee',
-    'commune': 'Commune',
-    'population': 'Population',
-    'annee': 'Année',
-    'pm25': 'Moyenne annuelle de concentration de PM2.5 (ug/m3)',
-    'pm10': 'Moyenne annuelle de concentration de PM10 (ug/m3)',
-    'no2': 'Moyenne annuelle de concentration de NO2 (ug/m3)',
-    'o3': 'Moyenne annuelle de concentration de O3 (ug/m3)',
-    'aot40': 'Moyenne annuelle de concentration de AOT 40 (ug/m3.h)',
-    'somo35': 'Moyenne annuelle de concentration de somo 35 (ug/m3.j)'
-})
-
-# --- Load the contact details for the municipalities ---
-df_communes = pd.read_csv(os.path.join(base_dir, "data", "cleaned", "base-officielle-codes-postaux.csv"), dtype={"code_commune_insee": str})
-
-# --- Deduplicate municipalities ---
-df_communes = df_communes.drop_duplicates(subset=['code_commune_insee'], keep='first')
-print(f"✅ Communes uniques avec coordonnées: {len(df_communes)}")
-
-# --- Prepare columns for merge ---
-df_pollution['COM Insee'] = df_pollution['COM Insee'].astype(str)
-df_communes['code_commune_insee'] = df_communes['code_commune_insee'].astype(str)
-
-    # --- Merge to add latitude, longitude, and commune name ---
-df_merged = df_pollution.merge(
-    df_communes[['code_commune_insee', 'latitude', 'longitude', 'nom_de_la_commune']],
-    left_on='COM Insee',
-    right_on='code_commune_insee',
-    how='left'
-)
+# Read-only connection borrowed from the shared pool
+with read_connection(db_path) as conn:
+    df_map = pd.read_sql_query(query, conn)
 
-# --- Filter valid data ---
-df_map = df_merged.dropna(subset=['latitude', 'longitude']).copy()
+# Types compacts du schéma commun (les colonnes portent déjà les noms canoniques)
+df_map = apply_schema(df_map)
 
 print(f"✅ Données chargées : {len(df_map)} communes avec coordonnées")
 
 # Polluants
-pollutants = {
-    'PM10': 'Moyenne annuelle de concentration de PM10 (ug/m3)',
-    'PM25': 'Moyenne annuelle de concentration de PM2.5 (ug/m3)',
-    'NO2': 'Moyenne annuelle de concentration de NO2 (ug/m3)',
-    'O3': 'Moyenne annuelle de concentration de O3 (ug/m3)',
-    'AOT40': 'Moyenne annuelle de concentration de AOT 40 (ug/m3.h)',
-    'SOMO35': 'Moyenne annuelle de concentration de somo 35 (ug/m3.j)'
-}
+pollutants = {key: pollutant_column(key) for key in ['PM10', 'PM25', 'NO2', 'O3', 'AOT40', 'SOMO35']}
 
 # Get available years
-years = sorted([int(y) for y in df_map['Année'].unique()])
+years = sorted([int(y) for y in df_map[ANNEE].unique()])
 print(f"📅 Années disponibles : {years}")
 
 # Create a data dictionary by year and by municipality
 data_by_year = {}
 for year in years:
-    df_year = df_map[df_map['Année'] == year]
+    df_year = df_map[df_map[ANNEE] == year]
     data_by_year[year] = {}
     
     for _, row in df_year.iterrows():
         commune_key = f"{row['latitude']:.6f}_{row['longitude']:.6f}"
         data_by_year[year][commune_key] = {
-            'nom': row['nom_de_la_commune'] if pd.notna(row['nom_de_la_commune']) else row['Commune'],
+            'nom': row['nom_de_la_commune'] if pd.notna(row['nom_de_la_commune']) else row[COMMUNE],
             'latitude': row['latitude'],
             'longitude': row['longitude'],
-            'population': int(row['Population']) if pd.notna(row['Population']) else 0,
+            'population': int(row[POPULATION]) if pd.notna(row[POPULATION]) else 0,
         }
         
         # Add pollutant concentrations
         for pollutant_key, pollutant_col in pollutants.items():
             if pollutant_col in row and pd.notna(row[pollutant_col]):
-                data_by_year[year][commune_key][pollutant_key] = float(row[pollutant_col])
+                # float32 -> 3 decimals: avoids float32 noise in the embedded JSON
+                data_by_year[year][commune_key][pollutant_key] = round(float(row[pollutant_col]), 3)
 
 
 html_content = """
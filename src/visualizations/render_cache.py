@@ -0,0 +1,178 @@
+"""
+Cache des graphiques générés : un graphique n'est reconstruit et réécrit que
+si sa clé a changé.
+
+La clé d'un graphique est l'empreinte SHA-256 de :
+
+    - ses données (valeurs des colonnes utilisées : année x polluant,
+      population, codes INSEE), via pandas.util.hash_pandas_object ; pour
+      une tâche qui lit le stockage, l'empreinte de l'année fournie par le
+      stockage (Storage.data_signature) et la requête, sans relire les lignes
+    - ses paramètres (type, polluant, année(s), options : classes, max_points...)
+    - la version du code de rendu (sources des modules de graphiques, du
+      worker et des modules dont ils lisent les constantes, version de
+      plotly), et pour les nuages de points la correspondance code INSEE ->
+      commune
+
+Les clés des fichiers écrits sont enregistrées dans data/cache/render.json
+(chemin du fichier -> clé). Un graphique dont la clé est inchangée et dont le
+fichier existe toujours est ignoré : seules les données sont lues et
+hachées (ou pas même lues si le stockage connaît l'empreinte de l'année),
+sans construire de figure plotly ni écrire de HTML.
+
+    cache = RenderCache.load()
+    render_jobs(jobs, cache=cache)    # enregistre le cache et affiche succès / échecs
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+CACHE_PATH = os.path.join(base_dir, "data", "cache", "render.json")
+
+# Bump to invalidate every cached figure
+CACHE_VERSION = 1
+
+# Modules whose source code is part of the key (paths from the repository
+# root): the chart modules, the worker that calls them, and the helpers whose
+# constants or functions shape a figure (default population threshold of the
+# scatter plots, commune names, bin edges, pollutant columns). Editing one of
+# them rebuilds every figure.
+RENDERER_MODULES = [
+    "src/visualizations/scatter_plots.py",
+    "src/visualizations/histograms.py",
+    "src/visualizations/density_plots.py",
+    "src/visualizations/bundles.py",
+    "src/visualizations/render_pool.py",
+    "src/database/data_access.py",
+    "src/database/summary.py",
+    "src/utils/commune_index.py",
+    "src/utils/schema.py",
+]
+
+_code_version = None
+
+
+def code_version():
+    """
+    Empreinte du code de rendu (sources de RENDERER_MODULES, version de
+    plotly), calculée une fois par processus.
+    """
+    global _code_version
+    if _code_version is None:
+        import plotly
+
+        digest = hashlib.sha256(f"{CACHE_VERSION}:{plotly.__version__}".encode())
+        for name in RENDERER_MODULES:
+            with open(os.path.join(base_dir, name), "rb") as f:
+                digest.update(f"{name}\0".encode())
+                digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def names_signature(insee_to_commune):
+    """
+    Empreinte de la correspondance code INSEE -> commune (noms affichés par
+    les nuages de points), calculée sur son contenu : l'empreinte enregistrée
+    avec l'index des communes, sinon celle des paires du dictionnaire
+    (recalculée à chaque appel, un dictionnaire pouvant être modifié).
+    """
+    index = getattr(insee_to_commune, "index", None)
+    if index is not None and hasattr(index, "digest"):
+        return index.digest
+    digest = hashlib.sha256()
+    for code, name in sorted(insee_to_commune.items()):
+        digest.update(f"{code}\0{name}\0".encode())
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    # Numpy arrays and scalars of the options (bin edges...)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def data_signature(df):
+    """
+    Empreinte d'un DataFrame : noms des colonnes et valeurs des lignes (dans
+    leur ordre), quelle que soit la catégorisation des colonnes.
+    """
+    digest = hashlib.sha256(json.dumps([str(col) for col in df.columns]).encode())
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False, categorize=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def figure_key(chart, pollutant, year, options, signatures, names=None, query=None):
+    """
+    Clé d'un graphique.
+
+    Args:
+        signatures (list): Empreintes des données du graphique (data_signature
+            de chaque DataFrame, ou empreinte de l'année fournie par le
+            stockage), une par année pour un fichier regroupé
+        names (str): Empreinte de la correspondance des communes, si le
+            graphique affiche des noms de communes
+        query (dict): Requête du stockage, si les données en viennent
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    params = json.dumps({"chart": chart, "pollutant": pollutant, "year": year, "options": options or {},
+                         "names": names, "query": query}, sort_keys=True, default=_json_default)
+    digest = hashlib.sha256(f"{code_version()}\0{params}".encode())
+    for signature in signatures:
+        digest.update(f"{signature}\0".encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Clés des graphiques déjà écrits (chemin du fichier -> clé).
+    """
+
+    def __init__(self, keys=None, path=CACHE_PATH):
+        self.keys = keys or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path=CACHE_PATH):
+        """
+        Charge le cache, ou renvoie un cache vide s'il est absent ou illisible.
+        """
+        keys = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+                if content.get("version") == CACHE_VERSION:
+                    keys = content.get("figures", {})
+            except (OSError, ValueError) as e:
+                print(f"ATTENTION : Cache des graphiques illisible '{path}', tout sera regénéré ({e})")
+        return cls(keys, path)
+
+    def get(self, output_path):
+        """
+        Returns the key of the file last written at `output_path`, or None
+        if the file is missing.
+        """
+        key = self.keys.get(os.path.abspath(output_path))
+        return key if key is not None and os.path.exists(output_path) else None
+
+    def set(self, output_path, key):
+        self.keys[os.path.abspath(output_path)] = key
+
+    def save(self):
+        """
+        Writes the cache atomically.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "figures": self.keys}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
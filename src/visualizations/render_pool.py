@@ -0,0 +1,263 @@
+"""
+Rendu parallèle des graphiques (année, polluant, type de graphique).
+
+Chaque graphique est une tâche indépendante : construction de la figure
+plotly puis écriture du fichier HTML. Les tâches sont réparties sur un pool
+de processus ; le temps de rendu diminue donc avec le nombre de cœurs.
+
+Une tâche porte soit ses données (colonnes utiles de l'année, envoyées au
+processus), soit la requête à exécuter par le processus sur le stockage
+configuré (src.database.storage). La correspondance code INSEE -> commune
+n'est envoyée qu'une fois à chaque processus. Une erreur n'arrête que sa
+tâche : elle est affichée avec la progression et récapitulée à la fin.
+
+Une tâche dont `year` est une liste d'années produit un fichier regroupant
+les graphiques de toutes ces années (src/visualizations/bundles.py) : ses
+données sont alors un dictionnaire {année: DataFrame}, ou sa requête est
+exécutée pour chaque année.
+
+Avec un cache (src/visualizations/render_cache.py), chaque processus calcule
+la clé de son graphique à partir des données lues et ne reconstruit le
+graphique que si la clé a changé.
+
+    jobs = [RenderJob('scatter', 'NO2', 2012, 'NO2_scatter_2012.html', data=df_2012)]
+    errors = render_jobs(jobs, max_workers=4, insee_to_commune=insee_to_commune, cache=RenderCache.load())
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.utils.schema import COM_INSEE, POPULATION
+
+# chart: 'scatter', 'histogram' or 'density'; data: DataFrame of the figure, or
+# query: keyword arguments of Storage.query, run by the worker;
+# options: keyword arguments of the chart function (bin edges, max_points...)
+RenderJob = namedtuple('RenderJob', ['chart', 'pollutant', 'year', 'path', 'data', 'query', 'options'],
+                       defaults=(None, None, None))
+
+CHARTS = ('scatter', 'histogram', 'density')
+
+# Columns read by each chart, besides the pollutant column
+CHART_COLUMNS = {'scatter': [COM_INSEE, POPULATION], 'histogram': [], 'density': [POPULATION]}
+
+# Commune names (sent by the pool initializer, or loaded on first use) and
+# storage of the worker process
+_insee_to_commune = None
+_storage = None
+
+
+def _init_worker(insee_to_commune):
+    global _insee_to_commune
+    _insee_to_commune = insee_to_commune
+
+
+def _commune_names():
+    global _insee_to_commune
+    if _insee_to_commune is None:
+        from src.utils.common_functions import load_commune_mappings
+        _insee_to_commune = load_commune_mappings()[1]
+    return _insee_to_commune
+
+
+def job_columns(chart, column):
+    """
+    Returns the columns needed by a chart of the given pollutant column.
+    """
+    return CHART_COLUMNS[chart] + [column]
+
+
+def is_bundle(job):
+    return isinstance(job.year, (list, tuple))
+
+
+def bundle_jobs(jobs, bundle_path):
+    """
+    Regroupe les tâches annuelles d'un même (polluant, type de graphique) en
+    une tâche groupée (un fichier pour toutes les années).
+
+    Args:
+        jobs (list): RenderJob d'une année chacune
+        bundle_path (callable): (chart, pollutant) -> chemin du fichier groupé
+
+    Returns:
+        list: RenderJob groupées, dans l'ordre de première apparition
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.chart, job.pollutant), []).append(job)
+
+    bundles = []
+    for (chart, pollutant), group in groups.items():
+        years = [job.year for job in group]
+        first = group[0]
+        if first.data is not None:
+            data, query = {job.year: job.data for job in group}, None
+        else:
+            data, query = None, {key: value for key, value in first.query.items() if key != 'year'}
+        bundles.append(RenderJob(chart, pollutant, years, bundle_path(chart, pollutant),
+                                 data=data, query=query, options=first.options))
+    return bundles
+
+
+def _worker_storage():
+    global _storage
+    if _storage is None:
+        from src.database.storage import get_storage
+        _storage = get_storage()
+    return _storage
+
+
+def _job_data(job, year=None):
+    if job.data is not None:
+        return job.data if year is None else job.data[year]
+    storage = _worker_storage()
+    return storage.query(**job.query) if year is None else storage.query(**job.query, year=year)
+
+
+def _storage_signatures(job, years):
+    """
+    Returns the storage digests of the years read by a query job, or None if
+    the job carries its data or the storage does not know a digest.
+    """
+    if job.data is not None:
+        return None
+    storage = _worker_storage()
+    signatures = [storage.data_signature(year if year is not None else job.query.get('year')) for year in years]
+    return None if None in signatures else signatures
+
+
+def _build_figure(chart, pollutant, data, options):
+    from src.visualizations.density_plots import create_pollution_density
+    from src.visualizations.histograms import create_pollution_histogram
+    from src.visualizations.scatter_plots import create_pollution_scatter
+
+    if chart == 'scatter':
+        return create_pollution_scatter(data, _commune_names(), pollutant, **options)
+    if chart == 'histogram':
+        return create_pollution_histogram(data, pollutant, **options)
+    if chart == 'density':
+        return create_pollution_density(data, pollutant, **options)
+    raise ValueError(f"Type de graphique inconnu : '{chart}'. Types disponibles : {CHARTS}")
+
+
+def render_job(job, cached_key=None, keyed=False):
+    """
+    Construit et écrit un graphique (ou le fichier regroupant les années
+    d'une tâche groupée).
+
+    Args:
+        cached_key (str): Clé du fichier déjà écrit (render_cache) : le
+            graphique n'est pas reconstruit si sa clé est identique
+        keyed (bool): Calcule la clé du graphique
+
+    Returns:
+        tuple: (message d'erreur ou None, clé ou None, True si le fichier
+            à jour a été conservé)
+    """
+    # plotly n'est importé que dans les processus qui génèrent des graphiques
+    from plotly.io import write_html
+    from src.visualizations.bundles import write_bundle
+    from src.visualizations.render_cache import data_signature, figure_key, names_signature
+
+    try:
+        options = job.options or {}
+        years = list(job.year) if is_bundle(job) else [None]
+        frames = None
+
+        key = None
+        if keyed:
+            # Storage jobs: digest of each year kept by the storage, the rows are
+            # only read to rebuild the figure
+            signatures = _storage_signatures(job, years)
+            if signatures is None:
+                frames = {year: _job_data(job, year) for year in years}
+                signatures = [data_signature(df) for df in frames.values()]
+            names = names_signature(_commune_names()) if job.chart == 'scatter' else None
+            key = figure_key(job.chart, job.pollutant, job.year, options, signatures, names, job.query)
+            if key == cached_key:
+                return None, key, True
+
+        if frames is None:
+            frames = {year: _job_data(job, year) for year in years}
+        if is_bundle(job):
+            figures = {year: _build_figure(job.chart, job.pollutant, data, options) for year, data in frames.items()}
+            write_bundle(figures, job.path, f"{job.pollutant} ({job.chart})")
+        else:
+            fig = _build_figure(job.chart, job.pollutant, frames[None], options)
+            write_html(fig, job.path, auto_open=False, include_plotlyjs='cdn')
+        return None, key, False
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", None, False
+
+
+def render_jobs(jobs, max_workers=None, insee_to_commune=None, cache=None):
+    """
+    Exécute les tâches de rendu, en parallèle si `max_workers` le permet,
+    en affichant la progression.
+
+    Args:
+        jobs (list): RenderJob à exécuter
+        max_workers (int): Nombre de processus (défaut : nombre de cœurs ;
+            1 = rendu séquentiel dans le processus courant)
+        insee_to_commune (dict): Correspondance code INSEE -> commune des
+            nuages de points (défaut : chargée par chaque processus)
+        cache (RenderCache): Cache des graphiques (src/visualizations/render_cache.py) :
+            les fichiers à jour ne sont pas regénérés, le cache est enregistré
+            à la fin (défaut : tout est regénéré)
+
+    Returns:
+        list: (RenderJob, message d'erreur) des tâches en échec
+    """
+    jobs = list(jobs)
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs)) or 1
+    print(f"Rendu de {len(jobs)} graphiques ({workers} processus)...")
+
+    start = time.perf_counter()
+    errors = []
+    hits = 0
+
+    def report(done, job, result):
+        nonlocal hits
+        error, key, hit = result
+        years = f"{job.year[0]}-{job.year[-1]}" if is_bundle(job) and job.year else job.year
+        label = f"{job.pollutant} {years} ({job.chart})"
+        if error is not None:
+            print(f"  [{done}/{len(jobs)}] ✗ {label} : {error}")
+            errors.append((job, error))
+            return
+        hits += hit
+        print(f"  [{done}/{len(jobs)}] ✓ {label}" + (" (inchangé)" if hit else ""))
+        if cache is not None:
+            cache.set(job.path, key)
+
+    def arguments(job):
+        return (job, cache.get(job.path), True) if cache is not None else (job,)
+
+    if workers == 1:
+        if insee_to_commune is not None:
+            _init_worker(insee_to_commune)
+        for done, job in enumerate(jobs, 1):
+            report(done, job, render_job(*arguments(job)))
+    else:
+        initializer, initargs = (_init_worker, (insee_to_commune,)) if insee_to_commune is not None else (None, ())
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            futures = {executor.submit(render_job, *arguments(job)): job for job in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself failed (killed, unpicklable data...)
+                    result = (f"{type(e).__name__}: {e}", None, False)
+                report(done, job, result)
+
+    if cache is not None:
+        cache.save()
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs) - len(errors) - hits}/{len(jobs)} graphiques générés en {elapsed:.1f} s"
+          + (f", {len(errors)} en erreur" if errors else ""))
+    if cache is not None:
+        print(f"Cache des graphiques : {hits} hits (inchangés), {len(jobs) - hits} misses")
+    return errors
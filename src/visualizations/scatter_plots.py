@@ -1,7 +1,60 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 from plotly.io import write_html
+from src.utils.schema import COM_INSEE, POPULATION, SCATTER_MIN_POPULATION, pollutant_column
 
-def create_pollution_scatter(data, insee_to_commune, pollutant_type):
+# Above this number of points the markers are drawn with WebGL (Scattergl)
+# instead of one SVG element per point
+WEBGL_MIN_POINTS = 2000
+
+
+def commune_names(insee_to_commune, codes):
+    """
+    Vectorized lookup of the commune names of INSEE codes (unknown codes are
+    shown as is). Uses the names_for method of the commune index when the
+    mapping has one, a pandas map otherwise.
+    """
+    codes = pd.Series(codes, dtype=str)
+    if hasattr(insee_to_commune, 'names_for'):
+        return insee_to_commune.names_for(codes.to_numpy())
+    return codes.map(insee_to_commune).fillna(codes).to_numpy(dtype=object)
+
+
+def decimate(data, column, max_points):
+    """
+    Réduit le nombre de points en conservant les extrêmes : les points (triés
+    le long de l'axe x) sont répartis en max_points / 2 groupes consécutifs,
+    et seuls le minimum et le maximum de chaque groupe sont gardés. Les pics
+    et creux restent donc visibles. Les valeurs manquantes sont ignorées.
+
+    Args:
+        data (pd.DataFrame): Points dans l'ordre de l'axe x
+        column (str): Colonne des valeurs (axe y)
+        max_points (int): Nombre maximal de points conservés
+
+    Returns:
+        pd.DataFrame: Points conservés, dans l'ordre d'origine
+    """
+    data = data[data[column].notna()]
+    if max_points is None or len(data) <= max_points:
+        return data
+
+    buckets = max(max_points // 2, 1)
+    values = data[column].to_numpy(dtype='float64')
+    group = np.arange(len(values)) * buckets // len(values)
+
+    # Positions sorted by group, then by value: the first and last position of
+    # each group are its minimum and maximum
+    order = np.lexsort((values, group))
+    starts = np.flatnonzero(np.diff(group, prepend=-1))
+    ends = np.append(starts[1:], len(values)) - 1
+    keep = np.union1d(order[starts], order[ends])
+    return data.iloc[keep]
+
+
+def create_pollution_scatter(data, insee_to_commune, pollutant_type, min_population=SCATTER_MIN_POPULATION,
+                             webgl=None, max_points=None):
     """
     Crée un graphique de dispersion pour NO2, PM10 ou O3.
     
@@ -9,29 +62,34 @@ def create_pollution_scatter(data, insee_to_commune, pollutant_type):
         data (pd.DataFrame): Le DataFrame contenant les données
         insee_to_commune (dict): Dictionnaire de correspondance codes INSEE vers noms de communes
         pollutant_type (str): Type de polluant ("NO2", "PM10" ou "O3")
+        min_population (float): Population minimale des communes affichées
+            (0 = toutes les communes)
+        webgl (bool): Tracé WebGL (Scattergl) ; par défaut au-delà de
+            WEBGL_MIN_POINTS points
+        max_points (int): Nombre maximal de points affichés, au-delà les
+            points sont décimés en conservant les extrêmes (défaut : tous)
     
     Returns:
         plotly.graph_objects.Figure: La figure créée
     """
-    # Filter municipalities with more than 1,500 inhabitants and sort by population
-    data_filtered = data[data['Population'] > 1500]
-    data_sorted = data_filtered.sort_values('Population', ascending=True)
+    # Filter municipalities above the population threshold and sort by population
+    column_name = pollutant_column(pollutant_type)
+    data_filtered = data[data[POPULATION] > min_population]
+    data_sorted = data_filtered.sort_values(POPULATION, ascending=True, kind='stable')
+    if max_points is not None:
+        data_sorted = decimate(data_sorted, column_name, max_points)
     
     # Prepare data
-    communes = [insee_to_commune[code] for code in data_sorted['COM Insee']]
-    if pollutant_type == 'Somo 35':
-        column_name = 'Moyenne annuelle de somo 35 (ug/m3.jour)'
-    elif pollutant_type == 'AOT 40':
-        column_name = "Moyenne annuelle d'AOT 40 (ug/m3.heure)"
-    elif pollutant_type == 'PM25':
-        column_name = 'Moyenne annuelle de concentration de PM25 (ug/m3)'
-    else:
-        column_name = f'Moyenne annuelle de concentration de {pollutant_type} (ug/m3)'
+    communes = commune_names(insee_to_commune, data_sorted[COM_INSEE])
     concentrations = data_sorted[column_name]
-    populations = data_sorted['Population']
+    populations = data_sorted[POPULATION]
+
+    if webgl is None:
+        webgl = len(data_sorted) > WEBGL_MIN_POINTS
+    scatter = go.Scattergl if webgl else go.Scatter
     
     # Create the plot
-    trace = go.Scatter(
+    trace = scatter(
         x=communes,
         y=concentrations,
         mode='markers',
@@ -54,7 +112,8 @@ def create_pollution_scatter(data, insee_to_commune, pollutant_type):
             font=dict(size=24)
         ),
         xaxis=dict(
-            title='Population des communes > 1500 Hab.',
+            title=f'Population des communes > {min_population:g} Hab.' if min_population
+            else 'Population des communes',
             tickangle=-45,
             tickfont=dict(size=10),
             showgrid=True,
@@ -83,4 +142,4 @@ def create_pollution_scatter(data, insee_to_commune, pollutant_type):
     )
 
     fig = go.Figure(data=[trace], layout=layout)
-    return fig
\ No newline at end of file
+    return fig
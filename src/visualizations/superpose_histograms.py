@@ -1,8 +1,20 @@
+import argparse
+import json
 import os
+import sys
 
-def create_histograms_viewer():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.visualizations.bundles import BUNDLE_DIR, bundle_name
+
+def create_histograms_viewer(bundle=False):
     """
     Create an HTML viewer for superposed histograms of air pollutants.
+
+    Args:
+        bundle (bool): The single-year view loads one file per pollutant
+            (assets/bundles, see main.py --bundle) and switches years in
+            place instead of loading one page per year
     """
     output_dir = "output/FINAL_superposed_graphs_map"
     html_source_dir = "../output_csv"  # directory containing the histogram HTML files
@@ -125,18 +137,46 @@ def create_histograms_viewer():
         
         const years = ["""
     html_content += ', '.join([str(year) for year in years])
-    html_content += """];
+    html_content += "];\n        const bundleMode = " + ("true" if bundle else "false") + ";"
+    # Bundles: folder relative to the viewer and file of each pollutant
+    bundle_dir = os.path.relpath(BUNDLE_DIR, os.path.abspath(output_dir)).replace("\\", "/")
+    html_content += "\n        const bundlePath = " + json.dumps(bundle_dir) + ";"
+    html_content += "\n        const bundleFiles = " + json.dumps(
+        {pollutant: bundle_name('histogram', pollutant) for pollutant in pollutants}) + ";"
+    html_content += """
         
         let currentView = 'single';
+        let loadedBundle = null;  // bundle file shown (or being loaded) by the iframe
+        let bundleReady = false;  // the bundle fired its load event and listens to postMessage
+        let pendingYear = null;   // year chosen while the bundle was still loading
+        
+        function showBundleYear(bundleSrc, year) {
+            if (loadedBundle !== bundleSrc) {
+                loadedBundle = bundleSrc;
+                bundleReady = false;
+                pendingYear = null;
+                graphFrame.src = `${bundleSrc}#${year}`;
+            } else if (bundleReady) {
+                // Same pollutant: the year is switched inside the loaded bundle (Plotly.react)
+                graphFrame.contentWindow.postMessage({year: year}, '*');
+            } else {
+                pendingYear = year;
+            }
+        }
         
         function updateGraph() {
             const pollutant = pollutantSelect.value;
             const basePath = "../../output_csv";  // <-- chemin vers les HTML générés
+            if (currentView !== 'single') loadedBundle = null;
 
             if (currentView === 'single') {
                 const yearIndex = parseInt(yearSlider.value);
                 const year = years[yearIndex];
                 yearDisplay.textContent = year;
+                if (bundleMode) {
+                    showBundleYear(`${bundlePath}/${bundleFiles[pollutant]}`, year);
+                    return;
+                }
                 const filename = `${pollutant}_histogram_${year}.html`;
                 graphFrame.src = `${basePath}/${filename}`;
                 
@@ -179,6 +219,13 @@ def create_histograms_viewer():
         setView('single');
         
         graphFrame.addEventListener('load', function() {
+            if (loadedBundle) {
+                // Years chosen while the bundle was loading are sent once it listens
+                bundleReady = true;
+                if (pendingYear !== null) graphFrame.contentWindow.postMessage({year: pendingYear}, '*');
+                pendingYear = null;
+                return;
+            }
             if (graphFrame.contentDocument.body.innerHTML.includes('404') || 
                 graphFrame.contentDocument.body.innerHTML.includes('Not Found')) {
                 graphFrame.contentDocument.body.innerHTML = `
@@ -203,4 +250,8 @@ def create_histograms_viewer():
     print(f" Fichier {output_path} créé avec succès")
 
 if __name__ == "__main__":
-    create_histograms_viewer()
+    parser = argparse.ArgumentParser(description="Visionneuse des histogrammes")
+    parser.add_argument("--bundle", action="store_true",
+                        help="charge un fichier par polluant (main.py --bundle) et change d'année sans recharger la page")
+    args = parser.parse_args()
+    create_histograms_viewer(bundle=args.bundle)
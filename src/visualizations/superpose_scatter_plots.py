@@ -1,9 +1,21 @@
+import argparse
+import json
 import os
+import sys
 import webbrowser
 
-def create_scatter_viewer():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.visualizations.bundles import BUNDLE_DIR, bundle_name
+
+def create_scatter_viewer(bundle=False):
     """
     Create an HTML viewer for superposed scatter plots of air pollutants.
+
+    Args:
+        bundle (bool): Loads one file per pollutant (assets/bundles, see
+            main.py --bundle) and switches years in place instead of
+            loading one page per year
     """
     # Directory containing the SCATTER HTML files
     html_source_dir = os.path.abspath("output_csv").replace("\\", "/")
@@ -15,6 +27,10 @@ def create_scatter_viewer():
     pollutants = ["NO2", "PM10", "O3", "SOMO35", "PM25"]
     years = [y for y in range(2000, 2016) if y != 2006]
 
+    # Bundles: folder relative to the viewer and file of each pollutant
+    bundle_dir = os.path.relpath(BUNDLE_DIR, os.path.abspath(os.path.dirname(output_path))).replace("\\", "/")
+    bundle_files = {pollutant: bundle_name('scatter', pollutant) for pollutant in pollutants}
+
     # ----------------------------------------------
     # HTML VIEWER
     # ----------------------------------------------
@@ -85,15 +101,47 @@ def create_scatter_viewer():
         const yearDisplay = document.getElementById('year-display');
         const graphFrame = document.getElementById('graph-frame');
         const basePath = "{html_source_dir}";
+        const bundleMode = {"true" if bundle else "false"};
+        const bundlePath = {json.dumps(bundle_dir)};
+        const bundleFiles = {json.dumps(bundle_files)};
+        let loadedBundle = null;  // bundle file shown (or being loaded) by the iframe
+        let bundleReady = false;  // the bundle fired its load event and listens to postMessage
+        let pendingYear = null;   // year chosen while the bundle was still loading
+
+        function showBundleYear(bundleSrc, year) {{
+            if (loadedBundle !== bundleSrc) {{
+                loadedBundle = bundleSrc;
+                bundleReady = false;
+                pendingYear = null;
+                graphFrame.src = `${{bundleSrc}}#${{year}}`;
+            }} else if (bundleReady) {{
+                // Same pollutant: the year is switched inside the loaded bundle (Plotly.react)
+                graphFrame.contentWindow.postMessage({{year: year}}, '*');
+            }} else {{
+                pendingYear = year;
+            }}
+        }}
 
         function updateGraph() {{
             const pollutant = pollutantSelect.value;
             const year = years[parseInt(yearSlider.value)];
             yearDisplay.textContent = year;
+            if (bundleMode) {{
+                showBundleYear(`${{bundlePath}}/${{bundleFiles[pollutant]}}`, year);
+                return;
+            }}
             const filename = `${{pollutant}}_moyenne_annuelle_${{year}}.html`;
             graphFrame.src = `${{basePath}}/${{filename}}`;
         }}
 
+        graphFrame.addEventListener('load', () => {{
+            if (!loadedBundle) return;
+            // Years chosen while the bundle was loading are sent once it listens
+            bundleReady = true;
+            if (pendingYear !== null) graphFrame.contentWindow.postMessage({{year: pendingYear}}, '*');
+            pendingYear = null;
+        }});
+
         pollutantSelect.addEventListener('change', updateGraph);
         yearSlider.addEventListener('input', updateGraph);
 
@@ -112,4 +160,8 @@ def create_scatter_viewer():
 
 
 if __name__ == "__main__":
-    create_scatter_viewer()
+    parser = argparse.ArgumentParser(description="Visionneuse des nuages de points")
+    parser.add_argument("--bundle", action="store_true",
+                        help="charge un fichier par polluant (main.py --bundle) et change d'année sans recharger la page")
+    args = parser.parse_args()
+    create_scatter_viewer(bundle=args.bundle)
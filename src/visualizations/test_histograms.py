@@ -1,8 +1,13 @@
+import os
+import sys
 import pandas as pd
-from histograms import create_pollution_histogram
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.visualizations.histograms import create_pollution_histogram
+from src.utils.schema import apply_schema
 from plotly.io import show
 
-data = pd.read_csv("data/cleaned/cleaned_air_quality_with_year.csv")
+data = apply_schema(pd.read_csv("data/cleaned/cleaned_air_quality_with_year.csv"))
 
 # Create the histogram for a pollutant
 fig = create_pollution_histogram(data, "NO2")
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.utils.schema import RAW_COLUMNS  # noqa: E402
+
+# Columns of a raw INERIS file (14 columns; the 12-column years have no PM25)
+RAW_HEADER = [col for col in RAW_COLUMNS if col != 'Année']
+RAW_HEADER_NO_PM25 = [col for col in RAW_HEADER if 'PM25' not in col]
+
+
+def write_raw_file(path, frame):
+    """
+    Writes a DataFrame like an INERIS file: a title line, then the CSV in cp1252.
+    """
+    with open(path, "w", encoding="cp1252", newline="") as f:
+        f.write("Indicateurs qualité de l'air par commune\n")
+        frame.to_csv(f, index=False)
+    return str(path)
+
+
+def raw_frame(n_communes, seed=0, columns=RAW_HEADER, missing=0.1):
+    """
+    Synthetic raw data: n communes with zero-padded INSEE codes, random
+    concentrations and a share of missing values.
+    """
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'COM Insee': [f"{code:05d}" for code in range(1001, 1001 + n_communes)],
+        'Commune': [f"Commune {code}" for code in range(n_communes)],
+        'Population': rng.integers(50, 50_000, n_communes),
+    })
+    for col in columns[3:]:
+        values = rng.gamma(4.0, 5.0, n_communes).round(2)
+        values[rng.random(n_communes) < missing] = np.nan
+        frame[col] = values
+    return frame[columns]
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    """
+    Folder of synthetic raw files, with the raw cache redirected to tmp_path.
+    """
+    import src.utils.raw_cache as raw_cache
+
+    monkeypatch.setattr(raw_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    folder = tmp_path / "raw"
+    folder.mkdir()
+    return folder
@@ -0,0 +1,23 @@
+import os
+
+import plotly.graph_objects as go
+
+from src.visualizations.bundles import BUNDLE_DIR, bundle_name, bundle_path, write_bundle
+
+
+def test_pollutant_labels_share_one_bundle_name():
+    # Labels of main.py, visualize_from_db.py and of the two viewers
+    assert {bundle_name('histogram', label) for label in ['Somo 35', 'SOMO35', 'somo 35']} == {'somo35_histogram.html'}
+    assert bundle_name('scatter', 'AOT 40') == bundle_name('scatter', 'AOT40') == 'aot40_scatter.html'
+    assert bundle_name('scatter', 'NO2 ponderee') == 'no2_pop_scatter.html'
+    assert bundle_path('density', 'PM25') == os.path.join(BUNDLE_DIR, 'pm25_density.html')
+
+
+def test_write_bundle_keeps_every_year(tmp_path):
+    figures = {year: go.Figure(go.Bar(x=[1, 2], y=[year, 0])) for year in (2012, 2011)}
+
+    path = write_bundle(figures, bundle_path('histogram', 'NO2', str(tmp_path)), 'Histogrammes NO2')
+
+    content = open(path, encoding='utf-8').read()
+    assert os.path.basename(path) == 'no2_histogram.html'
+    assert '"years":[2011, 2012]' in content
@@ -0,0 +1,18 @@
+from conftest import RAW_HEADER_NO_PM25, raw_frame, write_raw_file
+
+from src.utils.clean_data import clean_in_memory, clean_streaming
+
+
+def test_streaming_matches_in_memory(raw_dir, tmp_path):
+    files = [
+        write_raw_file(raw_dir / "Indicateurs_QualiteAir_France_Commune_2001_Ineris_v.Sep2020.csv",
+                       raw_frame(120, seed=1, columns=RAW_HEADER_NO_PM25)),
+        write_raw_file(raw_dir / "Indicateurs_QualiteAir_France_Commune_2002_Ineris_v.Sep2020.csv",
+                       raw_frame(150, seed=2)),
+    ]
+    in_memory, streaming = tmp_path / "in_memory.csv", tmp_path / "streaming.csv"
+
+    assert clean_in_memory(files, str(in_memory)) == clean_streaming(files, str(streaming), chunk_size=40)
+    assert in_memory.read_bytes() == streaming.read_bytes()
+    # No Corsican code in the fixture: the codes keep their leading zero anyway
+    assert b"\n01001," in streaming.read_bytes()
@@ -0,0 +1,72 @@
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import raw_frame, write_raw_file
+from src.utils import commune_index
+from src.utils.commune_index import CommuneIndex, load_commune_index
+
+
+@pytest.fixture
+def sources(raw_dir, monkeypatch):
+    """Raw files of raw_dir, with no archive."""
+    monkeypatch.setattr(commune_index, "list_raw_sources",
+                        functools.partial(commune_index.list_raw_sources, folder=str(raw_dir),
+                                          archive_path=str(raw_dir / "missing.zip")))
+    return raw_dir
+
+
+def test_lookups_in_both_directions():
+    frame = pd.DataFrame({'COM Insee': ['1001', '01002', '2A004', None, '01002'],
+                          'Commune': ['Ambérieu', 'Lyon', 'Ajaccio', 'Sans code', 'Lyon 2e']})
+
+    index = CommuneIndex.from_frame(frame)
+    insee_to_commune, commune_to_insee = index.insee_to_commune(), index.commune_to_insee()
+
+    # Rows without a code are dropped, the last name of a code wins
+    assert index.codes.tolist() == ['01001', '01002', '2A004']
+    assert 'None' not in insee_to_commune
+    assert insee_to_commune['01002'] == 'Lyon 2e'
+    assert {name: commune_to_insee[name] for name in commune_to_insee} == {
+        'Ajaccio': '2A004', 'Ambérieu': '01001', 'Lyon 2e': '01002'}
+    assert len(commune_to_insee) == 3
+    assert index.has_names(['Lyon 2e', 'Lyon', 'Sans code', 'Ajaccio']).tolist() == [True, False, False, True]
+    assert index.names_for(['2A004', '99999']).tolist() == ['Ajaccio', '99999']
+
+
+def test_homonyms_are_counted_once():
+    frame = pd.DataFrame({'COM Insee': ['01001', '02001', '03001'], 'Commune': ['Sainte-Foy', 'Sainte-Foy', 'Vic']})
+
+    commune_to_insee = CommuneIndex.from_frame(frame).commune_to_insee()
+
+    assert len(commune_to_insee) == 2 == len(list(commune_to_insee))
+    assert commune_to_insee['Sainte-Foy'] == '01001'
+
+
+def test_index_is_saved_loaded_and_rebuilt_when_sources_change(sources, tmp_path):
+    folder = str(tmp_path / "index")
+    first = raw_frame(5)
+    write_raw_file(sources / "Indicateurs_QualiteAir_France_Commune_2000_Ineris_v.Sep2020.csv", first)
+
+    built = load_commune_index(folder)
+    loaded = load_commune_index(folder)
+
+    # Second call: memory-mapped arrays read back from disk, nothing parsed
+    assert isinstance(loaded.codes, np.memmap)
+    assert loaded.codes.tolist() == built.codes.tolist() == first['COM Insee'].tolist()
+    assert loaded.insee_to_commune()['01003'] == 'Commune 2'
+
+    # A new year with a renamed commune invalidates the stored index
+    second = raw_frame(6)
+    second.loc[2, 'Commune'] = 'Commune renommée'
+    path = write_raw_file(sources / "Indicateurs_QualiteAir_France_Commune_2001_Ineris_v.Sep2020.csv", second)
+    os.utime(path, ns=(1, 1))
+
+    rebuilt = load_commune_index(folder)
+    assert not isinstance(rebuilt.codes, np.memmap)
+    assert len(rebuilt) == 6
+    assert rebuilt.insee_to_commune()['01003'] == 'Commune renommée'
+    assert load_commune_index(folder).commune_to_insee()['Commune renommée'] == '01003'
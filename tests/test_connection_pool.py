@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from src.database.connection import ConnectionPool
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "scratch.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE measurement (annee INTEGER, no2 REAL)")
+    conn.executemany("INSERT INTO measurement VALUES (?, ?)", [(2000 + i % 3, float(i)) for i in range(30)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_failing_pandas_queries_release_their_slot(db_path):
+    pool = ConnectionPool(db_path, size=2, timeout=0.5)
+    for _ in range(3):
+        with pytest.raises(pd.errors.DatabaseError):
+            with pool.connection() as conn:
+                pd.read_sql_query("SELECT * FROM missing_table", conn)
+
+    with pool.connection() as conn:
+        assert len(pd.read_sql_query("SELECT * FROM measurement", conn)) == 30
+
+
+def test_other_exceptions_return_the_connection(db_path):
+    pool = ConnectionPool(db_path, size=1, timeout=0.5)
+    with pytest.raises(KeyError):
+        with pool.connection() as first:
+            raise KeyError("no2")
+
+    # Same connection, given back to the pool
+    with pool.connection() as conn:
+        assert conn is first
+        assert conn.execute("SELECT COUNT(*) FROM measurement").fetchone() == (30,)
+
+
+def test_failing_connection_is_closed(db_path):
+    pool = ConnectionPool(db_path, size=1, timeout=0.5)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as failed:
+            failed.execute("SELECT * FROM missing_table")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        failed.execute("SELECT 1")
+    with pool.connection() as conn:
+        assert conn is not failed
+
+
+def test_borrowers_wait_for_a_free_slot(db_path):
+    pool = ConnectionPool(db_path, size=1, timeout=0.2)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+
+    # A slot freed by a failed query wakes a waiting borrower
+    pool = ConnectionPool(db_path, size=1, timeout=5)
+    borrowed = threading.Event()
+    results = []
+
+    def waiter():
+        borrowed.wait()
+        with pool.connection() as conn:
+            results.append(conn.execute("SELECT COUNT(*) FROM measurement").fetchone()[0])
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(pd.errors.DatabaseError):
+        with pool.connection() as conn:
+            borrowed.set()
+            pd.read_sql_query("SELECT * FROM missing_table", conn)
+    thread.join(timeout=5)
+    assert results == [30]
+
+
+def test_read_only(db_path):
+    pool = ConnectionPool(db_path, size=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("DELETE FROM measurement")
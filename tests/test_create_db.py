@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+import src.database.create_db as create_db
+from src.utils.duplicates import CONFLICTING, EXACT
+from src.utils.schema import POLLUTANT_COLUMNS
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """
+    Database in the format preceding the commune / measurement split, with
+    an exact and a conflicting duplicate.
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE air_quality (id INTEGER PRIMARY KEY, com_insee TEXT, commune TEXT, "
+                 f"population REAL, annee INTEGER, {', '.join(f'{col} REAL' for col in POLLUTANT_COLUMNS)})")
+    rows = [(f"{code:05d}", f"Commune {code}", 100.0, 2012, float(code)) for code in range(1001, 1301)]
+    rows += [rows[0], ("01002", "Commune 1002", 100.0, 2012, -1.0)]
+    conn.executemany("INSERT INTO air_quality (com_insee, commune, population, annee, no2) VALUES (?, ?, ?, ?, ?)",
+                     rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_migration_records_duplicates_and_keeps_last_rows(legacy_db, monkeypatch):
+    # Several blocks for the duplicate scan
+    monkeypatch.setattr(create_db, "BULK_CHUNK_SIZE", 64)
+    conn = sqlite3.connect(legacy_db)
+
+    create_db.create_schema(conn)
+
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'air_quality'").fetchone() == ("view",)
+    assert conn.execute("SELECT COUNT(*) FROM measurement").fetchone() == (300,)
+    assert conn.execute("SELECT com_insee, occurrences, kind FROM duplicate_keys ORDER BY com_insee").fetchall() == [
+        ("01001", 2, EXACT), ("01002", 2, CONFLICTING)]
+    assert conn.execute("SELECT no2 FROM air_quality WHERE com_insee = '01002'").fetchone() == (-1.0,)
+    # VACUUM gave back the pages of the dropped table
+    assert conn.execute("PRAGMA freelist_count").fetchone() == (0,)
+    conn.close()
+
+
+def frame(codes, names, year, value=1.0):
+    import pandas as pd
+    from src.utils.schema import COLUMNS
+
+    df = pd.DataFrame({'com_insee': codes, 'commune': names, 'population': 100.0, 'annee': year})
+    for col in POLLUTANT_COLUMNS:
+        df[col] = value
+    return df[COLUMNS]
+
+
+def test_insert_frame_only_writes_new_or_renamed_communes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "load.db"))
+    create_db.create_schema(conn, indexes=False)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    commune_ids = create_db.CommuneIds()
+
+    codes = [f"{code:05d}" for code in range(1001, 1101)]
+    create_db.insert_frame(conn, frame(codes, [f"C{code}" for code in codes], 2011), commune_ids)
+    statements.clear()
+
+    # Same communes another year: no commune written, no id read back
+    create_db.insert_frame(conn, frame(codes, [f"C{code}" for code in codes], 2012), commune_ids)
+    assert not [sql for sql in statements if "commune (" in sql or "FROM commune" in sql]
+
+    # One renamed and one new commune
+    statements.clear()
+    create_db.insert_frame(conn, frame(["01001", "09999"], ["Renommée", "Nouvelle"], 2013), commune_ids)
+    assert len([sql for sql in statements if sql.startswith("INSERT INTO commune")]) == 2
+    conn.commit()
+
+    assert conn.execute("SELECT COUNT(*) FROM commune").fetchone() == (101,)
+    assert conn.execute("SELECT commune, annee FROM air_quality WHERE com_insee IN ('01001', '09999') "
+                        "ORDER BY com_insee, annee").fetchall() == [
+        ("Renommée", 2011), ("Renommée", 2012), ("Renommée", 2013), ("Nouvelle", 2013)]
+    assert commune_ids.ids == dict(conn.execute("SELECT com_insee, id FROM commune"))
+    conn.close()
@@ -0,0 +1,78 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.database.create_db as create_db
+from src.database.data_access import fetch_bbox
+from src.utils.schema import COLUMNS, POLLUTANT_COLUMNS
+
+# Communes on a line of latitudes: 45.0, 45.5, ..., 49.5
+CODES = [f"{code:05d}" for code in range(1001, 1011)]
+LATITUDES = 45.0 + 0.5 * np.arange(10)
+
+
+def write_postal(path, latitudes):
+    pd.DataFrame({'code_commune_insee': CODES,
+                  'nom_de_la_commune': [f"COMMUNE {i}" for i in range(10)],
+                  'latitude': latitudes,
+                  'longitude': 2.0}).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "bbox.db"))
+    create_db.create_schema(conn)
+    df = pd.DataFrame({'com_insee': CODES, 'commune': [f"Commune {i}" for i in range(10)],
+                       'population': 1000.0, 'annee': 2015})
+    for col in POLLUTANT_COLUMNS:
+        df[col] = np.nan
+    df['no2'] = np.arange(10, dtype=float)
+    with conn:
+        create_db.insert_frame(conn, df[COLUMNS])
+    assert create_db.load_coordinates(conn, write_postal(tmp_path / "postal.csv", LATITUDES)) == 10
+    yield conn
+    conn.close()
+
+
+def has_rtree(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'commune_rtree'").fetchone() is not None
+
+
+def test_bbox_returns_the_communes_in_the_box(conn):
+    df = fetch_bbox(conn, 2015, 'no2', 46.0, 1.0, 47.0, 3.0)
+
+    assert sorted(df['com_insee']) == CODES[2:5]
+    assert sorted(df['no2']) == [2.0, 3.0, 4.0]
+    assert fetch_bbox(conn, 2015, 'no2', 46.0, 2.5, 47.0, 3.0).empty
+    assert fetch_bbox(conn, 2016, 'no2', 46.0, 1.0, 47.0, 3.0).empty
+    with pytest.raises(KeyError):
+        fetch_bbox(conn, 2015, 'population', 46.0, 1.0, 47.0, 3.0)
+
+
+def test_moved_communes_refresh_the_spatial_index(conn, tmp_path):
+    if not has_rtree(conn):
+        pytest.skip("SQLite compilé sans le module R-tree")
+    # Commune 0 moves into the box, commune 3 leaves it
+    latitudes = LATITUDES.copy()
+    latitudes[0], latitudes[3] = 46.25, 40.0
+    create_db.load_coordinates(conn, write_postal(tmp_path / "moved.csv", latitudes))
+
+    df = fetch_bbox(conn, 2015, 'no2', 46.0, 1.0, 47.0, 3.0)
+
+    assert sorted(df['com_insee']) == [CODES[0], CODES[2], CODES[4]]
+    assert conn.execute("SELECT min_lat FROM commune_rtree r JOIN commune c ON c.id = r.id "
+                        "WHERE c.com_insee = ?", (CODES[3],)).fetchone()[0] == pytest.approx(40.0)
+
+
+def test_bbox_scans_the_communes_without_the_rtree(conn):
+    expected = fetch_bbox(conn, 2015, 'no2', 46.0, 1.0, 47.0, 3.0).sort_values('com_insee', ignore_index=True)
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS commune_rtree")
+
+    df = fetch_bbox(conn, 2015, 'no2', 46.0, 1.0, 47.0, 3.0).sort_values('com_insee', ignore_index=True)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df['com_insee'].tolist() == CODES[2:5]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.duplicates import CONFLICTING, EXACT, DuplicateTracker, analyze_duplicates, summarize
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['com_insee', 'annee', 'no2'])
+
+
+def test_exact_and_conflicting_duplicates():
+    df = frame([
+        ('01001', 2012, 10.0),
+        ('01002', 2012, 11.0),
+        ('01001', 2012, 10.0),   # exact copy
+        ('01002', 2012, 12.0),   # other value
+        ('01002', 2013, 11.0),   # other year: not a duplicate
+        ('01002', 2012, 11.0),
+    ])
+
+    report = analyze_duplicates(df)
+
+    assert report.to_dict('records') == [
+        {'com_insee': '01001', 'annee': 2012, 'occurrences': 2, 'distinct_values': 1, 'kind': EXACT},
+        {'com_insee': '01002', 'annee': 2012, 'occurrences': 3, 'distinct_values': 2, 'kind': CONFLICTING},
+    ]
+    assert summarize(report) == {"keys": 2, "extra_rows": 3, "exact": 1, "conflicting": 1}
+
+
+def test_missing_values_are_compared_as_values():
+    df = frame([('01001', 2012, None), ('01001', 2012, None), ('01002', 2012, None), ('01002', 2012, 1.0)])
+
+    report = analyze_duplicates(df)
+
+    assert report['kind'].tolist() == [EXACT, CONFLICTING]
+
+
+def test_blocks_give_the_same_report_as_one_frame():
+    rows = [(f"{code:05d}", 2000 + code % 3, float(code % 7)) for code in range(1000, 1300)]
+    rows += [rows[5], rows[250], ('01010', 2000 + 1010 % 3, 99.0), rows[5]]
+    df = frame(rows)
+
+    tracker = DuplicateTracker()
+    for start in range(0, len(df), 37):
+        tracker.update(df.iloc[start:start + 37])
+
+    pd.testing.assert_frame_equal(tracker.report(), analyze_duplicates(df))
+    assert tracker.rows == len(df)
+    assert tracker.report()['occurrences'].tolist() == [3, 2, 2]
+
+
+def test_no_duplicates():
+    df = frame([(f"{code:05d}", 2012, 1.0) for code in range(100)])
+
+    tracker = DuplicateTracker()
+    tracker.update(df.iloc[:50])
+    tracker.update(df.iloc[50:])
+
+    assert tracker.report().empty
+    assert summarize(tracker.report())["keys"] == 0
+
+
+def test_many_blocks_match_a_reference_classification():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 3000, 20_000)
+    df = frame({'com_insee': [f"{code:05d}" for code in codes], 'annee': 2000 + codes % 2,
+                'no2': rng.integers(0, 3, len(codes)).astype(float)})
+
+    tracker = DuplicateTracker()
+    for start in range(0, len(df), 97):
+        tracker.update(df.iloc[start:start + 97])
+
+    # Reference: plain pandas grouping of the whole frame
+    groups = df.groupby(['com_insee', 'annee']).agg(occurrences=('no2', 'size'), distinct_values=('no2', 'nunique'))
+    groups = groups[groups['occurrences'] > 1].reset_index()
+    report = tracker.report()
+    expected = groups.sort_values(['annee', 'com_insee'], ignore_index=True)
+    assert report['com_insee'].tolist() == expected['com_insee'].tolist()
+    assert report['occurrences'].tolist() == expected['occurrences'].tolist()
+    assert report['distinct_values'].tolist() == expected['distinct_values'].tolist()
+    assert (report['kind'] == CONFLICTING).tolist() == (expected['distinct_values'] > 1).tolist()
+    # Seen keys stay sorted and unique after the insertions, one per distinct key
+    assert (tracker._seen_keys[1:] > tracker._seen_keys[:-1]).all()
+    assert len(tracker._seen_keys) == df.groupby(['com_insee', 'annee']).ngroups
@@ -0,0 +1,191 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from src.utils.get_data import download_file, get_data
+
+PAYLOAD = bytes(range(256)) * 2048  # 512 KiB
+
+
+class FileServer(http.server.ThreadingHTTPServer):
+    """
+    Serves `payload` with Range / If-Range support. The first `drops`
+    answers are cut after `drop_after` bytes; `bad_range_start` makes the
+    next 206 answer start at the wrong offset. /api/records/1 answers like
+    the Zenodo record API with the checksum `published`.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.payload = PAYLOAD
+        self.etag = '"v1"'
+        self.drops = 0
+        self.drop_after = 100_000
+        self.bad_range_start = False
+        self.published = "md5:" + hashlib.md5(PAYLOAD).hexdigest()
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/archive.zip"
+
+    @property
+    def zenodo_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/records/1/files/archive.zip?download=1"
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        if self.path == "/api/records/1":
+            body = json.dumps({"files": [{"key": "archive.zip", "checksum": server.published}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        server.requests.append({"range": self.headers.get("Range"), "if_range": self.headers.get("If-Range")})
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == server.etag):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(payload)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            sent_start = start
+            if server.bad_range_start:
+                server.bad_range_start = False
+                sent_start = 0
+            body = payload[sent_start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {sent_start}-{len(payload) - 1}/{len(payload)}")
+        else:
+            body = payload
+            self.send_response(200)
+
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+        if server.drops:
+            # Injected disconnect: part of the body, then the connection is closed
+            server.drops -= 1
+            self.wfile.write(body[:server.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download(server, dest, **options):
+    return download_file(server.url, str(dest), chunk_size=16_384, retry_delay=0, timeout=5, **options)
+
+
+def test_resumes_after_disconnects(server, tmp_path):
+    server.drops = 3
+    dest = tmp_path / "archive.zip"
+
+    download(server, dest)
+
+    assert dest.read_bytes() == PAYLOAD
+    # Each retry resumes after the bytes already written (whole blocks of the cut answers)
+    offsets = [int(r["range"][6:-1]) for r in server.requests[1:]]
+    assert server.requests[0]["range"] is None and len(offsets) == 3
+    assert 0 < offsets[0] < offsets[1] < offsets[2] < len(PAYLOAD)
+    assert all(r["if_range"] == '"v1"' for r in server.requests[1:])
+    assert not os.path.exists(str(dest) + ".part") and not os.path.exists(str(dest) + ".part.json")
+
+
+def test_gives_up_and_keeps_partial_file(server, tmp_path):
+    server.drops = 10
+    dest = tmp_path / "archive.zip"
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        download(server, dest, max_retries=2)
+    partial_size = (tmp_path / "archive.zip.part").stat().st_size
+    assert 0 < partial_size < len(PAYLOAD)
+
+    # Next run: resumed where the previous one stopped
+    server.drops = 0
+    download(server, dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests[-1]["range"] == f"bytes={partial_size}-"
+
+
+def test_partial_file_of_a_changed_archive_is_not_resumed(server, tmp_path):
+    dest = tmp_path / "archive.zip"
+    (tmp_path / "archive.zip.part").write_bytes(b"old archive" * 1000)
+    (tmp_path / "archive.zip.part.json").write_text(json.dumps({"etag": '"v0"', "total": 20_000}))
+
+    download(server, dest)
+
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests[0]["if_range"] == '"v0"'
+
+
+def test_partial_file_larger_than_the_archive_is_discarded(server, tmp_path):
+    dest = tmp_path / "archive.zip"
+    # Partial file left by a version without the .part.json sidecar
+    (tmp_path / "archive.zip.part").write_bytes(b"x" * (len(PAYLOAD) + 10))
+
+    download(server, dest)
+
+    assert dest.read_bytes() == PAYLOAD
+    assert [r["range"] for r in server.requests] == [f"bytes={len(PAYLOAD) + 10}-", None]
+
+
+def test_range_answer_starting_elsewhere_is_rejected(server, tmp_path):
+    server.drops = 1
+    server.bad_range_start = True
+    dest = tmp_path / "archive.zip"
+
+    download(server, dest)
+
+    # The misplaced 206 answer is not appended: the download starts over
+    assert dest.read_bytes() == PAYLOAD
+    assert [r["range"] is None for r in server.requests] == [True, False, True]
+
+
+def test_wrong_checksum_discards_the_file(server, tmp_path):
+    dest = tmp_path / "archive.zip"
+
+    with pytest.raises(ValueError):
+        download(server, dest, checksum="md5:" + "0" * 32)
+    assert os.listdir(tmp_path) == []
+
+
+def test_archive_is_checked_against_the_published_checksum(server, tmp_path):
+    get_data(url=server.zenodo_url, raw_folder=str(tmp_path), checksum=None, extract=False,
+             retry_delay=0, timeout=5)
+    assert [path.read_bytes() == PAYLOAD for path in tmp_path.iterdir()] == [True]
+
+    server.published = "md5:" + "0" * 32
+    with pytest.raises(ValueError):
+        get_data(url=server.zenodo_url, raw_folder=str(tmp_path / "second"), checksum=None, extract=False,
+                 retry_delay=0, timeout=5)
+    assert os.listdir(tmp_path / "second") == []
@@ -0,0 +1,97 @@
+import functools
+import os
+
+import pytest
+from conftest import raw_frame, write_raw_file
+
+import src.utils.clean_data as clean_data
+import src.utils.manifest as manifest
+
+
+def raw_name(year):
+    return f"Indicateurs_QualiteAir_France_Commune_{year}_Ineris_v.Sep2020.csv"
+
+
+@pytest.fixture
+def incremental(raw_dir, tmp_path, monkeypatch):
+    """
+    clean_incremental with its manifest and partitions in tmp_path; returns
+    a function running it and the raw files it parsed.
+    """
+    partitions = tmp_path / "by_year"
+    manifest_path = str(tmp_path / "manifest.json")
+    monkeypatch.setattr(clean_data, "PARTITIONS_DIR", str(partitions))
+    monkeypatch.setattr(clean_data, "partition_path",
+                        functools.partial(manifest.partition_path, folder=str(partitions)))
+    monkeypatch.setattr(clean_data, "load_manifest", functools.partial(manifest.load_manifest, path=manifest_path))
+    monkeypatch.setattr(clean_data, "save_manifest", functools.partial(manifest.save_manifest, path=manifest_path))
+
+    parsed = set()
+    iter_chunks = clean_data._iter_chunks
+
+    def tracking_iter_chunks(filepath, *args, **kwargs):
+        parsed.add(os.path.basename(filepath))
+        return iter_chunks(filepath, *args, **kwargs)
+
+    monkeypatch.setattr(clean_data, "_iter_chunks", tracking_iter_chunks)
+    output = str(tmp_path / "cleaned.csv")
+
+    def run():
+        parsed.clear()
+        files = clean_data.list_raw_files(str(raw_dir))
+        return clean_data.clean_incremental(files, output, chunk_size=50), set(parsed)
+
+    return run, partitions, output
+
+
+def test_only_changed_file_is_reprocessed(raw_dir, incremental):
+    run, partitions, output = incremental
+    for year in (2001, 2002, 2003):
+        write_raw_file(raw_dir / raw_name(year), raw_frame(80, seed=year))
+
+    shape, parsed = run()
+    assert shape == (240, 15)
+    assert parsed == {raw_name(2001), raw_name(2002), raw_name(2003)}
+    before = {path.name: (path.stat().st_mtime_ns, path.read_bytes()) for path in partitions.iterdir()}
+
+    # New values for 2002 only: its median moves, the other partitions must not
+    write_raw_file(raw_dir / raw_name(2002), raw_frame(90, seed=99))
+    shape, parsed = run()
+    assert shape == (250, 15)
+    assert parsed == {raw_name(2002)}
+    after = {path.name: (path.stat().st_mtime_ns, path.read_bytes()) for path in partitions.iterdir()}
+    for year in (2001, 2003):
+        name = f"cleaned_air_quality_{year}.csv"
+        assert after[name] == before[name]
+    assert after["cleaned_air_quality_2002.csv"][1] != before["cleaned_air_quality_2002.csv"][1]
+
+    # Combined CSV: the partitions one after the other, with a single header
+    parts = [(partitions / f"cleaned_air_quality_{year}.csv").read_bytes().split(b"\n", 1)
+             for year in (2001, 2002, 2003)]
+    with open(output, "rb") as f:
+        assert f.read() == parts[0][0] + b"\n" + b"".join(body for _, body in parts)
+
+    # Nothing changed: no raw file is parsed
+    _, parsed = run()
+    assert parsed == set()
+
+
+def test_combined_file_rewritten_by_a_full_clean_is_rebuilt(raw_dir, incremental):
+    run, partitions, output = incremental
+    for year in (2001, 2002):
+        write_raw_file(raw_dir / raw_name(year), raw_frame(80, seed=year))
+    run()
+    with open(output, "rb") as f:
+        incremental_bytes = f.read()
+
+    # Full clean into the same file: medians over all years
+    clean_data.clean_streaming(clean_data.list_raw_files(str(raw_dir)), output, chunk_size=50)
+    with open(output, "rb") as f:
+        assert f.read() != incremental_bytes
+
+    # No raw file changed, but the combined CSV no longer matches the partitions
+    shape, parsed = run()
+    assert shape == (160, 15)
+    assert parsed == set()
+    with open(output, "rb") as f:
+        assert f.read() == incremental_bytes
@@ -0,0 +1,117 @@
+import json
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+import src.utils.raw_cache as raw_cache
+from src.utils.common_functions import read_data
+from src.utils.sources import archive_source
+
+from conftest import raw_frame, write_raw_file
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def raw_file(raw_dir):
+    path = write_raw_file(raw_dir / "Indicateurs_2012.csv", raw_frame(30, seed=1))
+    assert raw_cache.write_cached(path, read_data.load_data(path, use_cache=False))
+    return path
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """
+    Counts the content hashes computed by the cache.
+    """
+    calls = []
+
+    def content_hash(source):
+        calls.append(source)
+        return original(source)
+
+    original = raw_cache.content_hash
+    monkeypatch.setattr(raw_cache, "content_hash", content_hash)
+    return calls
+
+
+def touch(path, delta_ns):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + delta_ns))
+
+
+def rewrite(path, old, new):
+    with open(path, "rb") as f:
+        content = f.read()
+    assert content.count(old) == 1 and len(old) == len(new)
+    with open(path, "wb") as f:
+        f.write(content.replace(old, new))
+
+
+def test_unchanged_file_is_read_from_the_cache(raw_file, hashes):
+    cached = raw_cache.read_cached(raw_file)
+
+    pd.testing.assert_frame_equal(cached, read_data.load_data(raw_file, use_cache=False))
+    # Same size and mtime: the content is not hashed again
+    assert hashes == []
+
+
+def test_touched_file_keeps_its_cache(raw_file, hashes):
+    touch(raw_file, 10**9)
+
+    assert raw_cache.read_cached(raw_file) is not None
+    assert hashes == [raw_file]
+
+    # The new mtime is recorded, the next read skips the hash
+    meta = json.load(open(raw_cache.cache_paths(raw_file)[1], encoding="utf-8"))
+    assert meta["mtime_ns"] == os.stat(raw_file).st_mtime_ns
+    assert raw_cache.read_cached(raw_file) is not None
+    assert hashes == [raw_file]
+
+
+def test_same_size_edit_invalidates_the_cache(raw_file):
+    rewrite(raw_file, b"Commune 7,", b"Commune X,")
+    touch(raw_file, 10**9)
+
+    assert raw_cache.read_cached(raw_file) is None
+    data = read_data.load_data(raw_file)
+    assert "Commune X" in data['Commune'].tolist()
+    pd.testing.assert_frame_equal(raw_cache.read_cached(raw_file), data)
+
+
+def test_size_change_invalidates_the_cache(raw_file, hashes):
+    write_raw_file(raw_file, raw_frame(31, seed=1))
+
+    assert raw_cache.read_cached(raw_file) is None
+    # A different size is enough, no hash is needed
+    assert hashes == []
+
+
+def test_cache_version_invalidates_the_cache(raw_file, monkeypatch):
+    monkeypatch.setattr(raw_cache, "CACHE_VERSION", raw_cache.CACHE_VERSION + 1)
+
+    assert raw_cache.read_cached(raw_file) is None
+
+
+def test_archive_member_cache_follows_the_member(raw_dir, tmp_path):
+    csv_path = write_raw_file(tmp_path / "Indicateurs_2013.csv", raw_frame(20, seed=2))
+    archive_path = str(raw_dir / "archive.zip")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(csv_path, "Indicateurs_2013.csv")
+    member = archive_source(archive_path, "Indicateurs_2013.csv")
+
+    data = read_data.load_data(member)
+    # The member and an extracted copy have their own cache entries
+    assert raw_cache.cache_paths(member) != raw_cache.cache_paths(csv_path)
+    pd.testing.assert_frame_equal(raw_cache.read_cached(member), data)
+
+    # Same member size, new content: the stored CRC-32 no longer matches
+    rewrite(csv_path, b"Commune 3,", b"Commune Z,")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(csv_path, "Indicateurs_2013.csv")
+    touch(archive_path, 10**9)
+
+    assert raw_cache.read_cached(member) is None
+    assert "Commune Z" in read_data.load_data(member)['Commune'].tolist()
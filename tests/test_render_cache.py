@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.visualizations import render_cache, render_pool
+from src.visualizations.render_cache import RenderCache
+from src.visualizations.render_pool import RenderJob, render_jobs
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """Figures built by render_jobs, as (chart, pollutant)."""
+    figures = []
+    build_figure = render_pool._build_figure
+
+    def counting(chart, pollutant, data, options):
+        figures.append((chart, pollutant))
+        return build_figure(chart, pollutant, data, options)
+
+    monkeypatch.setattr(render_pool, '_build_figure', counting)
+    return figures
+
+
+def histogram_jobs(tmp_path, values, edges=None):
+    return [RenderJob('histogram', 'NO2', year, str(tmp_path / f'NO2_histogram_{year}.html'),
+                      data=pd.DataFrame({'no2': np.asarray(year_values, dtype='float32')}),
+                      options=dict(edges=edges))
+            for year, year_values in values.items()]
+
+
+def render(jobs, tmp_path):
+    cache = RenderCache.load(str(tmp_path / 'render.json'))
+    assert render_jobs(jobs, max_workers=1, cache=cache) == []
+    return cache
+
+
+def test_unchanged_figures_are_not_rebuilt(tmp_path, built):
+    values = {2011: [10, 20, 30], 2012: [15, 25]}
+    first = render(histogram_jobs(tmp_path, values), tmp_path)
+    assert len(built) == 2
+
+    second = render(histogram_jobs(tmp_path, values), tmp_path)
+
+    assert len(built) == 2
+    assert second.keys == first.keys
+
+
+def test_changed_data_options_or_code_rebuild_only_their_figures(tmp_path, built, monkeypatch):
+    values = {2011: [10, 20, 30], 2012: [15, 25]}
+    render(histogram_jobs(tmp_path, values), tmp_path)
+    built.clear()
+
+    # Data of one year
+    render(histogram_jobs(tmp_path, {2011: [10, 20, 30], 2012: [15, 26]}), tmp_path)
+    assert len(built) == 1
+
+    # Options of every figure
+    built.clear()
+    render(histogram_jobs(tmp_path, {2011: [10, 20, 30], 2012: [15, 26]}, edges=np.arange(0, 50, 5.0)), tmp_path)
+    assert len(built) == 2
+
+    # A deleted file is written again
+    built.clear()
+    (tmp_path / 'NO2_histogram_2011.html').unlink()
+    render(histogram_jobs(tmp_path, {2011: [10, 20, 30], 2012: [15, 26]}, edges=np.arange(0, 50, 5.0)), tmp_path)
+    assert len(built) == 1
+
+    # Rendering code
+    built.clear()
+    monkeypatch.setattr(render_cache, '_code_version', 'edited')
+    render(histogram_jobs(tmp_path, {2011: [10, 20, 30], 2012: [15, 26]}, edges=np.arange(0, 50, 5.0)), tmp_path)
+    assert len(built) == 2
+
+
+def test_code_version_covers_helper_modules():
+    modules = render_cache.RENDERER_MODULES
+    for name in ['src/visualizations/render_pool.py', 'src/database/data_access.py',
+                 'src/utils/commune_index.py', 'src/utils/schema.py']:
+        assert name in modules
+
+
+def test_names_signature_follows_the_content(tmp_path):
+    import pandas as pd
+    from src.utils.commune_index import CommuneIndex
+
+    names = {'01001': 'Ambérieu', '01002': 'Lyon'}
+    before = render_cache.names_signature(names)
+    names['01002'] = 'Lyon 2e'
+    assert render_cache.names_signature(names) != before
+    assert render_cache.names_signature(dict(names)) == render_cache.names_signature(names)
+
+    frame = pd.DataFrame({'COM Insee': list(names), 'Commune': list(names.values())})
+    index = CommuneIndex.from_frame(frame)
+    index.save(str(tmp_path))
+    loaded, meta = CommuneIndex.load(str(tmp_path))
+    assert meta["digest"] == index.digest
+    assert render_cache.names_signature(loaded.insee_to_commune()) == index.digest
+
+    frame.loc[1, 'Commune'] = 'Lyon 3e'
+    assert render_cache.names_signature(CommuneIndex.from_frame(frame).insee_to_commune()) != index.digest
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.visualizations.scatter_plots import decimate
+
+
+def test_decimate_keeps_extremes_in_order():
+    values = np.sin(np.linspace(0, 20, 1000))
+    values[500], values[700] = 50.0, -50.0
+    values[10] = np.nan
+    data = pd.DataFrame({'population': np.arange(1000), 'no2': values})
+
+    kept = decimate(data, 'no2', 20)
+
+    assert len(kept) <= 20
+    assert {500, 700} <= set(kept.index)
+    assert kept['no2'].max() == 50.0 and kept['no2'].min() == -50.0
+    assert kept.index.is_monotonic_increasing
+    assert kept['no2'].notna().all()
+
+
+def test_decimate_keeps_small_inputs():
+    data = pd.DataFrame({'no2': [1.0, np.nan, 3.0]})
+
+    assert decimate(data, 'no2', 10)['no2'].tolist() == [1.0, 3.0]
+    assert len(decimate(data, 'no2', None)) == 2
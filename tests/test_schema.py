@@ -0,0 +1,15 @@
+import pandas as pd
+
+from src.utils.schema import COM_INSEE, apply_schema, concat_frames
+
+
+def test_concat_frames_keeps_categories_without_mutating_inputs():
+    first = apply_schema(pd.DataFrame({'COM Insee': ['01001'], 'Population': [10]}))
+    second = apply_schema(pd.DataFrame({'COM Insee': ['2A004'], 'Population': [20]}))
+
+    combined = concat_frames([first, second])
+
+    assert isinstance(combined[COM_INSEE].dtype, pd.CategoricalDtype)
+    assert combined[COM_INSEE].tolist() == ['01001', '2A004']
+    assert first[COM_INSEE].cat.categories.tolist() == ['01001']
+    assert second[COM_INSEE].cat.categories.tolist() == ['2A004']
@@ -0,0 +1,78 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+from src.utils.common_functions import read_data
+from src.utils.sources import (archive_source, content_hash, file_sha256, find_member, list_raw_sources,
+                               open_source, resolve_raw_file, source_exists, source_name, source_stat,
+                               split_source)
+
+from conftest import raw_frame, write_raw_file
+
+NAMES = ["Indicateurs_2011.csv", "Indicateurs_2012.csv", "Indicateurs_2013.csv"]
+
+
+@pytest.fixture
+def archive(raw_dir, tmp_path):
+    """
+    Archive of three yearly files stored in a sub-folder, as in the Zenodo archive.
+    """
+    archive_path = str(tmp_path / "archive.zip")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for seed, name in enumerate(NAMES):
+            csv_path = write_raw_file(tmp_path / name, raw_frame(10, seed=seed))
+            zf.write(csv_path, f"Indicateurs/{name}")
+        zf.writestr("Indicateurs/LISEZMOI.txt", "pas un CSV")
+    return archive_path
+
+
+def test_member_reads_like_the_extracted_file(archive, tmp_path):
+    member = find_member(archive, NAMES[1])
+
+    assert member == archive_source(archive, f"Indicateurs/{NAMES[1]}")
+    assert split_source(member) == (archive, f"Indicateurs/{NAMES[1]}")
+    assert source_name(member) == NAMES[1]
+    with open_source(member) as f:
+        assert f.read() == (tmp_path / NAMES[1]).read_bytes()
+    pd.testing.assert_frame_equal(read_data.load_data(member, use_cache=False),
+                                  read_data.load_data(str(tmp_path / NAMES[1]), use_cache=False))
+
+
+def test_member_stat_and_hash(archive, tmp_path):
+    member = find_member(archive, NAMES[0])
+    extracted = str(tmp_path / NAMES[0])
+
+    size, mtime_ns = source_stat(member)
+    assert size == (tmp_path / NAMES[0]).stat().st_size
+    assert mtime_ns == source_stat(archive)[1]
+    with zipfile.ZipFile(archive) as zf:
+        crc = zf.getinfo(f"Indicateurs/{NAMES[0]}").CRC
+    assert content_hash(member) == f"crc32:{crc:08x}"
+    assert content_hash(member) != content_hash(find_member(archive, NAMES[1]))
+    assert content_hash(extracted) == file_sha256(extracted)
+
+
+def test_missing_members(archive, tmp_path):
+    assert find_member(archive, "Indicateurs_2020.csv") is None
+    assert find_member(str(tmp_path / "absent.zip"), NAMES[0]) is None
+    assert source_exists(find_member(archive, NAMES[0]))
+    assert not source_exists(archive_source(archive, "Indicateurs/Indicateurs_2020.csv"))
+    assert not source_exists(archive_source(str(tmp_path / "absent.zip"), NAMES[0]))
+    with pytest.raises(KeyError):
+        open_source(archive_source(archive, "Indicateurs/Indicateurs_2020.csv"))
+
+
+def test_extracted_files_win_over_members(archive, raw_dir):
+    extracted = write_raw_file(raw_dir / NAMES[1], raw_frame(5))
+
+    sources = list_raw_sources(folder=str(raw_dir), archive_path=archive)
+
+    # Sorted by file name (year), the README is not listed
+    assert [source_name(source) for source in sources] == NAMES
+    assert sources == [find_member(archive, NAMES[0]), extracted, find_member(archive, NAMES[2])]
+    assert resolve_raw_file(NAMES[1], folder=str(raw_dir), archive_path=archive) == extracted
+    assert resolve_raw_file(NAMES[2], folder=str(raw_dir), archive_path=archive) == find_member(archive, NAMES[2])
+    # Neither extracted nor archived: the extracted path, which does not exist
+    assert resolve_raw_file("Indicateurs_2020.csv", folder=str(raw_dir), archive_path=archive) == \
+        str(raw_dir / "Indicateurs_2020.csv")
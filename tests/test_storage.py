@@ -0,0 +1,15 @@
+import pytest
+
+from src.database.storage import Storage
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class PartialStorage(Storage):
+        name = "partial"
+
+        def query(self, columns=None, year=None, com_insee=None, min_population=None, not_null=None,
+                  order_by=None):
+            return None
+
+    with pytest.raises(TypeError, match="available_series"):
+        PartialStorage()
@@ -0,0 +1,108 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.database.create_db as create_db
+from src.database.summary import HISTOGRAM_BINS, load_histogram, load_summary, refresh_summaries
+from src.utils.schema import COLUMNS, POLLUTANT_COLUMNS
+
+
+def frame(year, no2, population=None):
+    n = len(no2)
+    df = pd.DataFrame({'com_insee': [f"{code:05d}" for code in range(1001, 1001 + n)],
+                       'commune': [f"Commune {code}" for code in range(n)],
+                       'population': population if population is not None else np.arange(1, n + 1) * 100.0,
+                       'annee': year})
+    for col in POLLUTANT_COLUMNS:
+        df[col] = np.nan
+    df['no2'] = no2
+    df['no2_pop'] = np.asarray(no2, dtype=float) * 2
+    return df[COLUMNS]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "summary.db"))
+    create_db.create_schema(conn)
+    rng = np.random.default_rng(0)
+    with conn:
+        for year in (2011, 2012, 2013):
+            # Every year reaches the bounds: rewriting one of them keeps the global range
+            no2 = rng.uniform(10, 40, 200).round(2)
+            no2[:2] = 10.0, 40.0
+            create_db.insert_frame(conn, frame(year, no2))
+    yield conn
+    conn.close()
+
+
+def measurements(conn, year):
+    return pd.read_sql_query("SELECT population, no2, no2_pop FROM air_quality WHERE annee = ?", conn,
+                             params=(year,))
+
+
+def digests(conn):
+    return dict(conn.execute("SELECT annee, sha256 FROM year_digest"))
+
+
+def test_full_refresh_matches_the_measurements(conn):
+    assert refresh_summaries(conn) == [2011, 2012, 2013]
+
+    summary = load_summary(conn, 'no2').set_index('annee')
+    lower, upper = conn.execute("SELECT lower, upper FROM histogram_edges WHERE pollutant = 'no2'").fetchone()
+    values = pd.concat([measurements(conn, year) for year in (2011, 2012, 2013)])
+    assert (lower, upper) == (values['no2'].min(), values['no2'].max())
+    for year in (2011, 2012, 2013):
+        df = measurements(conn, year)
+        row = summary.loc[year]
+        assert row['n'] == 200
+        assert row['mean'] == pytest.approx(df['no2'].mean())
+        assert row['weighted_mean'] == pytest.approx(np.average(df['no2_pop'], weights=df['population']))
+        assert row['p50'] == pytest.approx(df['no2'].median())
+        histogram = load_histogram(conn, 'no2', year)
+        assert len(histogram) == HISTOGRAM_BINS and histogram['count'].sum() == 200
+    # Pollutants without any value have a summary row but no histogram
+    assert load_summary(conn, 'pm25')['n'].tolist() == [0, 0, 0]
+    assert load_histogram(conn, 'pm25').empty
+
+
+def test_changed_year_within_the_range_only_recomputes_that_year(conn):
+    refresh_summaries(conn)
+    before = digests(conn)
+    histogram_2011 = load_histogram(conn, 'no2', 2011)
+
+    with conn:
+        conn.execute("DELETE FROM measurement WHERE annee = 2012")
+        create_db.insert_frame(conn, frame(2012, np.full(150, 25.0)))
+
+    assert refresh_summaries(conn, [2012]) == [2012]
+    after = digests(conn)
+    assert after[2012] != before[2012] and after[2011] == before[2011]
+    assert load_summary(conn, 'no2').set_index('annee').loc[2012, 'n'] == 150
+    pd.testing.assert_frame_equal(load_histogram(conn, 'no2', 2011), histogram_2011)
+
+
+def test_new_range_rebins_every_year(conn):
+    refresh_summaries(conn)
+    with conn:
+        create_db.insert_frame(conn, frame(2014, [5.0, 100.0]))
+
+    # The range of no2 grows: the bins of the unchanged years follow it
+    assert refresh_summaries(conn, [2014]) == [2011, 2012, 2013, 2014]
+    assert conn.execute("SELECT lower, upper FROM histogram_edges WHERE pollutant = 'no2'").fetchone() == (5.0, 100.0)
+    histogram_2011 = load_histogram(conn, 'no2', 2011)
+    assert histogram_2011['lower'].iloc[0] == 5.0 and histogram_2011['upper'].iloc[-1] == 100.0
+    assert histogram_2011['count'].sum() == 200
+
+
+def test_removed_year_loses_its_rows(conn):
+    refresh_summaries(conn)
+    with conn:
+        conn.execute("DELETE FROM measurement WHERE annee = 2013")
+
+    refresh_summaries(conn, [2013])
+
+    assert 2013 not in digests(conn)
+    assert 2013 not in load_summary(conn)['annee'].tolist()
+    assert load_histogram(conn, 'no2', 2013).empty